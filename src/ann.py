@@ -0,0 +1,342 @@
+"""
+Approximate nearest-neighbour search over dense document vectors.
+
+IVFIndex (an inverted file) clusters the L2-normalized vectors with
+k-means and stores the members of each cluster in one contiguous list. A
+query is compared with the cluster centroids first, and only the nprobe
+best lists are scanned, so a query reads about nprobe / nlist of the
+vectors instead of all of them. Raising nprobe trades speed for recall.
+
+With product quantization (pq_subvectors=m), each vector's residual from
+its centroid is split into m parts, and every part is stored as a
+one-byte code into a per-part codebook of 256 centroids. Inner products
+with codes are then looked up in a small per-query table (asymmetric
+distance computation), which shrinks the lists to m bytes per vector.
+"""
+
+import logging
+import numpy as np
+from typing import Dict, List, Tuple
+from scipy.sparse import csr_matrix
+from src.search import select_top_k
+from src.storage import save_array, load_array
+
+logger = logging.getLogger(__name__)
+
+# Vectors compared with all centroids at a time during k-means
+KMEANS_BATCH = 8192
+
+# Largest k * training vectors for which k-means++ picks the initial
+# centroids; beyond it (one pass over the sample per centroid) they are
+# drawn at random
+KMEANS_PLUS_PLUS_WORK = 1 << 25
+
+# Queries compared with all centroids at a time in search_many
+QUERY_BATCH = 1024
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale every row to unit L2 norm, so inner products are cosines.
+    
+    Args:
+        vectors: Dense matrix, one vector per row
+    
+    Returns:
+        float32 copy with unit rows (all-zero rows stay zero)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0,
+           max_train: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster vectors with Lloyd's k-means (squared L2 distance).
+    
+    Args:
+        vectors: Dense matrix, one vector per row
+        k: Number of clusters (at most the number of vectors)
+        iterations: Assignment and update rounds
+        seed: Random seed for the initial centroids
+        max_train: Train on a random sample of at most this many vectors
+            (default: all), then assign every vector once
+    
+    Returns:
+        Tuple of (centroids (k x dim), cluster of each vector)
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    train = vectors
+    if max_train is not None and len(vectors) > max_train:
+        train = vectors[rng.choice(len(vectors), max_train, replace=False)]
+    
+    if k * len(train) <= KMEANS_PLUS_PLUS_WORK:
+        centroids = kmeans_plus_plus(train, k, rng)
+    else:
+        centroids = train[rng.choice(len(train), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_clusters(train, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        members = csr_matrix((np.ones(len(train), dtype=np.float32), (assignment, np.arange(len(train)))),
+                             shape=(k, len(train)))
+        sums = members @ train
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Restart empty clusters at random training vectors
+        centroids[empty] = train[rng.choice(len(train), int(empty.sum()))]
+    return centroids, assign_clusters(vectors, centroids)
+
+
+def kmeans_plus_plus(vectors: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Pick k initial centroids far apart from each other (k-means++).
+    
+    Each centroid is drawn with probability proportional to the squared
+    distance to the nearest centroid picked so far.
+    
+    Args:
+        vectors: Training vectors (float32)
+        k: Number of centroids
+        rng: Random generator
+    
+    Returns:
+        Initial centroids (k x dim)
+    """
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(len(vectors))]
+    difference = vectors - centroids[0]
+    closest = np.einsum('ij,ij->i', difference, difference).astype(np.float64)
+    for i in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(len(vectors), p=closest / total) if total > 0 else rng.integers(len(vectors))
+        centroids[i] = vectors[pick]
+        difference = vectors - centroids[i]
+        np.minimum(closest, np.einsum('ij,ij->i', difference, difference), out=closest)
+    return centroids
+
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) of every vector."""
+    half_norms = 0.5 * np.einsum('ij,ij->i', centroids, centroids)
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), KMEANS_BATCH):
+        batch = vectors[start:start + KMEANS_BATCH]
+        # argmin ||x - c||^2 = argmax x.c - ||c||^2 / 2
+        assignment[start:start + KMEANS_BATCH] = np.argmax(batch @ centroids.T - half_norms, axis=1)
+    return assignment
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """
+    Exhaustive cosine search, the reference for approximate results.
+    
+    Args:
+        vectors: L2-normalized document vectors
+        query: Query vector (normalized here)
+        top_k: Number of results
+    
+    Returns:
+        Ranked (doc_index, score) pairs, best first
+    """
+    scores = vectors @ normalize_rows(query[None, :])[0]
+    return [(int(i), float(scores[i])) for i in select_top_k(scores, top_k)]
+
+
+class IVFIndex:
+    """Inverted-file index over normalized vectors, optionally product-quantized."""
+    
+    ARRAYS = ('centroids', 'list_offsets', 'list_ids', 'list_vectors', 'list_codes', 'codebooks')
+    
+    def __init__(self, nlist: int = None, nprobe: int = 8, pq_subvectors: int = None,
+                 train_iterations: int = 20, seed: int = 0):
+        """
+        Initialize an empty index.
+        
+        Args:
+            nlist: Number of clusters (default: 4 * sqrt(number of vectors))
+            nprobe: Clusters scanned per query unless search() overrides it
+            pq_subvectors: Store each vector as this many one-byte codes
+                instead of float32 values (None: no quantization). Must
+                divide the vector dimension.
+            train_iterations: k-means rounds for centroids and codebooks
+            seed: Random seed for k-means
+        """
+        if nlist is not None and nlist < 1:
+            raise ValueError("nlist must be at least 1")
+        if nprobe < 1:
+            raise ValueError("nprobe must be at least 1")
+        
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_subvectors = pq_subvectors
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids: np.ndarray = None  # nlist x dim, float32
+        self.list_offsets: np.ndarray = None  # start of each list, plus the total
+        self.list_ids: np.ndarray = None  # doc index of each list entry
+        self.list_vectors: np.ndarray = None  # normalized vectors in list order (no PQ)
+        self.list_codes: np.ndarray = None  # PQ codes of residuals in list order
+        self.codebooks: np.ndarray = None  # m x 256 x (dim / m) residual centroids
+    
+    @property
+    def num_vectors(self) -> int:
+        """Number of indexed vectors."""
+        return int(self.list_offsets[-1]) if self.list_offsets is not None else 0
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the index arrays."""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS if getattr(self, name) is not None)
+    
+    def build(self, vectors: np.ndarray) -> None:
+        """
+        Cluster and store document vectors.
+        
+        Args:
+            vectors: Dense matrix, one document per row (normalized here)
+        """
+        vectors = normalize_rows(vectors)
+        num_vectors, dim = vectors.shape
+        if self.pq_subvectors is not None and (self.pq_subvectors < 1 or dim % self.pq_subvectors):
+            raise ValueError(f"pq_subvectors must divide the vector dimension {dim}")
+        
+        nlist = self.nlist or max(1, int(4 * np.sqrt(num_vectors)))
+        centroids, assignment = kmeans(vectors, nlist, self.train_iterations, self.seed,
+                                       max_train=256 * nlist)
+        order = np.argsort(assignment, kind='stable')
+        self.centroids = centroids
+        self.list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=self.list_offsets[1:])
+        self.list_ids = order
+        
+        if self.pq_subvectors is None:
+            self.list_vectors = vectors[order]
+            self.list_codes = self.codebooks = None
+        else:
+            residuals = vectors[order] - centroids[assignment[order]]
+            self.codebooks, self.list_codes = self._train_product_quantizer(residuals)
+            self.list_vectors = None
+        logger.info("Clustered %d vectors into %d lists", num_vectors, len(centroids))
+    
+    def _train_product_quantizer(self, residuals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Codebook of every subvector and the codes of all residuals."""
+        m = self.pq_subvectors
+        sub_dim = residuals.shape[1] // m
+        codebooks = np.zeros((m, 256, sub_dim), dtype=np.float32)
+        codes = np.empty((len(residuals), m), dtype=np.uint8)
+        for part in range(m):
+            sub = np.ascontiguousarray(residuals[:, part * sub_dim:(part + 1) * sub_dim])
+            centroids, codes[:, part] = kmeans(sub, 256, self.train_iterations, self.seed + part,
+                                               max_train=256 * 64)
+            codebooks[part, :len(centroids)] = centroids
+        return codebooks, codes
+    
+    def search(self, query: np.ndarray, top_k: int = 10, nprobe: int = None) -> List[Tuple[int, float]]:
+        """
+        Find approximately the most similar vectors to a query.
+        
+        Args:
+            query: Query vector (normalized here)
+            top_k: Number of results
+            nprobe: Lists to scan (default: self.nprobe); nlist scans every
+                list and gives exact results without quantization
+        
+        Returns:
+            Ranked (doc_index, cosine) pairs, best first; cosines of
+            quantized vectors are approximate
+        """
+        return self.search_many(np.asarray(query)[None, :], top_k, nprobe)[0]
+    
+    def search_many(self, queries: np.ndarray, top_k: int = 10,
+                    nprobe: int = None) -> List[List[Tuple[int, float]]]:
+        """
+        Search for every row of a query matrix.
+        
+        The queries are compared with the centroids QUERY_BATCH rows at a
+        time in one matrix product; the probed lists are then scanned per
+        query.
+        
+        Args:
+            queries: Query vectors, one per row
+            top_k: Number of results per query
+            nprobe: Lists to scan per query (default: self.nprobe)
+        
+        Returns:
+            Ranked (doc_index, cosine) pairs of each query
+        """
+        if self.centroids is None:
+            raise ValueError("Index not built. Call build() first.")
+        
+        queries = normalize_rows(queries)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        results = []
+        for start in range(0, len(queries), QUERY_BATCH):
+            batch = queries[start:start + QUERY_BATCH]
+            for query, centroid_scores in zip(batch, batch @ self.centroids.T):
+                results.append(self._scan_lists(query, centroid_scores, nprobe, top_k))
+        return results
+    
+    def _scan_lists(self, query: np.ndarray, centroid_scores: np.ndarray, nprobe: int,
+                    top_k: int) -> List[Tuple[int, float]]:
+        """Top-k entries of the nprobe lists whose centroids score highest."""
+        probe = np.sort(select_top_k(centroid_scores, nprobe))  # scan lists in storage order
+        starts = self.list_offsets[probe]
+        lengths = self.list_offsets[probe + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return []
+        entries = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        
+        if self.list_codes is None:
+            scores = self.list_vectors[entries] @ query
+        else:
+            # q.x = q.centroid + q.residual, where q.residual is a sum of
+            # per-subvector table lookups
+            m, _, sub_dim = self.codebooks.shape
+            table = np.einsum('pcd,pd->pc', self.codebooks, query.reshape(m, sub_dim))
+            codes = self.list_codes[entries]
+            scores = (np.repeat(centroid_scores[probe], lengths)
+                      + table[np.arange(m), codes].sum(axis=1))
+        return [(int(self.list_ids[entries[i]]), float(scores[i])) for i in select_top_k(scores, top_k)]
+    
+    def save(self, path: str, prefix: str = 'ann') -> Dict:
+        """
+        Write index arrays into an index directory.
+        
+        Args:
+            path: Index directory
+            prefix: Prefix for the array file names
+        
+        Returns:
+            Scalar state to record in the manifest
+        """
+        saved = []
+        for name in self.ARRAYS:
+            value = getattr(self, name)
+            if value is not None:
+                save_array(path, f'{prefix}_{name}', value)
+                saved.append(name)
+        return {'nlist': self.nlist, 'nprobe': self.nprobe, 'pq_subvectors': self.pq_subvectors,
+                'train_iterations': self.train_iterations, 'seed': self.seed, 'arrays': saved}
+    
+    @classmethod
+    def load(cls, path: str, state: Dict, prefix: str = 'ann') -> 'IVFIndex':
+        """
+        Memory-map an index written by save().
+        
+        Args:
+            path: Index directory
+            state: Scalar state returned by save()
+            prefix: Prefix used when saving
+        
+        Returns:
+            Index backed by read-only mapped arrays
+        """
+        index = cls(state['nlist'], state['nprobe'], state['pq_subvectors'],
+                    state['train_iterations'], state['seed'])
+        for name in state['arrays']:
+            setattr(index, name, load_array(path, f'{prefix}_{name}'))
+        return index
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Benchmark approximate nearest-neighbour search against exact search.
+
+Documents are drawn from a mixture of topics, each with its own skewed
+word distribution on top of a shared background, and embedded as dense
+vectors by a Gaussian random projection of their TF-IDF vectors, which
+approximately preserves cosine similarities. Queries are a few words of
+one topic, projected the same way. The exact top-k of every query is the
+relevant set: recall@k and average precision of the IVF index (with
+float32 lists and with product quantization) are computed with
+SearchEvaluator for a range of nprobe values, next to query latency and
+index size.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import time
+import numpy as np
+from src.search import SearchEngine
+from src.ann import IVFIndex, exact_top_k, normalize_rows
+from src.evaluation import SearchEvaluator
+from src.corpora import topical_documents
+
+
+def random_projection(num_terms: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Gaussian projection matrix from term space to dim dimensions."""
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((num_terms, dim)) / np.sqrt(dim)).astype(np.float32)
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dim = 128
+    num_queries = 200
+    top_k = 10
+    
+    print("="*70)
+    print("APPROXIMATE NEAREST-NEIGHBOUR BENCHMARK")
+    print("="*70)
+    print()
+    
+    documents, words, _, topic_probs = topical_documents(num_docs, vocab_size=5000)
+    engine = SearchEngine(result_cache_size=0)
+    engine.index_documents(documents)
+    projection = random_projection(len(engine.vectorizer.vocabulary), dim)
+    vectors = normalize_rows(engine.document_matrix() @ projection)
+    
+    rng = np.random.default_rng(1)
+    queries = []
+    for _ in range(num_queries):
+        topic = rng.integers(len(topic_probs))
+        query = ' '.join(rng.choice(words, int(rng.integers(2, 5)), p=topic_probs[topic]))
+        term_ids, weights = engine.model.query_weights(engine.vectorizer, engine.preprocessor.preprocess(query))
+        queries.append(weights.astype(np.float32) @ projection[term_ids])
+    
+    start = time.perf_counter()
+    exact = [exact_top_k(vectors, query, top_k) for query in queries]
+    exact_ms = (time.perf_counter() - start) / num_queries * 1000
+    relevant = [{doc_idx for doc_idx, _ in results} for results in exact]
+    evaluator = SearchEvaluator()
+    
+    print(f"{num_docs} documents, {dim} dimensions, {num_queries} queries, top {top_k}")
+    print(f"Exact search: {exact_ms:.2f} ms/query, {vectors.nbytes / 1e6:.1f} MB of vectors")
+    print()
+    
+    for pq_subvectors in (None, 16, 32):
+        index = IVFIndex(pq_subvectors=pq_subvectors)
+        start = time.perf_counter()
+        index.build(vectors)
+        build_seconds = time.perf_counter() - start
+        name = f'IVF-PQ{pq_subvectors}' if pq_subvectors else 'IVF-Flat'
+        print(f"{name}: {len(index.centroids)} lists, {index.nbytes / 1e6:.1f} MB, built in {build_seconds:.1f}s")
+        print(f"{'nprobe':>8}{'ms/query':>10}{'speedup':>9}{'recall@k':>10}{'MAP':>8}")
+        print("-"*45)
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            start = time.perf_counter()
+            found = index.search_many(queries, top_k, nprobe)
+            elapsed_ms = (time.perf_counter() - start) / num_queries * 1000
+            retrieved = [[doc_idx for doc_idx, _ in results] for results in found]
+            recall = np.mean([evaluator.recall_at_k(r, d, top_k) for r, d in zip(relevant, retrieved)])
+            ap = np.mean([evaluator.average_precision(r, d) for r, d in zip(relevant, retrieved)])
+            print(f"{nprobe:>8}{elapsed_ms:>10.2f}{exact_ms / elapsed_ms:>8.1f}x{recall:>10.3f}{ap:>8.3f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
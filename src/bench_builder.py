@@ -0,0 +1,155 @@
+"""
+Benchmark out-of-core index construction against the in-memory build.
+
+A synthetic corpus is written to text files and streamed back with
+DocumentLoader.stream_documents, so documents are never all in memory
+at once. Each build runs in a fresh process: the in-memory build
+(SearchEngine.index_documents with a batch size, then save) and
+ExternalIndexBuilder with several memory budgets. The benchmark reports
+build time, number of spilled runs, index size and peak memory. Peak RSS
+includes pages of memory-mapped index files, which the kernel can evict;
+peak anonymous memory (sampled from /proc on Linux) is the heap the
+builds actually need.
+
+Usage: python src/bench_builder.py [num_docs] [budget_mb ...]
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import multiprocessing
+import tempfile
+import threading
+import time
+from typing import Dict
+from src.loader import DocumentLoader
+from src.search import SearchEngine
+from src.builder import ExternalIndexBuilder
+from src.corpora import synthetic_documents
+from src.bench_suite import corpus_vocab_size, peak_rss_mb, directory_bytes
+
+# Documents written to each corpus file
+DOCS_PER_FILE = 1000
+
+# Characters per streamed document (files are split at whitespace)
+MAX_CHARS = 2000
+
+
+class AnonymousMemorySampler:
+    """Tracks the peak anonymous resident memory of this process (Linux only)."""
+    
+    def __init__(self, interval: float = 0.01):
+        """
+        Start sampling in a daemon thread.
+        
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.peak_kb = 0
+        self.available = os.path.exists('/proc/self/status')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        if self.available:
+            self._thread.start()
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('RssAnon:'):
+                        self.peak_kb = max(self.peak_kb, int(line.split()[1]))
+            self._stop.wait(self.interval)
+    
+    def stop(self) -> float:
+        """Stop sampling and return the peak in MB (None if unavailable)."""
+        if not self.available:
+            return None
+        self._stop.set()
+        self._thread.join()
+        return self.peak_kb / 1e3
+
+
+def write_corpus(path: str, num_docs: int) -> int:
+    """Write a synthetic corpus as text files; return its size in bytes."""
+    documents, _, _ = synthetic_documents(num_docs, corpus_vocab_size(num_docs))
+    for start in range(0, num_docs, DOCS_PER_FILE):
+        with open(os.path.join(path, f'part_{start // DOCS_PER_FILE:05d}.txt'), 'w') as f:
+            f.write('\n'.join(doc['content'] for doc in documents[start:start + DOCS_PER_FILE]))
+    return directory_bytes(path)
+
+
+def run_build(corpus_path: str, index_path: str, budget_mb: float = None) -> Dict[str, float]:
+    """Build one index from the corpus files and measure it."""
+    documents = DocumentLoader(corpus_path).stream_documents(max_chars=MAX_CHARS)
+    sampler = AnonymousMemorySampler()
+    start = time.perf_counter()
+    runs = None
+    if budget_mb is None:
+        engine = SearchEngine(result_cache_size=0)
+        engine.index_documents(documents, batch_size=DOCS_PER_FILE)
+        engine.save(index_path)
+    else:
+        builder = ExternalIndexBuilder(memory_budget_mb=budget_mb, result_cache_size=0)
+        builder.build(documents, index_path)
+        runs = builder.num_runs
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': seconds,
+        'peak_anon_mb': sampler.stop(),
+        'peak_rss_mb': peak_rss_mb(),
+        'runs': runs,
+        'index_mb': directory_bytes(index_path) / 1e6,
+    }
+
+
+def _build_worker(queue: multiprocessing.Queue, *args) -> None:
+    """Run one build in a child process and report its metrics."""
+    try:
+        queue.put(('ok', run_build(*args)))
+    except Exception as error:
+        queue.put(('error', repr(error)))
+
+
+def run_isolated(*args) -> Dict[str, float]:
+    """Run one build in a fresh process, so peak memory is its own."""
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_build_worker, args=(queue,) + args)
+    worker.start()
+    status, result = queue.get()
+    worker.join()
+    if status == 'error':
+        raise RuntimeError(f"Build failed: {result}")
+    return result
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    budgets = [float(arg) for arg in sys.argv[2:]] or [16, 64, 256]
+    
+    print("="*70)
+    print("OUT-OF-CORE INDEX CONSTRUCTION BENCHMARK")
+    print("="*70)
+    print()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_path = os.path.join(tmp, 'corpus')
+        os.makedirs(corpus_path)
+        corpus_bytes = write_corpus(corpus_path, num_docs)
+        print(f"{num_docs} documents, {corpus_bytes / 1e6:.0f} MB of text")
+        print()
+        print(f"{'build':<18}{'seconds':>9}{'runs':>6}{'index MB':>10}{'peak RSS MB':>13}{'peak anon MB':>14}")
+        print("-"*70)
+        for budget_mb in [None] + budgets:
+            result = run_isolated(corpus_path, os.path.join(tmp, 'index'), budget_mb)
+            name = 'in memory' if budget_mb is None else f'budget {budget_mb:g} MB'
+            runs = '' if result['runs'] is None else result['runs']
+            anon = '-' if result['peak_anon_mb'] is None else f"{result['peak_anon_mb']:.0f}"
+            print(f"{name:<18}{result['seconds']:>9.1f}{runs:>6}{result['index_mb']:>10.0f}"
+                  f"{result['peak_rss_mb']:>13.0f}{anon:>14}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Benchmark posting list codecs.
+
+Builds the inverted index of a synthetic corpus once per codec and reports
+its size, encoding time and decoding throughput, for whole-index decoding
+(as when computing pruning bounds) and for single posting lists (as at
+query time).
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import time
+import numpy as np
+from src.search import SearchEngine
+from src.index import InvertedIndex
+from src.compression import CODECS
+from src.corpora import synthetic_documents
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = 5
+    
+    print("="*70)
+    print("POSTING LIST COMPRESSION BENCHMARK")
+    print("="*70)
+    print()
+    
+    documents, _, _ = synthetic_documents(num_docs, vocab_size=5000)
+    engine = SearchEngine()
+    engine.index_documents(documents)
+    counts = engine.segments[0].counts
+    
+    reference = InvertedIndex()
+    reference.build(counts)
+    expected = reference.all_postings()
+    num_postings = len(expected[1])
+    
+    # Query-time decoding touches the longest lists the most
+    terms = np.argsort(-np.diff(reference.term_offsets))[:200]
+    list_postings = int(np.diff(reference.term_offsets)[terms].sum())
+    
+    print(f"{num_docs} documents, {num_postings} postings, {reference.vocab_size} terms")
+    print(f"{'codec':<10}{'MB':>8}{'bits/posting':>14}{'encode s':>10}"
+          f"{'decode all M/s':>16}{'decode lists M/s':>18}")
+    print("-"*76)
+    
+    for codec in (None,) + tuple(CODECS):
+        index = InvertedIndex()
+        index.build(counts)
+        start = time.perf_counter()
+        if codec is not None:
+            index.compress(codec)
+        encode_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        for _ in range(repeats):
+            decoded = index.all_postings()
+        decode_all = num_postings * repeats / (time.perf_counter() - start) / 1e6
+        assert all(np.array_equal(a, b) for a, b in zip(decoded, expected))
+        
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for term_id in terms:
+                index.postings(term_id)
+        decode_lists = list_postings * repeats / (time.perf_counter() - start) / 1e6
+        
+        size = index.nbytes
+        print(f"{codec or 'fixed':<10}{size / 1e6:>8.2f}{8 * size / num_postings:>14.2f}"
+              f"{encode_time:>10.3f}{decode_all:>16.1f}{decode_lists:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
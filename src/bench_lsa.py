@@ -0,0 +1,93 @@
+"""
+Benchmark latent semantic search against exhaustive TF-IDF.
+
+Documents come from the topical generator of bench_ann, and queries are a
+few words of one topic; every document of that topic counts as relevant.
+For raw TF-IDF and for LSA at several dimensionalities (exact and with an
+IVF index over the latent vectors), the benchmark reports precision@10 and
+MAP of the top 100 (SearchEvaluator), overlap with the TF-IDF top 10,
+query latency and the memory of the document representation.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import time
+import numpy as np
+from src.search import SearchEngine
+from src.lsa import LSASearchEngine
+from src.ann import IVFIndex
+from src.evaluation import SearchEvaluator
+from src.corpora import topical_documents
+
+
+def evaluate(search, queries, relevant, baseline=None, top_k: int = 100):
+    """
+    Run every query and score the rankings.
+    
+    Args:
+        search: Function from query string to result dicts
+        queries: Query strings
+        relevant: Set of relevant document indices per query
+        baseline: Optional TF-IDF rankings to measure top-10 overlap against
+        top_k: Results retrieved per query
+    
+    Returns:
+        Tuple of (rankings, ms/query, precision@10, MAP, top-10 overlap)
+    """
+    evaluator = SearchEvaluator()
+    start = time.perf_counter()
+    rankings = [[r['doc_index'] for r in search(query, top_k)] for query in queries]
+    elapsed_ms = (time.perf_counter() - start) / len(queries) * 1000
+    precision = np.mean([evaluator.precision_at_k(r, d, 10) for r, d in zip(relevant, rankings)])
+    ap = np.mean([evaluator.average_precision(r, d) for r, d in zip(relevant, rankings)])
+    overlap = 1.0
+    if baseline is not None:
+        overlap = np.mean([len(set(a[:10]) & set(b[:10])) / 10 for a, b in zip(rankings, baseline)])
+    return rankings, elapsed_ms, precision, ap, overlap
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_queries = 200
+    
+    print("="*70)
+    print("LATENT SEMANTIC SEARCH BENCHMARK")
+    print("="*70)
+    print()
+    
+    documents, words, topics, topic_probs = topical_documents(num_docs, vocab_size=5000)
+    rng = np.random.default_rng(1)
+    query_topics = rng.integers(len(topic_probs), size=num_queries)
+    queries = [' '.join(rng.choice(words, int(rng.integers(2, 5)), p=topic_probs[topic]))
+               for topic in query_topics]
+    relevant = [set(np.flatnonzero(topics == topic).tolist()) for topic in query_topics]
+    
+    engine = SearchEngine(result_cache_size=0)
+    engine.index_documents(documents)
+    matrix = engine.doc_vectors
+    matrix_mb = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1e6
+    print(f"{num_docs} documents, {matrix.shape[1]} terms, {num_queries} queries")
+    print()
+    print(f"{'method':<18}{'build s':>8}{'MB':>8}{'ms/query':>10}{'P@10':>7}{'MAP':>7}{'overlap':>9}")
+    print("-"*67)
+    
+    baseline, elapsed_ms, precision, ap, _ = evaluate(
+        lambda query, top_k: engine.search(query, top_k, strategy='exhaustive'), queries, relevant)
+    print(f"{'TF-IDF':<18}{'':>8}{matrix_mb:>8.1f}{elapsed_ms:>10.2f}{precision:>7.3f}{ap:>7.3f}{'':>9}")
+    
+    for dims, ann in ((50, None), (100, None), (200, None), (100, IVFIndex(nprobe=16))):
+        lsa = LSASearchEngine(dims=dims, ann=ann, result_cache_size=0)
+        start = time.perf_counter()
+        lsa.index_documents(documents)
+        build_seconds = time.perf_counter() - start
+        mb = lsa.doc_vectors.nbytes / 1e6 + (ann.nbytes / 1e6 if ann is not None else 0)
+        _, elapsed_ms, precision, ap, overlap = evaluate(lsa.search, queries, relevant, baseline)
+        name = f'LSA-{dims}' + ('+IVF' if ann is not None else '')
+        print(f"{name:<18}{build_seconds:>8.1f}{mb:>8.1f}{elapsed_ms:>10.2f}{precision:>7.3f}{ap:>7.3f}{overlap:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
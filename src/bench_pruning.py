@@ -0,0 +1,66 @@
+"""
+Benchmark dynamic pruning strategies against exhaustive scoring.
+
+Reports per-query latency and how many postings each strategy scored or
+skipped, and checks that every strategy returns the exhaustive results.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import time
+import numpy as np
+from src.search import SearchEngine
+from src.corpora import synthetic_documents
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_queries = 200
+    top_k = 10
+    
+    print("="*70)
+    print("DYNAMIC PRUNING BENCHMARK")
+    print("="*70)
+    print()
+    
+    documents, words, probs = synthetic_documents(num_docs, vocab_size=5000)
+    engine = SearchEngine()
+    engine.index_documents(documents)
+    
+    # Queries mix frequent and rare terms, like real traffic
+    rng = np.random.default_rng(1)
+    queries = [
+        ' '.join(words[t] for t in rng.choice(len(words), size=int(rng.integers(2, 6)), p=probs))
+        for _ in range(num_queries)
+    ]
+    
+    baseline = [engine.search(q, top_k=top_k, strategy='exhaustive') for q in queries]
+    
+    print(f"{num_docs} documents, {num_queries} queries, top_k={top_k}")
+    print(f"{'strategy':<12}{'ms/query':>10}{'postings':>12}{'scored':>12}{'skipped':>10}{'exact':>8}")
+    print("-"*64)
+    
+    for strategy in engine.STRATEGIES:
+        total = scored = 0
+        exact = True
+        start = time.perf_counter()
+        for query, expected in zip(queries, baseline):
+            results = engine.search(query, top_k=top_k, strategy=strategy)
+            exact &= ([(r['doc_index'], r['score']) for r in results]
+                      == [(r['doc_index'], r['score']) for r in expected])
+            total += engine.last_query_stats.get('postings_total', 0)
+            scored += engine.last_query_stats.get('postings_scored', 0)
+        elapsed = (time.perf_counter() - start) / num_queries * 1000
+        
+        if total:
+            skipped = f"{100 * (1 - scored / total):.1f}%"
+            print(f"{strategy:<12}{elapsed:>10.2f}{total:>12}{scored:>12}{skipped:>10}{str(exact):>8}")
+        else:
+            print(f"{strategy:<12}{elapsed:>10.2f}{'-':>12}{'-':>12}{'-':>10}{str(exact):>8}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Load-test the search service with and without query batching.
+
+Starts the service on a synthetic corpus, sends queries from many
+concurrent keep-alive clients and reports throughput and client-side
+latency percentiles, alongside the batching and result cache hit rate
+the service reports. Each run starts with an empty result cache.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import asyncio
+import time
+import numpy as np
+from urllib.parse import quote_plus
+from src.search import SearchEngine, ResultCache
+from src.server import SearchServer, fetch_json
+from src.corpora import synthetic_documents
+
+
+async def load_test(engine: SearchEngine, queries, concurrency: int, max_batch_size: int):
+    """
+    Answer every query once with the given concurrency.
+    
+    Returns:
+        Tuple of (client latencies in seconds, elapsed seconds, service stats)
+    """
+    engine.result_cache = ResultCache()
+    server = SearchServer(engine, port=0, max_batch_size=max_batch_size)
+    await server.start()
+    pending = iter(queries)
+    latencies = []
+    
+    async def client():
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        for query in pending:
+            start = time.perf_counter()
+            status, _ = await fetch_json(reader, writer, f"/search?q={quote_plus(query)}&k=10")
+            assert status == 200
+            latencies.append(time.perf_counter() - start)
+        _, stats = await fetch_json(reader, writer, '/stats')
+        writer.close()
+        return stats
+    
+    start = time.perf_counter()
+    stats = await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await server.stop()
+    return np.array(latencies), elapsed, stats[-1]
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_queries = 2000
+    concurrency = 64
+    
+    print("="*70)
+    print("SEARCH SERVICE BENCHMARK")
+    print("="*70)
+    print()
+    
+    documents, words, probs = synthetic_documents(num_docs, vocab_size=5000)
+    engine = SearchEngine()
+    engine.index_documents(documents)
+    
+    rng = np.random.default_rng(1)
+    queries = [
+        ' '.join(words[t] for t in rng.choice(len(words), size=int(rng.integers(2, 6)), p=probs))
+        for _ in range(num_queries)
+    ]
+    
+    print(f"{num_docs} documents, {num_queries} queries, {concurrency} concurrent clients")
+    print(f"{'max batch':<12}{'queries/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'mean batch':>12}{'cache hits':>12}")
+    print("-"*76)
+    
+    for max_batch_size in (1, 16, 64):
+        latencies, elapsed, stats = asyncio.run(load_test(engine, queries, concurrency, max_batch_size))
+        p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+        print(f"{max_batch_size:<12}{len(queries) / elapsed:>10.0f}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}"
+              f"{stats['mean_batch_size']:>12.1f}{stats['result_cache']['hit_rate']:>12.0%}")
+
+
+if __name__ == '__main__':
+    main()
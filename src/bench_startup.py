@@ -0,0 +1,138 @@
+"""
+Benchmark cold-start import time.
+
+Imports each module in a fresh interpreter with `python -X importtime`
+and reports its cumulative import time, the heaviest imports below it,
+and the wall-clock time of the whole process. With --history FILE the
+timings are appended to a JSON-lines file together with the current git
+commit, and compared with the previous entry so regressions show up.
+
+Usage:
+    python src/bench_startup.py [--history startup.jsonl] [--repeats 5] [modules...]
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import re
+import json
+import time
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+DEFAULT_MODULES = ['src.preprocessing', 'src.vectorizer', 'src.search', 'src.sharding']
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)')
+
+
+def import_times(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    Import a module in a fresh interpreter.
+    
+    Args:
+        module: Dotted module name
+    
+    Returns:
+        Wall-clock seconds of the process, and the cumulative microseconds
+        of the module and of every top-level package imported along the
+        way (the largest figure seen for each package)
+    """
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=project_root, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            name = match.group(3)
+            package = name if name == module else name.split('.')[0]
+            cumulative[package] = max(cumulative.get(package, 0), int(match.group(2)))
+    return wall, cumulative
+
+
+def measure(modules: List[str], repeats: int) -> Dict[str, Dict]:
+    """Best of several runs for each module."""
+    results = {}
+    for module in modules:
+        runs = [import_times(module) for _ in range(repeats)]
+        _, cumulative = min(runs, key=lambda run: run[1].get(module, 0))
+        own_package = module.split('.')[0]
+        results[module] = {
+            'import_ms': cumulative.get(module, 0) / 1000,
+            'wall_ms': min(run[0] for run in runs) * 1000,
+            'heaviest': sorted(((name, us / 1000) for name, us in cumulative.items()
+                                if name not in (module, own_package)),
+                               key=lambda item: -item[1])[:5],
+        }
+    return results
+
+
+def git_commit() -> str:
+    """Current commit hash, or '' outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def read_history(path: str) -> List[Dict]:
+    """Entries of a JSON-lines history file (empty if it does not exist)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import times")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--history', help="JSON-lines file to append results to and compare with")
+    args = parser.parse_args()
+    
+    print("="*70)
+    print("STARTUP BENCHMARK")
+    print("="*70)
+    print()
+    
+    results = measure(args.modules, args.repeats)
+    for module, result in results.items():
+        print(f"{module}: import {result['import_ms']:.1f} ms, process {result['wall_ms']:.1f} ms")
+        for name, ms in result['heaviest']:
+            print(f"    {name:<30}{ms:>8.1f} ms")
+    print()
+    
+    if args.history:
+        history = read_history(args.history)
+        if history:
+            previous = history[-1]
+            print(f"Compared with {previous['commit'] or 'previous run'} ({previous['timestamp']}):")
+            for module, result in results.items():
+                if module in previous['modules']:
+                    before = previous['modules'][module]['import_ms']
+                    change = result['import_ms'] - before
+                    print(f"  {module:<24}{before:>8.1f} -> {result['import_ms']:>7.1f} ms ({change:+.1f})")
+            print()
+        
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'modules': {module: {'import_ms': round(result['import_ms'], 2),
+                                 'wall_ms': round(result['wall_ms'], 2)}
+                        for module, result in results.items()},
+        }
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        print(f"✓ Appended results to {args.history}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
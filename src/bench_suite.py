@@ -0,0 +1,278 @@
+"""
+Benchmark suite for indexing throughput, query latency and memory.
+
+Indexes synthetic corpora of increasing size (10^3 to 10^6 documents) and
+reports, for each size:
+    - index_documents throughput in documents/s and MB/s of text
+    - search latency percentiles (p50, p95, p99) over random queries
+    - peak resident memory of the process
+    - size of the saved index on disk
+
+Each corpus size runs in a fresh process, so peak memory is not carried
+over from a smaller run. Results can be written as JSON and compared with
+an earlier run; the exit status is 1 if any metric regressed by more than
+the threshold, so the suite can gate changes to vectorizer.py or search.py.
+
+Usage:
+    python src/bench_suite.py [--sizes 1000 10000 100000] [--output run.json]
+                              [--compare baseline.json] [--threshold 0.15]
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import json
+import time
+import platform
+import tempfile
+import argparse
+import multiprocessing
+from queue import Empty
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+from src.search import SearchEngine, BM25Model
+from src.bench_startup import git_commit
+from src.corpora import synthetic_documents
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Metric name -> True if higher is better
+METRICS = {
+    'index_docs_per_s': True,
+    'index_mb_per_s': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+    'index_mb': False,
+}
+
+
+def corpus_vocab_size(num_docs: int) -> int:
+    """Vocabulary growing with the collection, roughly as Heaps' law predicts."""
+    return max(5000, int(10 * num_docs ** 0.6))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes on Linux
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def directory_bytes(path: str) -> int:
+    """Total size of the files under a directory."""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def run_size(num_docs: int, options: Dict) -> Dict[str, float]:
+    """
+    Index one synthetic corpus and measure it.
+    
+    Args:
+        num_docs: Number of documents
+        options: Benchmark settings (num_queries, top_k, strategy, model,
+            tokenizer, num_workers, seed)
+    
+    Returns:
+        Metrics of this corpus size
+    """
+    documents, words, probs = synthetic_documents(num_docs, corpus_vocab_size(num_docs), options['seed'])
+    megabytes = sum(len(doc['content']) for doc in documents) / 1e6
+    
+    engine = SearchEngine(model=BM25Model() if options['model'] == 'bm25' else None,
+                          strategy=options['strategy'], tokenizer=options['tokenizer'],
+                          num_workers=options['num_workers'], result_cache_size=0)
+    start = time.perf_counter()
+    engine.index_documents(documents)
+    index_seconds = time.perf_counter() - start
+    
+    rng = np.random.default_rng(options['seed'] + 1)
+    queries = [
+        ' '.join(words[t] for t in rng.choice(len(words), size=int(rng.integers(2, 5)), p=probs))
+        for _ in range(options['num_queries'])
+    ]
+    for query in queries[:10]:  # warm up
+        engine.search(query, options['top_k'])
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        engine.search(query, options['top_k'])
+        latencies[i] = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        engine.save(os.path.join(tmp, 'index'))
+        index_bytes = directory_bytes(os.path.join(tmp, 'index'))
+    
+    return {
+        'num_docs': num_docs,
+        'vocab_size': len(engine.vectorizer.vocabulary),
+        'corpus_mb': megabytes,
+        'index_seconds': index_seconds,
+        'index_docs_per_s': num_docs / index_seconds,
+        'index_mb_per_s': megabytes / index_seconds,
+        'mean_ms': float(latencies.mean() * 1000),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'peak_rss_mb': peak_rss_mb(),
+        'index_mb': index_bytes / 1e6,
+    }
+
+
+def _run_size_worker(queue: multiprocessing.Queue, num_docs: int, options: Dict) -> None:
+    """Run one corpus size in a child process and report its metrics."""
+    try:
+        queue.put(('ok', run_size(num_docs, options)))
+    except Exception as error:
+        queue.put(('error', repr(error)))
+
+
+def run_isolated(num_docs: int, options: Dict, poll_seconds: float = 1.0) -> Dict[str, float]:
+    """
+    Run one corpus size in a fresh process, so peak memory is its own.
+    
+    Raises RuntimeError if the benchmark fails or the process dies without
+    reporting (for example when it is killed for running out of memory).
+    """
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_run_size_worker, args=(queue, num_docs, options))
+    worker.start()
+    report = None
+    while report is None:
+        # A worker that exited before this get has flushed everything it put
+        alive = worker.is_alive()
+        try:
+            report = queue.get(timeout=poll_seconds)
+        except Empty:
+            if not alive:
+                worker.join()
+                raise RuntimeError(f"Benchmark of {num_docs} documents died without a result "
+                                   f"(exit code {worker.exitcode})") from None
+    worker.join()
+    status, result = report
+    if status == 'error':
+        raise RuntimeError(f"Benchmark of {num_docs} documents failed: {result}")
+    return result
+
+
+def compare_runs(baseline: Dict, current: Dict, threshold: float) -> Iterator[Tuple]:
+    """
+    Compare the metrics of two runs, corpus size by corpus size.
+    
+    Args:
+        baseline: Earlier run, as written by this script
+        current: New run
+        threshold: Relative change beyond which a worse metric counts as a
+            regression (0.15 = 15%)
+    
+    Yields:
+        Tuples of (num_docs, metric, baseline value, current value,
+        relative change, regressed)
+    """
+    previous = {result['num_docs']: result for result in baseline['results']}
+    for result in current['results']:
+        if result['num_docs'] not in previous:
+            continue
+        before = previous[result['num_docs']]
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            yield result['num_docs'], metric, old, new, change, worse > threshold
+
+
+def print_results(results: List[Dict]) -> None:
+    """Print one row of metrics per corpus size."""
+    print(f"{'docs':>9}{'vocab':>8}{'MB':>8}{'docs/s':>10}{'MB/s':>7}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'peak RSS MB':>13}{'index MB':>10}")
+    print("-"*92)
+    for r in results:
+        rss = f"{r['peak_rss_mb']:>13.0f}" if r['peak_rss_mb'] is not None else f"{'n/a':>13}"
+        print(f"{r['num_docs']:>9}{r['vocab_size']:>8}{r['corpus_mb']:>8.1f}{r['index_docs_per_s']:>10.0f}"
+              f"{r['index_mb_per_s']:>7.2f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{rss}{r['index_mb']:>10.1f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexing, query latency and memory")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Corpus sizes in documents (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument('--queries', type=int, default=500, help="Queries timed per corpus size")
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--strategy', default='taat', choices=SearchEngine.STRATEGIES)
+    parser.add_argument('--model', default='tfidf', choices=('tfidf', 'bm25'))
+    parser.add_argument('--tokenizer', default='nltk', choices=('nltk', 'fast'))
+    parser.add_argument('--num-workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Earlier JSON results to compare with")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Relative change that counts as a regression")
+    args = parser.parse_args()
+    
+    options = {'num_queries': args.queries, 'top_k': args.top_k, 'strategy': args.strategy,
+               'model': args.model, 'tokenizer': args.tokenizer, 'num_workers': args.num_workers,
+               'seed': args.seed}
+    
+    print("="*70)
+    print("SEARCH ENGINE BENCHMARK SUITE")
+    print("="*70)
+    print()
+    
+    results = []
+    for num_docs in args.sizes:
+        print(f"--- {num_docs} documents ---")
+        results.append(run_isolated(num_docs, options))
+        print()
+    print_results(results)
+    
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'options': options,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('options') != options:
+            print(f"Warning: {args.compare} was run with different options: {baseline.get('options')}")
+        print(f"Compared with {baseline.get('commit') or args.compare} ({baseline.get('timestamp')}):")
+        print(f"{'docs':>9}  {'metric':<18}{'before':>12}{'after':>12}{'change':>10}")
+        print("-"*63)
+        regressions = 0
+        for num_docs, metric, old, new, change, regressed in compare_runs(baseline, run, args.threshold):
+            regressions += regressed
+            flag = '  REGRESSION' if regressed else ''
+            print(f"{num_docs:>9}  {metric:<18}{old:>12.2f}{new:>12.2f}{change:>+10.1%}{flag}")
+        print()
+        if regressions:
+            print(f"✗ {regressions} metrics regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"✓ No metric regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
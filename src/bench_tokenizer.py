@@ -0,0 +1,96 @@
+"""
+Benchmark the NLTK and fast tokenizers.
+
+Reports the throughput in MB/s of tokenizing alone (cleaning plus word
+splitting) and of full preprocessing (with stopword removal and cached
+stemming), and the tokens on which the two tokenizers disagree. Uses the
+Gutenberg corpus in data/raw_texts (or another directory given as the
+first argument) if present, and generated prose otherwise.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import time
+from collections import Counter
+import numpy as np
+from src.loader import DocumentLoader
+from src.preprocessing import TextPreprocessor
+from src.corpora import synthetic_documents
+
+
+def generated_texts(num_docs: int = 200) -> list:
+    """Synthetic documents with sentence punctuation, numbers and contractions."""
+    documents, _, _ = synthetic_documents(num_docs, vocab_size=5000)
+    rng = np.random.default_rng(0)
+    extras = np.array([',', '.', ';', "'s", ' -- ', ' 1851', '!', ' (ship)', " don't"])
+    texts = []
+    for doc in documents:
+        words = doc['content'].split()
+        marks = rng.choice(extras, size=len(words))
+        marks[rng.random(len(words)) < 0.8] = ''
+        texts.append(' '.join(word.capitalize() + mark if i % 12 == 0 else word + mark
+                              for i, (word, mark) in enumerate(zip(words, marks))))
+    return texts
+
+
+def throughput(func, texts: list, repeats: int = 3) -> float:
+    """Best MB/s of applying func to every text."""
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / 1e6
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return megabytes / best
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else 'data/raw_texts'
+    
+    print("="*70)
+    print("TOKENIZER BENCHMARK")
+    print("="*70)
+    print()
+    
+    if os.path.isdir(data_dir):
+        texts = [doc['content'] for doc in DocumentLoader(data_dir).load_documents()]
+    else:
+        print(f"{data_dir} not found, using generated text")
+        texts = generated_texts()
+    print(f"{len(texts)} documents, {sum(len(t) for t in texts) / 1e6:.1f} MB")
+    print()
+    
+    nltk_preprocessor = TextPreprocessor()
+    fast = TextPreprocessor(tokenizer='fast')
+    for preprocessor in (nltk_preprocessor, fast):
+        preprocessor.preprocess_documents(texts)  # warm the stem caches
+    
+    print(f"{'tokenizer':<12}{'tokenize MB/s':>15}{'preprocess MB/s':>17}{'tokens':>12}")
+    print("-"*56)
+    for name, preprocessor in (('nltk', nltk_preprocessor), ('fast', fast)):
+        if name == 'nltk':
+            tokenize = lambda text: preprocessor.words(preprocessor.clean_text(text))
+        else:
+            tokenize = preprocessor.words
+        num_tokens = sum(len(preprocessor.preprocess(text)) for text in texts)
+        print(f"{name:<12}{throughput(tokenize, texts):>15.1f}"
+              f"{throughput(preprocessor.preprocess, texts):>17.1f}{num_tokens:>12}")
+    print()
+    
+    expected, tokens = Counter(), Counter()
+    for text in texts:
+        expected.update(nltk_preprocessor.preprocess(text))
+        tokens.update(fast.preprocess(text))
+    only_nltk, only_fast = expected - tokens, tokens - expected
+    agreement = 1 - sum(only_nltk.values()) / max(sum(expected.values()), 1)
+    print(f"Token agreement with NLTK: {agreement:.2%}")
+    print(f"Most common NLTK-only tokens: {only_nltk.most_common(10)}")
+    print(f"Most common fast-only tokens: {only_fast.most_common(10)}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Benchmark document matrix storage types.
+
+Builds the same index with float64, float32, uint16 and uint8 document
+vectors and reports the matrix size, exhaustive and batched query speed,
+and how far rankings move from the float64 baseline: precision@k and
+average precision (via SearchEvaluator, with the float64 top-k as the
+relevant set) and the largest score error of a document found by both.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import time
+import numpy as np
+from src.search import SearchEngine, BM25Model, VECTOR_DTYPES
+from src.evaluation import SearchEvaluator
+from src.corpora import synthetic_documents
+
+
+def matrix_bytes(matrix) -> int:
+    """Bytes held by a CSR matrix."""
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_queries = 200
+    top_k = 10
+    
+    print("="*70)
+    print("DOCUMENT VECTOR DTYPE BENCHMARK")
+    print("="*70)
+    print()
+    
+    documents, words, _ = synthetic_documents(num_docs, vocab_size=5000)
+    rng = np.random.default_rng(1)
+    queries = [' '.join(rng.choice(words[:1000], int(rng.integers(2, 5)))) for _ in range(num_queries)]
+    evaluator = SearchEvaluator()
+    
+    for model in (None, BM25Model()):
+        baseline = None
+        rows = []
+        for dtype in VECTOR_DTYPES:
+            engine = SearchEngine(model=model, strategy='exhaustive', result_cache_size=0,
+                                  vector_dtype=dtype)
+            engine.index_documents(documents)
+            
+            start = time.perf_counter()
+            results = [engine.search(query, top_k) for query in queries]
+            single_ms = (time.perf_counter() - start) / num_queries * 1000
+            start = time.perf_counter()
+            engine.search_many(queries, top_k)
+            batched_qps = num_queries / (time.perf_counter() - start)
+            
+            if baseline is None:
+                baseline = results
+            precisions, average_precisions, errors = [], [], [0.0]
+            for found, reference in zip(results, baseline):
+                relevant = {r['doc_index'] for r in reference}
+                retrieved = [r['doc_index'] for r in found]
+                if relevant:
+                    precisions.append(evaluator.precision_at_k(relevant, retrieved, len(relevant)))
+                    average_precisions.append(evaluator.average_precision(relevant, retrieved))
+                # Score error of each document found by both
+                reference_scores = {r['doc_index']: r['score'] for r in reference}
+                errors += [abs(r['score'] - reference_scores[r['doc_index']])
+                           for r in found if r['doc_index'] in reference_scores]
+            rows.append((dtype, matrix_bytes(engine.doc_vectors), engine.doc_vectors.data.nbytes,
+                         single_ms, batched_qps, np.mean(precisions), np.mean(average_precisions),
+                         max(errors)))
+        
+        print(f"{type(engine.model).__name__}: {num_docs} documents, {num_queries} queries, top {top_k}")
+        print(f"{'dtype':<9}{'matrix MB':>10}{'data MB':>9}{'ms/query':>10}{'batch q/s':>11}"
+              f"{'P@k':>8}{'MAP':>8}{'max error':>12}")
+        print("-"*77)
+        for dtype, size, data_size, single_ms, batched_qps, precision, ap, error in rows:
+            print(f"{dtype:<9}{size / 1e6:>10.2f}{data_size / 1e6:>9.2f}{single_ms:>10.2f}"
+                  f"{batched_qps:>11.0f}{precision:>8.4f}{ap:>8.4f}{error:>12.2e}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,466 @@
+"""
+Out-of-core index construction for collections larger than memory.
+
+SearchEngine.index_documents keeps every document, all term counts and
+the full matrices in memory while it builds. ExternalIndexBuilder writes
+the same on-disk index (see src.storage) within a memory budget, in the
+manner of single-pass in-memory indexing (SPIMI):
+
+1. Documents are streamed in batches and counted over each batch's own
+   vocabulary. When the buffered counts fill their share of the budget
+   they are sorted by term and spilled to disk as a run, together with
+   the run's documents and document lengths.
+2. The sorted term lists of all runs are k-way merged into the global
+   vocabulary, which maps every run's term ids to global ids.
+3. Forward counts are written run by run, and model statistics and
+   document vectors are computed block of rows by block of rows, into
+   memory-mapped files.
+4. Posting lists are merged one range of terms at a time. Each run holds
+   its postings of a range contiguously and in doc id order, so a range
+   is merged by concatenating the runs' slices and grouping by term.
+   Pruning bounds are computed per range as its postings are written.
+
+The assembled engine is saved with SearchEngine.save, and the index is
+opened memory-mapped with SearchEngine.load.
+"""
+
+import os
+import heapq
+import shutil
+import logging
+import tempfile
+import time
+from itertools import count, repeat
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix, csc_matrix
+from src.loader import batched
+from src.vectorizer import PartialCounts, TFIDFVectorizer
+from src.index import InvertedIndex, ImpactFunction, smallest_uint_dtype, UPPER_BOUND_BLOCK_SIZE
+from src.segments import IndexSegment
+from src.search import SearchEngine, row_blocks, rounded_impacts
+from src.storage import (save_array, load_array, save_strings, MappedStrings, save_documents,
+                         MappedDocuments)
+
+logger = logging.getLogger(__name__)
+
+# Share of the memory budget filled with buffered counts and documents
+# before a run is spilled; sorting the run needs about as much again
+SPILL_FRACTION = 0.4
+
+# Approximate working memory per posting while postings are merged or
+# weighted (term, doc and frequency arrays, sort order, gaps, impacts)
+MERGE_BYTES_PER_POSTING = 96
+
+# Approximate memory of one distinct term of a batch (a Python string)
+TERM_BYTES = 64
+
+
+def output_array(path: str, name: str, length: int, dtype) -> np.ndarray:
+    """
+    Create <name>.npy inside a directory and map it for writing.
+    
+    Args:
+        path: Directory
+        name: Array name (without .npy)
+        length: Number of elements
+        dtype: Element type
+    
+    Returns:
+        Writable memory-mapped array (a plain array if empty)
+    """
+    if length == 0:
+        # Zero-length files cannot be mapped
+        save_array(path, name, np.empty(0, dtype=dtype))
+        return np.empty(0, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(path, f'{name}.npy'), mode='w+',
+                                     dtype=dtype, shape=(length,))
+
+
+def partial_nbytes(partial: PartialCounts) -> int:
+    """Approximate memory held by the counts of a chunk."""
+    counts = partial.counts
+    return (counts.data.nbytes + counts.indices.nbytes + counts.indptr.nbytes
+            + partial.doc_lengths.nbytes + TERM_BYTES * len(partial.terms))
+
+
+class SpilledRun:
+    """Term counts of consecutive documents, sorted by term and stored on disk."""
+    
+    def __init__(self, path: str, doc_offset: int, fields: List[str]):
+        """
+        Map a run written by write().
+        
+        Args:
+            path: Run directory
+            doc_offset: Doc id of the run's first document
+            fields: Stored document fields
+        """
+        self.path = path
+        self.doc_offset = doc_offset
+        self.fields = fields
+        self.terms = MappedStrings(path, 'terms')            # sorted run vocabulary
+        self.term_offsets = load_array(path, 'term_offsets')  # run term -> posting range
+        self.doc_ids = load_array(path, 'doc_ids')            # relative to doc_offset
+        self.term_freqs = load_array(path, 'term_freqs')
+        self.doc_lengths = load_array(path, 'doc_lengths')
+        self.term_map: np.ndarray = None  # run term id -> global term id
+    
+    @classmethod
+    def write(cls, path: str, partials: List[PartialCounts], documents: List[Dict[str, str]],
+              doc_offset: int) -> 'SpilledRun':
+        """
+        Sort the buffered counts of a run by term and write them to disk.
+        
+        Args:
+            path: Run directory (created)
+            partials: Partial counts of the run's documents, in order
+            documents: The run's documents
+            doc_offset: Doc id of the run's first document
+        
+        Returns:
+            The written run
+        """
+        vectorizer = TFIDFVectorizer()
+        by_term = vectorizer.fit_partial_counts(partials).tocsc()
+        by_term.sort_indices()
+        
+        os.makedirs(path)
+        save_strings(path, 'terms', list(vectorizer.vocabulary))
+        save_array(path, 'term_offsets', by_term.indptr.astype(np.int64))
+        save_array(path, 'doc_ids', by_term.indices.astype(np.int32))
+        save_array(path, 'term_freqs', by_term.data)
+        save_array(path, 'doc_lengths', np.concatenate([partial.doc_lengths for partial in partials]))
+        fields = save_documents(path, documents)
+        return cls(path, doc_offset, fields)
+    
+    @property
+    def num_documents(self) -> int:
+        """Number of documents in the run."""
+        return len(self.doc_lengths)
+    
+    def postings(self, first_term: int, end_term: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Read the run's postings of a range of global term ids.
+        
+        Args:
+            first_term: First global term id of the range
+            end_term: Global term id after the range
+        
+        Returns:
+            Tuple of (global term_ids, doc_ids, term_freqs), grouped by term
+        """
+        # Run terms are sorted like the vocabulary, so term_map is ascending
+        lo, hi = np.searchsorted(self.term_map, [first_term, end_term])
+        offsets = self.term_offsets[lo:hi + 1]
+        start, stop = offsets[0], offsets[-1]
+        term_ids = np.repeat(self.term_map[lo:hi], np.diff(offsets))
+        doc_ids = self.doc_ids[start:stop].astype(np.int64) + self.doc_offset
+        return term_ids, doc_ids, np.asarray(self.term_freqs[start:stop])
+    
+    def forward_counts(self, vocab_size: int) -> csr_matrix:
+        """
+        Term counts of the run's documents over global term ids.
+        
+        Args:
+            vocab_size: Size of the global vocabulary
+        
+        Returns:
+            Sparse CSR count matrix, one row per document of the run
+        """
+        by_term = csc_matrix((self.term_freqs, self.doc_ids, self.term_offsets),
+                             shape=(self.num_documents, len(self.terms)))
+        counts = by_term.tocsr()
+        counts.sort_indices()
+        return csr_matrix((counts.data, self.term_map[counts.indices], counts.indptr),
+                          shape=(self.num_documents, vocab_size))
+
+
+class ExternalIndexBuilder:
+    """Builds a saved search index from a document stream in bounded memory."""
+    
+    def __init__(self, memory_budget_mb: float = 1024, batch_size: int = 1000,
+                 tmp_dir: str = None, **engine_options):
+        """
+        Initialize the builder.
+        
+        Args:
+            memory_budget_mb: Approximate memory for buffered term counts,
+                documents and merge working sets, in megabytes. Arrays with
+                one entry per document or per term (document lengths,
+                vocabulary, statistics) are held in addition.
+            batch_size: Documents preprocessed at a time
+            tmp_dir: Directory in which a working directory for spilled runs
+                and intermediate arrays is created (default: the index's
+                parent directory); the working directory is removed after
+                the build
+            **engine_options: Passed to SearchEngine, e.g. model, tokenizer,
+                num_workers or vector_dtype. Quantized impacts, compressed
+                postings and positions need every posting in memory and are
+                not supported.
+        """
+        if memory_budget_mb <= 0:
+            raise ValueError("memory_budget_mb must be positive")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        for option in ('quantize_bits', 'codec', 'positional'):
+            if engine_options.get(option):
+                raise ValueError(f"{option} is not supported by the external index builder")
+        SearchEngine(**engine_options)  # validate options before any work
+        
+        self.memory_budget = int(memory_budget_mb * (1 << 20))
+        self.batch_size = batch_size
+        self.tmp_dir = tmp_dir
+        self.engine_options = engine_options
+        self.num_runs = 0  # runs spilled by the last build
+    
+    @property
+    def block_postings(self) -> int:
+        """Postings merged or weighted at a time."""
+        return max(self.memory_budget // MERGE_BYTES_PER_POSTING, 1)
+    
+    def build(self, documents: Iterable[Dict[str, str]], path: str) -> SearchEngine:
+        """
+        Index a document stream and save the index to a directory.
+        
+        Args:
+            documents: Document dicts with 'title' and 'content', e.g.
+                DocumentLoader.stream_documents()
+            path: Target index directory (replaced if it exists)
+        
+        Returns:
+            The saved index, opened with SearchEngine.load
+        """
+        logger.info("Indexing documents out of core...")
+        started = time.perf_counter()
+        parent = self.tmp_dir or os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        work_path = tempfile.mkdtemp(prefix=os.path.basename(path.rstrip(os.sep)) + '.build-',
+                                     dir=parent)
+        
+        try:
+            engine = SearchEngine(**self.engine_options)
+            runs = self._spill_runs(engine, documents, work_path)
+            if not runs:
+                raise ValueError("No documents to index")
+            self._assemble(engine, runs, work_path)
+            logger.info("Saving index...")
+            engine.save(path)
+        finally:
+            shutil.rmtree(work_path, ignore_errors=True)
+        
+        loaded = SearchEngine.load(path)
+        logger.info("Indexed %d documents from %d runs in %.2fs",
+                    len(loaded.documents), len(runs), time.perf_counter() - started)
+        return loaded
+    
+    def _spill_runs(self, engine: SearchEngine, documents: Iterable[Dict[str, str]],
+                    work_path: str) -> List[SpilledRun]:
+        """Count documents batch by batch, spilling a run whenever the buffer is full."""
+        logger.info("Preprocessing text and spilling runs...")
+        runs = []
+        partials, buffered, buffered_bytes = [], [], 0
+        doc_offset = 0
+        for batch in batched(documents, self.batch_size):
+            batch_partials = engine.preprocessor.count_documents(
+                [doc['content'] for doc in batch], num_workers=engine.num_workers)
+            partials += batch_partials
+            buffered.extend(batch)
+            buffered_bytes += sum(map(partial_nbytes, batch_partials))
+            buffered_bytes += sum(len(value) for doc in batch for value in doc.values())
+            if buffered_bytes >= self.memory_budget * SPILL_FRACTION:
+                runs.append(self._spill(partials, buffered, doc_offset, work_path, len(runs)))
+                doc_offset += len(buffered)
+                partials, buffered, buffered_bytes = [], [], 0
+        if buffered:
+            runs.append(self._spill(partials, buffered, doc_offset, work_path, len(runs)))
+        self.num_runs = len(runs)
+        return runs
+    
+    @staticmethod
+    def _spill(partials: List[PartialCounts], documents: List[Dict[str, str]], doc_offset: int,
+               work_path: str, run_number: int) -> SpilledRun:
+        """Write one run and log it."""
+        run = SpilledRun.write(os.path.join(work_path, f'run_{run_number:05d}'), partials,
+                               documents, doc_offset)
+        logger.info("Run %d: %d documents, %d postings",
+                    run_number, run.num_documents, len(run.doc_ids))
+        return run
+    
+    def _assemble(self, engine: SearchEngine, runs: List[SpilledRun], work_path: str) -> None:
+        """Merge the runs into the engine's vocabulary, matrices, index and documents."""
+        logger.info("Merging the vocabularies of %d runs...", len(runs))
+        vocabulary = self._merge_vocabularies(runs)
+        vocab_size = len(vocabulary)
+        num_documents = sum(run.num_documents for run in runs)
+        doc_freq = np.zeros(vocab_size, dtype=np.int64)
+        for run in runs:
+            doc_freq[run.term_map] += np.diff(run.term_offsets)
+        
+        vectorizer = engine.vectorizer
+        vectorizer.vocabulary = {term: idx for idx, term in enumerate(vocabulary)}
+        vectorizer.doc_freq = doc_freq
+        vectorizer.num_documents = num_documents
+        vectorizer.compute_idf()
+        engine.doc_lengths = np.concatenate([run.doc_lengths for run in runs])
+        engine.deleted = np.zeros(num_documents, dtype=bool)
+        
+        logger.info("Writing document vectors...")
+        counts = self._write_counts(runs, work_path, num_documents, vocab_size)
+        engine.model.fit(vectorizer, counts, engine.doc_lengths, live_docs=~engine.deleted)
+        doc_vectors, vector_scales = self._write_doc_vectors(engine, counts, work_path)
+        
+        logger.info("Merging posting lists...")
+        # Bounds use impacts rounded like the vectors, as SearchEngine's do
+        impact = rounded_impacts(engine.model.document_impacts, engine.vector_dtype, vector_scales)
+        index = self._merge_postings(runs, doc_freq, num_documents, impact, work_path)
+        segment = IndexSegment(counts, index)
+        segment.vectors, segment.vector_scales = doc_vectors, vector_scales
+        engine.segments = [segment]
+        engine.documents = self._merge_documents(runs, num_documents, work_path)
+        engine.is_fitted = True
+    
+    @staticmethod
+    def _merge_vocabularies(runs: List[SpilledRun]) -> List[str]:
+        """K-way merge the sorted run vocabularies, setting each run's term map."""
+        vocabulary = []
+        for run in runs:
+            run.term_map = np.empty(len(run.terms), dtype=np.int64)
+        streams = [zip(run.terms, repeat(run_idx), count()) for run_idx, run in enumerate(runs)]
+        for term, run_idx, term_idx in heapq.merge(*streams):
+            if not vocabulary or vocabulary[-1] != term:
+                vocabulary.append(term)
+            runs[run_idx].term_map[term_idx] = len(vocabulary) - 1
+        return vocabulary
+    
+    @staticmethod
+    def _write_counts(runs: List[SpilledRun], work_path: str, num_documents: int,
+                      vocab_size: int) -> csr_matrix:
+        """Write the forward count matrix run by run into mapped arrays."""
+        num_postings = sum(len(run.doc_ids) for run in runs)
+        # One index type for both arrays, so SciPy does not convert (copy) either
+        index_dtype = np.int32 if num_postings <= np.iinfo(np.int32).max else np.int64
+        data = output_array(work_path, 'counts_data', num_postings, np.int32)
+        indices = output_array(work_path, 'counts_indices', num_postings, index_dtype)
+        indptr = output_array(work_path, 'counts_indptr', num_documents + 1, index_dtype)
+        indptr[0] = 0
+        
+        nnz = 0
+        for run in runs:
+            counts = run.forward_counts(vocab_size)
+            data[nnz:nnz + counts.nnz] = counts.data
+            indices[nnz:nnz + counts.nnz] = counts.indices
+            indptr[run.doc_offset + 1:run.doc_offset + run.num_documents + 1] = counts.indptr[1:] + nnz
+            nnz += counts.nnz
+        return csr_matrix((data, indices, indptr), shape=(num_documents, vocab_size), copy=False)
+    
+    def _write_doc_vectors(self, engine: SearchEngine, counts: csr_matrix,
+                           work_path: str) -> Tuple[csr_matrix, np.ndarray]:
+        """
+        Write the model impacts of every count, as SearchEngine stores them.
+        
+        Integer types take a first pass for the per-term maximum impacts
+        (see compact_vectors).
+        """
+        def block_impacts(start: int, stop: int, block: csr_matrix) -> np.ndarray:
+            rows = np.repeat(np.arange(start, stop), np.diff(block.indptr))
+            return engine.model.document_impacts(block.indices, rows, block.data)
+        
+        dtype = engine.vector_dtype
+        scales = None
+        if dtype.startswith('uint'):
+            max_impacts = np.zeros(counts.shape[1])
+            for start, stop, block in row_blocks(counts, self.block_postings):
+                np.maximum.at(max_impacts, block.indices, block_impacts(start, stop, block))
+            scales = max_impacts / np.iinfo(dtype).max
+        
+        data = output_array(work_path, 'doc_vectors_data', counts.nnz, dtype)
+        for start, stop, block in row_blocks(counts, self.block_postings):
+            impacts = block_impacts(start, stop, block)
+            if scales is not None:
+                posting_scales = scales[block.indices]
+                impacts = np.rint(np.divide(impacts, posting_scales, out=np.zeros(block.nnz),
+                                            where=posting_scales > 0))
+            first = counts.indptr[start]
+            data[first:first + block.nnz] = impacts
+        return csr_matrix((data, counts.indices, counts.indptr), shape=counts.shape, copy=False), scales
+    
+    def _merge_postings(self, runs: List[SpilledRun], doc_freq: np.ndarray, num_documents: int,
+                        impact: ImpactFunction, work_path: str) -> InvertedIndex:
+        """Merge the runs' postings one range of terms at a time into mapped arrays."""
+        vocab_size = len(doc_freq)
+        term_offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=term_offsets[1:])
+        block_offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(-(-doc_freq // UPPER_BOUND_BLOCK_SIZE), out=block_offsets[1:])
+        max_freq = max(int(run.term_freqs.max(initial=0)) for run in runs)
+        
+        index = InvertedIndex()
+        index.num_documents = num_documents
+        index.term_offsets = term_offsets
+        index.doc_gaps = output_array(work_path, 'index_doc_gaps', term_offsets[-1],
+                                      smallest_uint_dtype(num_documents - 1))
+        index.term_freqs = output_array(work_path, 'index_term_freqs', term_offsets[-1],
+                                        smallest_uint_dtype(max_freq))
+        index.block_size = UPPER_BOUND_BLOCK_SIZE
+        index.term_max_impacts = np.zeros(vocab_size)
+        index.block_offsets = block_offsets
+        index.block_last_docs = output_array(work_path, 'index_block_last_docs', block_offsets[-1],
+                                             np.int64)
+        index.block_max_impacts = output_array(work_path, 'index_block_max_impacts',
+                                               block_offsets[-1], np.float64)
+        
+        first = 0
+        while first < vocab_size:
+            end = max(int(np.searchsorted(term_offsets, term_offsets[first] + self.block_postings,
+                                          side='right')) - 1, first + 1)
+            end = min(end, vocab_size)
+            
+            # Runs cover ascending doc ranges, so a stable sort by term keeps doc order
+            parts = [run.postings(first, end) for run in runs]
+            term_ids = np.concatenate([part[0] for part in parts])
+            order = np.argsort(term_ids, kind='stable')
+            chunk = InvertedIndex()
+            chunk.build_from_postings(term_offsets[first:end + 1] - term_offsets[first],
+                                      np.concatenate([part[1] for part in parts])[order],
+                                      np.concatenate([part[2] for part in parts])[order],
+                                      num_documents)
+            chunk.compute_upper_bounds(lambda term_id, doc_ids, term_freqs:
+                                       impact(term_id + first, doc_ids, term_freqs))
+            
+            start, stop = term_offsets[first], term_offsets[end]
+            index.doc_gaps[start:stop] = chunk.doc_gaps
+            index.term_freqs[start:stop] = chunk.term_freqs
+            index.term_max_impacts[first:end] = chunk.term_max_impacts
+            start, stop = block_offsets[first], block_offsets[end]
+            index.block_last_docs[start:stop] = chunk.block_last_docs
+            index.block_max_impacts[start:stop] = chunk.block_max_impacts
+            first = end
+        return index
+    
+    @staticmethod
+    def _merge_documents(runs: List[SpilledRun], num_documents: int,
+                         work_path: str) -> MappedDocuments:
+        """Concatenate the runs' stored document fields into mapped stores."""
+        fields = sorted({field for run in runs for field in run.fields})
+        for field in fields:
+            stores = [MappedStrings(run.path, f'doc_{field}') if field in run.fields else None
+                      for run in runs]
+            num_bytes = sum(len(store.data) for store in stores if store is not None)
+            data = output_array(work_path, f'doc_{field}', num_bytes, np.uint8)
+            offsets = output_array(work_path, f'doc_{field}_offsets', num_documents + 1, np.int64)
+            present = output_array(work_path, f'doc_{field}_present', num_documents, bool)
+            offsets[0] = 0
+            
+            position = 0
+            for run, store in zip(runs, stores):
+                rows = slice(run.doc_offset, run.doc_offset + run.num_documents)
+                if store is None:
+                    offsets[rows.start + 1:rows.stop + 1] = position
+                    present[rows] = False
+                    continue
+                data[position:position + len(store.data)] = store.data
+                offsets[rows.start + 1:rows.stop + 1] = store.offsets[1:] + position
+                present[rows] = load_array(run.path, f'doc_{field}_present')
+                position += len(store.data)
+        return MappedDocuments(work_path, fields, num_documents)
\ No newline at end of file
@@ -0,0 +1,450 @@
+"""
+Block-wise compression of posting arrays.
+
+A posting array (doc id gaps or term frequencies) is cut into blocks that
+never span two posting lists, and every block is encoded by a codec:
+    varbyte    7 value bits per byte; the high bit marks a value's last byte
+    simple8b   64-bit words of a 4-bit selector and as many equal-width
+               values as fit in the other 60 bits
+    bitpack    frame of reference: the block minimum, a bit width, and
+               every value minus the minimum packed in that many bits
+Each block starts at a recorded data offset (its skip pointer), so any
+block can be decoded without the ones before it. Encoding and decoding
+work on many blocks at once with NumPy instead of value by value.
+"""
+
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Dict, Tuple
+from src.storage import save_array, load_array
+
+
+def take_ragged(values: np.ndarray, offsets: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    Gather groups of a ragged array.
+    
+    Args:
+        values: Flat values of all groups
+        offsets: Start of every group in values, plus the total length
+        groups: Indices of the groups to gather, in output order
+    
+    Returns:
+        Flat values of the selected groups
+    """
+    lengths = offsets[groups + 1] - offsets[groups]
+    output_starts = np.cumsum(lengths) - lengths
+    shift = np.repeat(offsets[groups] - output_starts, lengths)
+    return values[shift + np.arange(len(shift))]
+
+
+def bit_lengths(values: np.ndarray) -> np.ndarray:
+    """Number of bits needed for each unsigned value (0 for 0)."""
+    # frexp can only overestimate for values beyond 2^53, never underestimate
+    return np.frexp(values.astype(np.float64))[1].astype(np.int64)
+
+
+def list_blocks(list_offsets: np.ndarray, block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cut consecutive lists into blocks of at most block_size values.
+    
+    Args:
+        list_offsets: Start of every list, plus the total length
+        block_size: Values per block (the last block of a list may be shorter)
+    
+    Returns:
+        Tuple of (start of every block plus the total length, first block
+        of every list plus the number of blocks)
+    """
+    list_lengths = np.diff(list_offsets)
+    blocks_per_list = -(-list_lengths // block_size)
+    list_block_offsets = np.zeros(len(list_lengths) + 1, dtype=np.int64)
+    np.cumsum(blocks_per_list, out=list_block_offsets[1:])
+    
+    block_rank = np.arange(list_block_offsets[-1]) - np.repeat(list_block_offsets[:-1], blocks_per_list)
+    block_offsets = np.empty(list_block_offsets[-1] + 1, dtype=np.int64)
+    block_offsets[:-1] = np.repeat(list_offsets[:-1], blocks_per_list) + block_rank * block_size
+    block_offsets[-1] = list_offsets[-1]
+    return block_offsets, list_block_offsets
+
+
+def cumsum_blocks(gaps: np.ndarray, lengths: np.ndarray, bases: np.ndarray) -> np.ndarray:
+    """
+    Turn the gaps of consecutive blocks back into values.
+    
+    Args:
+        gaps: Gaps of all blocks, concatenated
+        lengths: Number of gaps in each block
+        bases: Value that each block's gaps are relative to
+    
+    Returns:
+        Running sums restarted at every block, plus its base
+    """
+    values = np.cumsum(gaps, dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+    nonempty = lengths > 0
+    carried = np.where(starts[nonempty] > 0, values[starts[nonempty] - 1], 0)
+    values += np.repeat(bases[nonempty] - carried, lengths[nonempty])
+    return values
+
+
+class PostingCodec(ABC):
+    """Encodes blocks of unsigned integers into a flat data array."""
+    
+    NAME = None
+    
+    @abstractmethod
+    def encode(self, values: np.ndarray, block_offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode every block of an array.
+        
+        Args:
+            values: Unsigned values
+            block_offsets: Start of every block, plus the total length
+        
+        Returns:
+            Tuple of (data, start of every block in data plus its length)
+        """
+    
+    @abstractmethod
+    def decode(self, data: np.ndarray, data_offsets: np.ndarray, lengths: np.ndarray,
+               blocks: np.ndarray) -> np.ndarray:
+        """
+        Decode some blocks.
+        
+        Args:
+            data: Encoded data of all blocks
+            data_offsets: Start of every block in data, plus its length
+            lengths: Number of values in each selected block
+            blocks: Indices of the blocks to decode, in output order
+        
+        Returns:
+            Values of the selected blocks as uint64, concatenated
+        """
+
+
+class VarByteCodec(PostingCodec):
+    """Variable-byte codes: 7 bits per byte, least significant group first."""
+    
+    NAME = 'varbyte'
+    
+    def encode(self, values: np.ndarray, block_offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        data, value_bytes = self.encode_values(values)
+        byte_offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(value_bytes, out=byte_offsets[1:])
+        return data, byte_offsets[block_offsets]
+    
+    def decode(self, data: np.ndarray, data_offsets: np.ndarray, lengths: np.ndarray,
+               blocks: np.ndarray) -> np.ndarray:
+        encoded = take_ragged(data, data_offsets, blocks).astype(np.uint64)
+        if not len(encoded):
+            return encoded
+        
+        # Every value ends at a byte with the high bit set
+        ends = np.flatnonzero(encoded & 0x80)
+        starts = np.empty_like(ends)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        byte_rank = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+        groups = (encoded & 0x7F) << (7 * byte_rank).astype(np.uint64)
+        return np.bitwise_or.reduceat(groups, starts)
+    
+    @staticmethod
+    def encode_values(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Variable-byte encode a sequence of values.
+        
+        Returns:
+            Tuple of (encoded bytes, number of bytes of each value)
+        """
+        values = values.astype(np.uint64)
+        value_bytes = np.maximum(1, (bit_lengths(values) + 6) // 7)
+        starts = np.cumsum(value_bytes) - value_bytes
+        owners = np.repeat(np.arange(len(values)), value_bytes)
+        byte_rank = np.arange(len(owners)) - starts[owners]
+        
+        data = ((values[owners] >> (7 * byte_rank).astype(np.uint64)) & 0x7F).astype(np.uint8)
+        data[starts + value_bytes - 1] |= 0x80
+        return data, value_bytes
+
+
+class Simple8bCodec(PostingCodec):
+    """Simple-8b: each 64-bit word packs n values of equal bit width."""
+    
+    NAME = 'simple8b'
+    
+    # (values per word, bits per value) of each 4-bit selector
+    SELECTORS = ((240, 0), (120, 0), (60, 1), (30, 2), (20, 3), (15, 4), (12, 5), (10, 6),
+                 (8, 7), (7, 8), (6, 10), (5, 12), (4, 15), (3, 20), (2, 30), (1, 60))
+    COUNTS = np.array([count for count, _ in SELECTORS])
+    BITS = np.array([bits for _, bits in SELECTORS], dtype=np.uint64)
+    
+    def encode(self, values: np.ndarray, block_offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        values = values.astype(np.uint64)
+        widths = bit_lengths(values)
+        if widths.max(initial=0) > 60:
+            raise ValueError("Simple-8b can only encode values below 2^60")
+        
+        # Values left in the block from each position
+        n = len(values)
+        block_lengths = np.diff(block_offsets)
+        remaining = np.repeat(block_offsets[1:], block_lengths) - np.arange(n)
+        
+        # Densest selector that fits at each position: max widths over
+        # windows come from a table of maxima over power-of-two windows
+        window_max = [widths]
+        while (1 << len(window_max)) <= self.COUNTS[0] and (1 << len(window_max)) <= n:
+            half = 1 << (len(window_max) - 1)
+            previous = window_max[-1]
+            window_max.append(np.maximum(previous, np.append(previous[half:], np.zeros(half, np.int64))))
+        choice = np.full(n, len(self.SELECTORS) - 1)
+        for selector in range(len(self.SELECTORS) - 2, -1, -1):
+            count, bits = self.SELECTORS[selector]
+            if count > n:
+                continue
+            level = count.bit_length() - 1
+            table = window_max[level]
+            tail = np.minimum(np.arange(n) + count - (1 << level), n - 1)
+            fits = (remaining >= count) & (np.maximum(table, table[tail]) <= bits)
+            choice[fits] = selector
+        
+        # Greedily take the chosen selector at the start of each word
+        counts = self.COUNTS[choice].tolist()
+        word_starts = []
+        position = 0
+        while position < n:
+            word_starts.append(position)
+            position += counts[position]
+        word_starts = np.array(word_starts, dtype=np.int64)
+        
+        selectors = choice[word_starts]
+        word_counts = self.COUNTS[selectors]
+        owners = np.repeat(np.arange(len(word_starts)), word_counts)
+        rank = np.arange(n) - np.repeat(word_starts, word_counts)
+        shifted = values << (rank.astype(np.uint64) * self.BITS[selectors][owners])
+        data = (selectors.astype(np.uint64) << np.uint64(60))
+        if n:
+            data |= np.bitwise_or.reduceat(shifted, word_starts)
+        
+        # Words never span blocks, so every block starts at a word
+        return data, np.searchsorted(word_starts, block_offsets).astype(np.int64)
+    
+    def decode(self, data: np.ndarray, data_offsets: np.ndarray, lengths: np.ndarray,
+               blocks: np.ndarray) -> np.ndarray:
+        words = take_ragged(data, data_offsets, blocks)
+        selectors = (words >> np.uint64(60)).astype(np.int64)
+        counts = self.COUNTS[selectors]
+        bits = self.BITS[selectors]
+        
+        owners = np.repeat(np.arange(len(words)), counts)
+        rank = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        masks = (np.uint64(1) << bits) - np.uint64(1)
+        return (words[owners] >> (rank.astype(np.uint64) * bits[owners])) & masks[owners]
+
+
+class BitPackCodec(PostingCodec):
+    """
+    Frame-of-reference bit packing.
+    
+    A block is stored as one byte holding the bit width, the block minimum
+    as a variable-byte code, and then the packed differences to the minimum.
+    """
+    
+    NAME = 'bitpack'
+    
+    # Differences are shifted by up to 7 bits within a 64-bit word when packed
+    MAX_BITS = 57
+    
+    def encode(self, values: np.ndarray, block_offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        values = values.astype(np.uint64)
+        block_lengths = np.diff(block_offsets)
+        starts = block_offsets[:-1]
+        if not len(values):
+            return np.zeros(16, dtype=np.uint8), np.zeros(len(block_offsets), dtype=np.int64)
+        
+        minimums = np.minimum.reduceat(values, starts)
+        deltas = values - np.repeat(minimums, block_lengths)
+        widths = bit_lengths(np.maximum.reduceat(deltas, starts))
+        if widths.max(initial=0) > self.MAX_BITS:
+            raise ValueError(f"Bit packing supports at most {self.MAX_BITS}-bit differences")
+        
+        # Packed bytes: every value is shifted to its bit offset and its
+        # 8 bytes are added at its byte offset (bits never overlap)
+        packed_bytes = (block_lengths * widths + 7) // 8
+        packed_starts = np.cumsum(packed_bytes) - packed_bytes
+        value_widths = np.repeat(widths, block_lengths)
+        bit_offsets = (np.arange(len(values)) - np.repeat(starts, block_lengths)) * value_widths
+        shifted = (deltas << (bit_offsets % 8).astype(np.uint64)).astype('<u8').view(np.uint8)
+        byte_positions = (np.repeat(packed_starts, block_lengths) + bit_offsets // 8)[:, None] + np.arange(8)
+        packed = np.bincount(byte_positions.ravel(), weights=shifted,
+                             minlength=packed_bytes.sum() + 8)[:packed_bytes.sum()].astype(np.uint8)
+        
+        # Assemble header (width, minimum) and packed bytes of each block
+        minimum_data, minimum_bytes = VarByteCodec.encode_values(minimums)
+        block_bytes = 1 + minimum_bytes + packed_bytes
+        data_offsets = np.zeros(len(block_offsets), dtype=np.int64)
+        np.cumsum(block_bytes, out=data_offsets[1:])
+        # Padded to whole 64-bit words, plus one, for decoding
+        data = np.zeros((data_offsets[-1] // 8 + 2) * 8, dtype=np.uint8)
+        data[data_offsets[:-1]] = widths
+        data[self._ranges(data_offsets[:-1] + 1, minimum_bytes)] = minimum_data
+        data[self._ranges(data_offsets[:-1] + 1 + minimum_bytes, packed_bytes)] = packed
+        return data, data_offsets
+    
+    def decode(self, data: np.ndarray, data_offsets: np.ndarray, lengths: np.ndarray,
+               blocks: np.ndarray) -> np.ndarray:
+        offsets = data_offsets[blocks].astype(np.int64)
+        widths = data[offsets].astype(np.uint64)
+        
+        # Block minimums: variable-byte codes of at most 10 bytes
+        minimums = np.zeros(len(blocks), dtype=np.uint64)
+        position = offsets + 1
+        active = np.ones(len(blocks), dtype=bool)
+        for shift in range(0, 70, 7):
+            if not active.any():
+                break
+            byte = data[position].astype(np.uint64)
+            minimums |= np.where(active, (byte & 0x7F) << np.uint64(shift), 0).astype(np.uint64)
+            ended = active & ((byte & 0x80) > 0)
+            position = np.where(active, position + 1, position)
+            active &= ~ended
+        
+        # Each value lies in at most two consecutive 64-bit words
+        words = data.view('<u8')
+        value_widths = np.repeat(widths, lengths)
+        rank = np.arange(len(value_widths)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        bit_positions = (np.repeat(position, lengths).astype(np.uint64) * np.uint64(8)
+                         + rank.astype(np.uint64) * value_widths)
+        word_index = (bit_positions >> np.uint64(6)).astype(np.int64)
+        shifts = bit_positions & np.uint64(63)
+        # Shifting in two steps keeps the shift below 64 when shifts == 0
+        high = (words[word_index + 1] << np.uint64(1)) << (np.uint64(63) - shifts)
+        masks = (np.uint64(1) << value_widths) - np.uint64(1)
+        return (((words[word_index] >> shifts) | high) & masks) + np.repeat(minimums, lengths)
+    
+    @staticmethod
+    def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Concatenated index ranges [start, start + length)."""
+        return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+
+
+CODECS = {codec.NAME: codec for codec in (VarByteCodec(), Simple8bCodec(), BitPackCodec())}
+
+
+class CompressedArray:
+    """
+    Read-only unsigned integer array stored as encoded blocks.
+    
+    Slicing decodes only the blocks that overlap the slice; np.asarray()
+    decodes everything.
+    """
+    
+    def __init__(self, codec: str, data: np.ndarray, data_offsets: np.ndarray,
+                 block_offsets: np.ndarray, dtype: np.dtype):
+        """
+        Wrap already encoded blocks.
+        
+        Args:
+            codec: Name of the codec in CODECS
+            data: Encoded blocks
+            data_offsets: Start of every block in data, plus its length
+            block_offsets: Start of every block in the array, plus its length
+            dtype: Dtype of decoded values
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Choose from {tuple(CODECS)}")
+        self.codec = codec
+        self.data = data
+        self.data_offsets = data_offsets
+        self.block_offsets = block_offsets
+        self.dtype = np.dtype(dtype)
+    
+    @classmethod
+    def encode(cls, values: np.ndarray, block_offsets: np.ndarray, codec: str) -> 'CompressedArray':
+        """
+        Compress an array block by block.
+        
+        Args:
+            values: Unsigned values
+            block_offsets: Start of every block, plus the total length
+            codec: Name of the codec in CODECS
+        
+        Returns:
+            Compressed array
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Choose from {tuple(CODECS)}")
+        values = np.asarray(values)
+        data, data_offsets = CODECS[codec].encode(values, block_offsets)
+        # Offsets stay signed so that index arithmetic never turns into floats
+        offsets_dtype = np.int32 if data_offsets[-1] <= np.iinfo(np.int32).max else np.int64
+        return cls(codec, data, data_offsets.astype(offsets_dtype), block_offsets, values.dtype)
+    
+    def __len__(self) -> int:
+        return int(self.block_offsets[-1])
+    
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded data and skip pointers."""
+        return self.data.nbytes + self.data_offsets.nbytes
+    
+    def decode_blocks(self, blocks: np.ndarray) -> np.ndarray:
+        """
+        Decode some blocks.
+        
+        Args:
+            blocks: Block indices, in output order
+        
+        Returns:
+            Values of the blocks, concatenated
+        """
+        lengths = self.block_offsets[blocks + 1] - self.block_offsets[blocks]
+        values = CODECS[self.codec].decode(self.data, self.data_offsets, lengths, blocks)
+        return values.astype(self.dtype)
+    
+    def __getitem__(self, key: slice) -> np.ndarray:
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("CompressedArray only supports contiguous slices")
+        start, stop, _ = key.indices(len(self))
+        if start >= stop:
+            return np.empty(0, dtype=self.dtype)
+        first = np.searchsorted(self.block_offsets, start, side='right') - 1
+        last = np.searchsorted(self.block_offsets, stop, side='left')
+        values = self.decode_blocks(np.arange(first, last))
+        base = self.block_offsets[first]
+        return values[start - base:stop - base]
+    
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self.decode_blocks(np.arange(len(self.block_offsets) - 1))
+        return values if dtype is None else values.astype(dtype)
+    
+    def save(self, path: str, prefix: str) -> Dict:
+        """
+        Write the encoded arrays into an index directory.
+        
+        Args:
+            path: Index directory
+            prefix: Prefix for the array file names
+        
+        Returns:
+            State to record in the manifest
+        """
+        save_array(path, f'{prefix}_data', self.data)
+        save_array(path, f'{prefix}_data_offsets', self.data_offsets)
+        return {'codec': self.codec, 'dtype': self.dtype.str}
+    
+    @classmethod
+    def load(cls, path: str, state: Dict, prefix: str, block_offsets: np.ndarray) -> 'CompressedArray':
+        """
+        Memory-map an array written by save().
+        
+        Args:
+            path: Index directory
+            state: State returned by save()
+            prefix: Prefix used when saving
+            block_offsets: Block boundaries the array was encoded with
+        
+        Returns:
+            Compressed array backed by read-only mapped arrays
+        """
+        return cls(state['codec'], load_array(path, f'{prefix}_data'),
+                   load_array(path, f'{prefix}_data_offsets'), block_offsets, state['dtype'])
\ No newline at end of file
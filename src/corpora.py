@@ -0,0 +1,155 @@
+"""
+Document collections and generators shared by the tests and benchmarks.
+
+sample_documents is a small hand-written corpus with overlapping
+vocabulary; synthetic_documents and topical_documents generate larger
+corpora of pseudo-words with Zipf-distributed frequencies, and
+random_index builds an inverted index over random term counts.
+"""
+
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from scipy.sparse import random as sparse_random
+from src.index import InvertedIndex
+
+# Queries over sample_documents; every one matches several documents
+SAMPLE_QUERIES = ("whale ocean", "night castle", "detective crime", "captain ships treasure", "garden roses")
+
+
+def sample_documents(with_empty: bool = False) -> List[Dict[str, str]]:
+    """
+    Small corpus; later documents introduce new terms.
+    
+    Args:
+        with_empty: Append a document made only of stopwords
+    
+    Returns:
+        Document dicts with 'title' and 'content'
+    """
+    documents = [
+        {'title': 'Whales', 'content': 'The whale swam through the ocean. Sailors hunted the great whale at sea.'},
+        {'title': 'Detectives', 'content': 'The detective solved the mystery. A crime was committed and the detective found clues.'},
+        {'title': 'Vampires', 'content': 'The vampire drank blood at night. Blood and darkness filled the castle.'},
+        {'title': 'Sea Stories', 'content': 'Ships sailed the sea and the ocean. The captain watched the waves at night.'},
+        {'title': 'Gardens', 'content': 'Flowers bloomed in the garden in spring. The gardener watered the roses.'},
+        {'title': 'Pirates', 'content': 'Pirates sailed the ocean looking for treasure. The captain buried gold on an island.'},
+        {'title': 'Ghosts', 'content': 'A ghost haunted the castle at night. The detective heard chains in the darkness.'},
+        {'title': 'Harbour', 'content': 'Ships returned to the harbour. Sailors sold whale oil and fish at the market.'},
+    ]
+    if with_empty:
+        documents.append({'title': 'Empty', 'content': 'the and of'})
+    return documents
+
+
+def pseudo_words(rng: np.random.Generator, vocab_size: int) -> List[str]:
+    """Distinct-looking six-consonant words ending in 'a'."""
+    letters = np.array(list('bcdfghjklmnpqrstvwxz'))
+    return [''.join(code) + 'a' for code in rng.choice(letters, size=(vocab_size, 6))]
+
+
+def zipf_probabilities(vocab_size: int) -> np.ndarray:
+    """Word probabilities proportional to 1 / rank."""
+    probs = 1.0 / np.arange(1, vocab_size + 1)
+    return probs / probs.sum()
+
+
+def synthetic_documents(num_docs: int, vocab_size: int, seed: int = 0,
+                        chunk_size: int = 10000) -> Tuple[List[Dict[str, str]], List[str], np.ndarray]:
+    """
+    Generate documents with Zipf-distributed pseudo-words.
+    
+    Words are drawn for many documents at once, so a million documents
+    take seconds rather than minutes.
+    
+    Args:
+        num_docs: Number of documents
+        vocab_size: Number of distinct words
+        seed: Random seed
+        chunk_size: Documents generated per batch of draws
+    
+    Returns:
+        Tuple of (documents, words, word probabilities)
+    """
+    rng = np.random.default_rng(seed)
+    words = pseudo_words(rng, vocab_size)
+    probs = zipf_probabilities(vocab_size)
+    cumulative = np.cumsum(probs)
+    word_array = np.array(words, dtype=object)
+    
+    documents = []
+    for start in range(0, num_docs, chunk_size):
+        lengths = rng.integers(20, 300, size=min(chunk_size, num_docs - start))
+        tokens = np.minimum(np.searchsorted(cumulative, rng.random(int(lengths.sum()))), vocab_size - 1)
+        chunk_words = word_array[tokens].tolist()
+        offsets = np.concatenate(([0], np.cumsum(lengths))).tolist()
+        for i, (begin, end) in enumerate(zip(offsets, offsets[1:]), start):
+            documents.append({'title': f'Document {i}', 'content': ' '.join(chunk_words[begin:end])})
+    return documents, words, probs
+
+
+def topical_documents(num_docs: int, vocab_size: int, num_topics: int = 50, seed: int = 0):
+    """
+    Generate documents from a mixture of topics.
+    
+    Half of every document's words come from a Zipf distribution shared by
+    all topics and half from its topic's own Zipf distribution over a
+    shuffled vocabulary, so documents of one topic share their distinctive
+    words.
+    
+    Args:
+        num_docs: Number of documents
+        vocab_size: Number of distinct words
+        num_topics: Number of topics
+        seed: Random seed
+    
+    Returns:
+        Tuple of (documents, words, topic of each document, per-topic word
+        probabilities (num_topics x vocab_size))
+    """
+    rng = np.random.default_rng(seed)
+    words = pseudo_words(rng, vocab_size)
+    zipf = zipf_probabilities(vocab_size)
+    topic_probs = np.array([zipf[np.argsort(rng.permutation(vocab_size))] for _ in range(num_topics)])
+    mixtures = 0.5 * zipf + 0.5 * topic_probs
+    
+    topics = rng.integers(num_topics, size=num_docs)
+    documents = []
+    for i, topic in enumerate(topics):
+        tokens = np.searchsorted(np.cumsum(mixtures[topic]), rng.random(int(rng.integers(20, 300))))
+        documents.append({
+            'title': f'Document {i} (topic {topic})',
+            'content': ' '.join(words[min(t, vocab_size - 1)] for t in tokens)
+        })
+    return documents, words, topics, topic_probs
+
+
+def random_index(num_docs: int = 400, vocab_size: int = 60,
+                 seed: int = 0) -> Tuple[InvertedIndex, Callable]:
+    """
+    Build an index over random term counts with a TF-IDF style impact.
+    
+    Some rows are duplicated, so ties have to be broken by doc id.
+    
+    Args:
+        num_docs: Number of distinct random documents
+        vocab_size: Number of terms
+        seed: Random seed
+    
+    Returns:
+        Tuple of (index, impact function of (term_id, doc_ids, term_freqs))
+    """
+    counts = sparse_random(num_docs, vocab_size, density=0.1, format='csr',
+                           random_state=seed, dtype=np.float64)
+    counts.data = np.ceil(counts.data * 4)
+    counts = counts.astype(np.int32)
+    counts = counts[np.r_[np.arange(num_docs), np.arange(0, num_docs, 7)]]
+    
+    doc_lengths = np.asarray(counts.sum(axis=1)).ravel() + 1
+    idf = np.log((counts.shape[0] + 1) / (np.bincount(counts.indices, minlength=vocab_size) + 1))
+    
+    def impact(term_id, doc_ids, term_freqs):
+        return term_freqs / doc_lengths[doc_ids] * idf[term_id]
+    
+    index = InvertedIndex()
+    index.build(counts)
+    return index, impact
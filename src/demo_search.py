@@ -4,28 +4,39 @@ Interactive search engine demo.
 
 import sys
 import os
-project_root = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
+import logging
 from src.loader import DocumentLoader
 from src.search import SearchEngine
 
+INDEX_DIR = 'data/index'
+
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     print("="*70)
     print("DOCUMENT SEARCH ENGINE - Interactive Demo")
     print("="*70)
     print()
     
-    # Load documents
-    print("Loading documents...")
-    loader = DocumentLoader('data/raw_texts')
-    documents = loader.load_documents()
-    print()
-    
-    # Build search index
-    search_engine = SearchEngine()
-    search_engine.index_documents(documents)
+    # Reuse the saved index unless a rebuild is requested
+    if os.path.isdir(INDEX_DIR) and '--reindex' not in sys.argv:
+        print(f"Loading index from {INDEX_DIR}...")
+        search_engine = SearchEngine.load(INDEX_DIR)
+        print(f"✓ Loaded {len(search_engine.documents)} documents")
+        print()
+    else:
+        # Stream books into the index a batch at a time, preprocessing them in parallel
+        # and keeping only the text needed for result previews
+        loader = DocumentLoader('data/raw_texts')
+        search_engine = SearchEngine(num_workers=None, positional=True)
+        search_engine.index_documents(loader.stream_documents(), batch_size=64, store_content=False)
+        search_engine.save(INDEX_DIR)
+        print(f"✓ Saved index to {INDEX_DIR}")
+        print()
     
     # Interactive search loop
     print("="*70)
@@ -47,8 +58,12 @@ def main():
         
         print()
         
-        # Perform search
-        results = search_engine.search(query, top_k=5)
+        # Perform search ("quoted phrases" and word NEAR/k word are supported)
+        try:
+            results = search_engine.search(query, top_k=5)
+        except ValueError as e:
+            print(f"{e}\n")
+            continue
         search_engine.print_results(query, results)
         
         print()
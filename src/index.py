@@ -0,0 +1,454 @@
+"""
+Inverted index with posting lists for document search.
+"""
+
+import heapq
+import numpy as np
+from typing import Callable, Dict, List, Tuple
+from scipy.sparse import csr_matrix
+from src.storage import save_array, load_array
+from src.compression import CompressedArray, list_blocks, cumsum_blocks
+
+# Computes per-posting impact scores: (term_id, doc_ids, term_freqs) -> impacts
+ImpactFunction = Callable[[int, np.ndarray, np.ndarray], np.ndarray]
+
+# Postings per block of the pruning upper bounds
+UPPER_BOUND_BLOCK_SIZE = 64
+
+
+def smallest_uint_dtype(max_value: int) -> np.dtype:
+    """
+    Pick the narrowest unsigned integer dtype that can hold a value.
+    
+    Args:
+        max_value: Largest value to be stored
+        
+    Returns:
+        One of uint8, uint16, uint32, uint64
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class InvertedIndex:
+    """Maps each term to a compressed posting list of doc ids and term frequencies."""
+    
+    # Arrays written by save(), when present
+    ARRAYS = ('term_offsets', 'doc_gaps', 'term_freqs', 'impact_scales', 'term_max_impacts',
+              'block_offsets', 'block_last_docs', 'block_max_impacts', 'skip_docs')
+    
+    def __init__(self):
+        """Initialize empty index."""
+        self.term_offsets: np.ndarray = np.zeros(1, dtype=np.int64)  # term -> posting range
+        self.doc_gaps: np.ndarray = np.empty(0, dtype=np.uint8)      # delta-encoded doc ids
+        self.term_freqs: np.ndarray = np.empty(0, dtype=np.uint8)    # tf for each posting
+        self.num_documents: int = 0
+        
+        # Set when payloads are quantized impact codes instead of tfs
+        self.impact_scales: np.ndarray = None
+        
+        # Score upper bounds for dynamic pruning (see compute_upper_bounds)
+        self.block_size: int = 0
+        self.term_max_impacts: np.ndarray = None    # max impact per term
+        self.block_offsets: np.ndarray = None       # term -> block range
+        self.block_last_docs: np.ndarray = None     # last doc id in each block
+        self.block_max_impacts: np.ndarray = None   # max impact in each block
+        
+        # Set when doc gaps and tfs are compressed (see compress)
+        self.skip_block_size: int = 0
+        self.skip_docs: np.ndarray = None           # last doc id in each compressed block
+        self._skip_blocks: Tuple[np.ndarray, np.ndarray] = None  # (block starts, term -> blocks)
+    
+    def build(self, counts: csr_matrix, doc_offset: int = 0) -> None:
+        """
+        Build posting lists from a document-term count matrix.
+        
+        Postings are the columns of the count matrix. Doc ids are stored as
+        gaps from the previous posting in the same list, and both gaps and
+        frequencies use the narrowest unsigned dtype that fits.
+        
+        Args:
+            counts: Sparse CSR matrix of raw term counts (num_docs x vocab_size)
+            doc_offset: Doc id of the first row, for indexes that cover a
+                later slice of the collection
+        """
+        by_term = counts.tocsc()
+        by_term.sort_indices()
+        self.build_from_postings(by_term.indptr, by_term.indices.astype(np.int64) + doc_offset,
+                                 by_term.data, counts.shape[0])
+    
+    def build_from_postings(self, term_offsets: np.ndarray, doc_ids: np.ndarray,
+                            term_freqs: np.ndarray, num_documents: int) -> None:
+        """
+        Build posting lists from postings already grouped by term.
+        
+        Args:
+            term_offsets: Start of each term's postings, plus the total
+            doc_ids: Doc id of every posting, ascending within each term
+            term_freqs: Term frequency of every posting
+            num_documents: Number of documents the postings cover
+        """
+        self.num_documents = num_documents
+        self.term_offsets = np.asarray(term_offsets, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        term_freqs = np.asarray(term_freqs)
+        
+        # Delta-encode doc ids within each posting list
+        gaps = doc_ids.copy()
+        gaps[1:] -= doc_ids[:-1]
+        starts = self.term_offsets[:-1][np.diff(self.term_offsets) > 0]
+        gaps[starts] = doc_ids[starts]
+        
+        self.doc_gaps = gaps.astype(smallest_uint_dtype(gaps.max(initial=0)))
+        self.term_freqs = term_freqs.astype(smallest_uint_dtype(term_freqs.max(initial=0)))
+    
+    def compress(self, codec: str, block_size: int = 128) -> None:
+        """
+        Compress doc gaps and term frequencies with a block codec.
+        
+        Posting lists are cut into blocks of block_size postings. The last
+        doc id of every block is kept as a skip pointer, so a block can be
+        decoded on its own, with its gaps relative to the previous block.
+        
+        Args:
+            codec: 'varbyte', 'simple8b' or 'bitpack' (see src.compression)
+            block_size: Postings per block
+        """
+        _, doc_ids, term_freqs = self.all_postings()
+        block_offsets, term_blocks = list_blocks(self.term_offsets, block_size)
+        last_docs = doc_ids[block_offsets[1:] - 1]
+        
+        self.skip_block_size = block_size
+        self.skip_docs = last_docs.astype(smallest_uint_dtype(last_docs.max(initial=0)))
+        self._skip_blocks = (block_offsets, term_blocks)
+        self.doc_gaps = CompressedArray.encode(np.asarray(self.doc_gaps), block_offsets, codec)
+        self.term_freqs = CompressedArray.encode(term_freqs, block_offsets, codec)
+    
+    @property
+    def codec(self) -> str:
+        """Name of the codec of the posting lists, or None if uncompressed."""
+        return self.doc_gaps.codec if isinstance(self.doc_gaps, CompressedArray) else None
+    
+    @property
+    def nbytes(self) -> int:
+        """Size of the posting lists (offsets, doc ids, payloads, skip pointers)."""
+        arrays = (self.term_offsets, self.doc_gaps, self.term_freqs, self.skip_docs)
+        return sum(array.nbytes for array in arrays if array is not None)
+    
+    @property
+    def vocab_size(self) -> int:
+        """Number of terms with a (possibly empty) posting list."""
+        return len(self.term_offsets) - 1
+    
+    def doc_freq(self, term_id: int) -> int:
+        """Return the number of documents containing a term."""
+        return int(self.term_offsets[term_id + 1] - self.term_offsets[term_id])
+    
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode the posting list of a term.
+        
+        Args:
+            term_id: Vocabulary index of the term
+            
+        Returns:
+            Tuple of (doc_ids, term_freqs) arrays, doc ids ascending
+        """
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        doc_ids = np.cumsum(self.doc_gaps[start:end], dtype=np.int64)
+        return doc_ids, self.term_freqs[start:end]
+    
+    def intersect(self, term_id: int, doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Find which of some documents contain a term.
+        
+        On a compressed index, skip pointers locate the blocks that may
+        contain each document, and only those blocks are decoded.
+        
+        Args:
+            term_id: Vocabulary index of the term
+            doc_ids: Candidate doc ids, ascending and unique
+            
+        Returns:
+            The candidates that occur in the term's posting list, ascending
+        """
+        if self.codec is None:
+            return np.intersect1d(self.postings(term_id)[0], doc_ids, assume_unique=True)
+        
+        block_offsets, term_blocks = self._skip_blocks
+        first, last = term_blocks[term_id], term_blocks[term_id + 1]
+        last_docs = self.skip_docs[first:last]
+        blocks = np.unique(np.searchsorted(last_docs, doc_ids))
+        blocks = blocks[blocks < len(last_docs)]
+        
+        # Gaps of a block are relative to the last doc of the previous one
+        bases = np.where(blocks > 0, last_docs[blocks - 1], 0).astype(np.int64)
+        lengths = block_offsets[first + blocks + 1] - block_offsets[first + blocks]
+        decoded = cumsum_blocks(self.doc_gaps.decode_blocks(first + blocks), lengths, bases)
+        return np.intersect1d(decoded, doc_ids, assume_unique=True)
+    
+    def all_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decode every posting list at once.
+        
+        Returns:
+            Tuple of (term_ids, doc_ids, term_freqs), grouped by term
+        """
+        doc_ids = np.cumsum(np.asarray(self.doc_gaps), dtype=np.int64)
+        
+        # Undo the running sum carried over from earlier lists
+        list_lengths = np.diff(self.term_offsets)
+        starts = self.term_offsets[:-1][list_lengths > 0]
+        carried = np.where(starts > 0, doc_ids[starts - 1], 0)
+        doc_ids -= np.repeat(carried, list_lengths[list_lengths > 0])
+        
+        term_ids = np.repeat(np.arange(self.vocab_size, dtype=np.int64), list_lengths)
+        return term_ids, doc_ids, np.asarray(self.term_freqs)
+    
+    def quantize_impacts(self, impact: ImpactFunction, bits: int = 8) -> 'InvertedIndex':
+        """
+        Precompute every posting's impact score as a quantized integer.
+        
+        Each term gets its own scale (max impact / (2^bits - 1)), so codes
+        use the full integer range of every list. The returned index shares
+        doc ids with this one and carries the codes as its payload; score
+        it with its dequantize() method as the impact function.
+        
+        Args:
+            impact: Per-posting document impact function (vectorized over
+                term ids as well as doc ids)
+            bits: Code width, 8 or 16
+            
+        Returns:
+            New index whose payloads are impact codes
+        """
+        term_ids, doc_ids, term_freqs = self.all_postings()
+        impacts = impact(term_ids, doc_ids, term_freqs)
+        list_lengths = np.diff(self.term_offsets)
+        nonempty = list_lengths > 0
+        
+        max_impacts = np.zeros(self.vocab_size)
+        if impacts.size:
+            max_impacts[nonempty] = np.maximum.reduceat(impacts, self.term_offsets[:-1][nonempty])
+        scales = max_impacts / (2 ** bits - 1)
+        
+        posting_scales = np.repeat(scales, list_lengths)
+        codes = np.divide(impacts, posting_scales, out=np.zeros_like(impacts),
+                          where=posting_scales > 0)
+        
+        quantized = InvertedIndex()
+        quantized.num_documents = self.num_documents
+        quantized.term_offsets = self.term_offsets
+        quantized.doc_gaps = self.doc_gaps
+        quantized.term_freqs = np.rint(codes).astype(np.uint8 if bits == 8 else np.uint16)
+        quantized.impact_scales = scales
+        if self.codec is not None:
+            quantized.skip_block_size = self.skip_block_size
+            quantized.skip_docs = self.skip_docs
+            quantized._skip_blocks = self._skip_blocks
+            quantized.term_freqs = CompressedArray.encode(quantized.term_freqs, self._skip_blocks[0],
+                                                          self.codec)
+        return quantized
+    
+    def dequantize(self, term_id, doc_ids: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Impact function for an index built by quantize_impacts.
+        
+        Args:
+            term_id: Vocabulary index of the term (or one index per posting)
+            doc_ids: Documents in the posting list (unused)
+            codes: Quantized impact codes
+            
+        Returns:
+            Approximate impact of the term in each document
+        """
+        return codes * self.impact_scales[term_id]
+    
+    def compute_upper_bounds(self, impact: ImpactFunction,
+                             block_size: int = UPPER_BOUND_BLOCK_SIZE) -> None:
+        """
+        Precompute per-term and per-block maximum impact scores.
+        
+        Dynamic pruning strategies use these bounds to skip documents that
+        cannot enter the top-k. Each posting list is cut into fixed-size
+        blocks; a block records its last doc id and its largest impact.
+        
+        Args:
+            impact: Per-posting document impact function (vectorized over
+                term ids as well as doc ids)
+            block_size: Number of postings per block
+        """
+        term_ids, doc_ids, term_freqs = self.all_postings()
+        impacts = impact(term_ids, doc_ids, term_freqs)
+        list_lengths = np.diff(self.term_offsets)
+        
+        self.term_max_impacts = np.zeros(self.vocab_size)
+        nonempty = list_lengths > 0
+        if impacts.size:
+            self.term_max_impacts[nonempty] = np.maximum.reduceat(
+                impacts, self.term_offsets[:-1][nonempty]
+            )
+        
+        # Block b of a term starts at term_offset + b * block_size
+        blocks_per_term = -(-list_lengths // block_size)
+        self.block_offsets = np.zeros(self.vocab_size + 1, dtype=np.int64)
+        np.cumsum(blocks_per_term, out=self.block_offsets[1:])
+        block_rank = np.arange(self.block_offsets[-1]) - np.repeat(
+            self.block_offsets[:-1], blocks_per_term
+        )
+        block_starts = np.repeat(self.term_offsets[:-1], blocks_per_term) + block_rank * block_size
+        block_ends = np.minimum(block_starts + block_size,
+                                np.repeat(self.term_offsets[1:], blocks_per_term))
+        
+        self.block_size = block_size
+        self.block_last_docs = doc_ids[block_ends - 1] if len(block_ends) else np.empty(0, dtype=np.int64)
+        self.block_max_impacts = (np.maximum.reduceat(impacts, block_starts)
+                                  if len(block_starts) else np.empty(0))
+    
+    def score_term_at_a_time(self, term_ids: np.ndarray, weights: np.ndarray,
+                             impact: ImpactFunction) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score documents one posting list at a time.
+        
+        Contributions of every query term are gathered and summed per
+        document in a sparse accumulator, so the cost depends only on the
+        length of the query's posting lists.
+        
+        Args:
+            term_ids: Query term indices, ascending
+            weights: Query weight for each term
+            impact: Per-posting document impact function
+            
+        Returns:
+            Tuple of (doc_ids, scores) for every matching document
+        """
+        all_docs = []
+        all_contributions = []
+        for term_id, weight in zip(term_ids, weights):
+            if term_id >= self.vocab_size:
+                continue  # term added to the vocabulary after this index was built
+            doc_ids, tfs = self.postings(term_id)
+            all_docs.append(doc_ids)
+            all_contributions.append(impact(term_id, doc_ids, tfs) * weight)
+        
+        if not all_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        
+        # Accumulate per document, adding terms in query term order
+        doc_ids, slots = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(slots, weights=np.concatenate(all_contributions),
+                             minlength=len(doc_ids))
+        return doc_ids, scores
+    
+    def score_document_at_a_time(self, term_ids: np.ndarray, weights: np.ndarray,
+                                 impact: ImpactFunction, top_k: int,
+                                 deleted: np.ndarray = None) -> List[Tuple[int, float]]:
+        """
+        Score documents one at a time by merging posting list cursors.
+        
+        Documents are visited in doc id order and fully scored before
+        moving on, keeping only a top-k heap instead of a full accumulator.
+        
+        Args:
+            term_ids: Query term indices, ascending
+            weights: Query weight for each term
+            impact: Per-posting document impact function
+            top_k: Number of results to keep
+            deleted: Optional mask of deleted doc ids to leave out
+            
+        Returns:
+            List of (doc_id, score) with positive scores, best first
+        """
+        if top_k <= 0:
+            return []
+        
+        cursors = []
+        for term_id, weight in zip(term_ids, weights):
+            if term_id >= self.vocab_size:
+                continue
+            doc_ids, tfs = self.postings(term_id)
+            contributions = impact(term_id, doc_ids, tfs) * weight
+            cursors.append((doc_ids.tolist(), contributions.tolist()))
+        
+        # Min-heap of (next doc id, cursor index), positions tracked separately
+        frontier = [(docs[0], i) for i, (docs, _) in enumerate(cursors) if docs]
+        heapq.heapify(frontier)
+        positions = [0] * len(cursors)
+        top = []  # min-heap of (score, -doc_id)
+        
+        while frontier:
+            doc_id = frontier[0][0]
+            matched = []
+            while frontier and frontier[0][0] == doc_id:
+                _, i = heapq.heappop(frontier)
+                matched.append(i)
+            
+            # Sum in query term order so scores match the other strategies
+            score = 0.0
+            for i in sorted(matched):
+                docs, contributions = cursors[i]
+                score += contributions[positions[i]]
+                positions[i] += 1
+                if positions[i] < len(docs):
+                    heapq.heappush(frontier, (docs[positions[i]], i))
+            
+            if score > 0 and (deleted is None or not deleted[doc_id]):
+                entry = (score, -doc_id)
+                if len(top) < top_k:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+        
+        return [(-neg_doc, score) for score, neg_doc in sorted(top, key=lambda e: (-e[0], -e[1]))]
+    
+    def save(self, path: str, prefix: str = 'index') -> Dict:
+        """
+        Write index arrays into an index directory.
+        
+        Args:
+            path: Index directory
+            prefix: Prefix for the array file names
+            
+        Returns:
+            Scalar state to record in the manifest
+        """
+        saved = []
+        compressed = {}
+        for name in self.ARRAYS:
+            value = getattr(self, name)
+            if isinstance(value, CompressedArray):
+                compressed[name] = value.save(path, f'{prefix}_{name}')
+            elif value is not None:
+                save_array(path, f'{prefix}_{name}', value)
+                saved.append(name)
+        return {'num_documents': self.num_documents, 'block_size': self.block_size, 'arrays': saved,
+                'compressed': compressed, 'skip_block_size': self.skip_block_size}
+    
+    @classmethod
+    def load(cls, path: str, state: Dict, prefix: str = 'index') -> 'InvertedIndex':
+        """
+        Memory-map an index written by save().
+        
+        Args:
+            path: Index directory
+            state: Scalar state returned by save()
+            prefix: Prefix used when saving
+            
+        Returns:
+            Index backed by read-only mapped arrays
+        """
+        index = cls()
+        index.num_documents = state['num_documents']
+        index.block_size = state['block_size']
+        for name in state['arrays']:
+            setattr(index, name, load_array(path, f'{prefix}_{name}'))
+        
+        if state.get('compressed'):
+            index.skip_block_size = state['skip_block_size']
+            index._skip_blocks = list_blocks(index.term_offsets, index.skip_block_size)
+            for name, array_state in state['compressed'].items():
+                setattr(index, name, CompressedArray.load(path, array_state, f'{prefix}_{name}',
+                                                          index._skip_blocks[0]))
+        return index
\ No newline at end of file
@@ -16,7 +16,34 @@ Loads and manages text documents from local files.
 """
 
 import os
-from typing import List, Dict
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Default size limit of streamed documents (characters); larger files are
+# split into parts so reading one never holds more than this in memory
+MAX_DOCUMENT_CHARS = 1 << 22
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Group an iterable into lists of at most batch_size items.
+    
+    Args:
+        items: Any iterable, e.g. a document stream
+        batch_size: Items per batch (None: a single batch)
+        
+    Yields:
+        Consecutive batches, in order
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
 
 
 class DocumentLoader:
@@ -53,7 +80,7 @@ class DocumentLoader:
         if not txt_files:
             raise ValueError(f"No .txt files found in {self.data_dir}")
         
-        print(f"Found {len(txt_files)} text files")
+        logger.info("Found %d text files", len(txt_files))
         
         # Load each file
         for filename in txt_files:
@@ -65,21 +92,115 @@ class DocumentLoader:
                 
                 # Create document dict
                 doc = {
-                    'title': filename.replace('.txt', '').replace('_', ' ').title(),
+                    'title': self._title(filename),
                     'content': content,
                     'filepath': filepath
                 }
                 
                 documents.append(doc)
-                print(f"  Loaded: {doc['title']} ({len(content)} chars)")
+                logger.info("Loaded: %s (%d chars)", doc['title'], len(content))
                 
             except Exception as e:
-                print(f"  Error loading {filename}: {e}")
+                logger.warning("Error loading %s: %s", filename, e)
                 continue
         
         self.documents = documents
         return documents
     
+    def iter_files(self, recursive: bool = True) -> Iterator[str]:
+        """
+        Yield paths of .txt files under the data directory.
+        
+        Directories are walked with os.scandir, which reads file types
+        from the directory listing instead of calling stat on every entry.
+        Entries are visited in name order so doc ids are reproducible.
+        
+        Args:
+            recursive: Also walk subdirectories (symlinked ones are skipped)
+            
+        Yields:
+            File paths
+        """
+        if not os.path.isdir(self.data_dir):
+            raise FileNotFoundError(f"Data directory not found: {self.data_dir}")
+        
+        pending = [self.data_dir]
+        while pending:
+            with os.scandir(pending.pop()) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith('.txt') and entry.is_file():
+                    yield entry.path
+            if recursive:
+                pending.extend(reversed(subdirs))
+    
+    def stream_documents(self, encoding: str = 'utf-8', recursive: bool = True,
+                         chunk_size: int = 1 << 20,
+                         max_chars: int = MAX_DOCUMENT_CHARS) -> Iterator[Dict[str, str]]:
+        """
+        Lazily yield documents from the .txt files under the data directory.
+        
+        Unlike load_documents, nothing is kept in memory: each document is
+        read when the consumer asks for it. Files are read chunk_size
+        characters at a time and split at whitespace into parts of at most
+        max_chars characters, so no single document exceeds that size.
+        
+        Args:
+            encoding: Text file encoding (default: utf-8)
+            recursive: Also walk subdirectories
+            chunk_size: Characters read from a file at a time
+            max_chars: Split files into parts of at most this many characters
+                (default: MAX_DOCUMENT_CHARS). None yields every file as one
+                document, so memory is then bounded by the largest file, not
+                by chunk_size.
+            
+        Yields:
+            Document dicts with 'title', 'content', 'filepath'
+        """
+        for filepath in self.iter_files(recursive):
+            title = self._title(os.path.basename(filepath))
+            try:
+                for part, content in enumerate(self._read_parts(filepath, encoding, chunk_size, max_chars)):
+                    yield {
+                        'title': title if part == 0 else f"{title} (Part {part + 1})",
+                        'content': content,
+                        'filepath': filepath
+                    }
+            except OSError as e:
+                logger.warning("Error loading %s: %s", filepath, e)
+    
+    def _read_parts(self, filepath: str, encoding: str, chunk_size: int,
+                    max_chars: int = None) -> Iterator[str]:
+        """Read a file in chunks, yielding its content in parts of at most max_chars."""
+        with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
+            if max_chars is None:
+                yield ''.join(iter(lambda: f.read(chunk_size), ''))
+                return
+            
+            buffer = ''
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                buffer += chunk
+                # Slice parts at an offset and copy the remainder once per chunk
+                start = 0
+                while len(buffer) - start > max_chars:
+                    # Cut at the last whitespace so words are not split
+                    end = start + max_chars
+                    cut = max(buffer.rfind(' ', start, end), buffer.rfind('\n', start, end))
+                    if cut <= start:
+                        cut = end
+                    yield buffer[start:cut]
+                    start = cut
+                buffer = buffer[start:]
+            yield buffer
+    
+    @staticmethod
+    def _title(filename: str) -> str:
+        """Derive a document title from its file name."""
+        return filename.replace('.txt', '').replace('_', ' ').title()
+    
     def get_document_by_title(self, title: str) -> Dict[str, str]:
         """
         Retrieve a specific document by title.
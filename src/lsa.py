@@ -0,0 +1,251 @@
+"""
+Latent semantic analysis (LSA) with a randomized truncated SVD.
+
+The document matrix of an ordinary SearchEngine (one TF-IDF or BM25
+dimension per vocabulary term) is factored as A ~ U_k S_k V_k^T with a
+randomized SVD. Documents are then stored as the k-dimensional float32
+rows of A V_k, normalized to unit length, and a query vector q is folded
+in at search time as q V_k. Scoring reads k values per document instead
+of walking sparse term rows, and terms that co-occur are merged into
+shared dimensions, so a document can match a query without sharing its
+exact words. Optionally, an IVFIndex searches the reduced vectors in
+sublinear time.
+"""
+
+import os
+import shutil
+import logging
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+from src.search import SearchEngine, select_top_k, select_top_k_rows
+from src.ann import IVFIndex, normalize_rows
+from src.storage import save_array, load_array, write_manifest, read_manifest, replace_directory
+
+logger = logging.getLogger(__name__)
+
+
+def randomized_svd(matrix, k: int, oversamples: int = 10, power_iterations: int = 4,
+                   seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Truncated SVD of a (sparse) matrix by random range finding.
+    
+    The range of the matrix is sampled with k + oversamples random
+    vectors, sharpened by power iterations (re-orthonormalized each time),
+    and the small projected matrix is decomposed exactly (Halko, Martinsson
+    and Tropp, 2011). The matrix is only used in products, so a sparse
+    matrix is never densified.
+    
+    Args:
+        matrix: Sparse or dense matrix (n x m)
+        k: Number of singular triplets
+        oversamples: Extra random vectors, improving accuracy
+        power_iterations: Passes that separate the top singular values
+        seed: Random seed
+    
+    Returns:
+        Tuple of (U (n x k), singular values (k,), Vt (k x m))
+    """
+    rng = np.random.default_rng(seed)
+    n, m = matrix.shape
+    k = min(k, n, m)
+    width = min(k + oversamples, n, m)
+    
+    sample = matrix @ rng.standard_normal((m, width))
+    for _ in range(power_iterations):
+        basis, _ = np.linalg.qr(sample)
+        basis, _ = np.linalg.qr(matrix.T @ basis)
+        sample = matrix @ basis
+    basis, _ = np.linalg.qr(sample)
+    
+    # Exact SVD of the small projection basis^T A (width x m)
+    small = np.asarray((matrix.T @ basis).T)
+    u_small, singular_values, vt = np.linalg.svd(small, full_matrices=False)
+    return basis @ u_small[:, :k], singular_values[:k], vt[:k]
+
+
+class LSASearchEngine:
+    """Searches documents by their projection onto the top singular vectors."""
+    
+    def __init__(self, dims: int = 200, oversamples: int = 10, power_iterations: int = 4,
+                 seed: int = 0, ann: IVFIndex = None, **engine_options):
+        """
+        Initialize LSA search.
+        
+        Args:
+            dims: Number of latent dimensions k (at most the number of
+                documents and of terms)
+            oversamples: Extra random vectors of the randomized SVD
+            power_iterations: Power iterations of the randomized SVD
+            seed: Random seed of the randomized SVD
+            ann: Optional unbuilt IVFIndex; it is built over the reduced
+                document vectors and used for search instead of scoring
+                every document
+            **engine_options: Passed to the underlying SearchEngine,
+                e.g. model, tokenizer or num_workers
+        """
+        if dims < 1:
+            raise ValueError("dims must be at least 1")
+        
+        self.dims = dims
+        self.oversamples = oversamples
+        self.power_iterations = power_iterations
+        self.seed = seed
+        self.ann = ann
+        self.engine = SearchEngine(**engine_options)
+        self.term_vectors: np.ndarray = None  # V_k, one row per term (float32)
+        self.singular_values: np.ndarray = None
+        self.doc_vectors: np.ndarray = None  # unit-length rows of A V_k (float32)
+    
+    @property
+    def documents(self):
+        """Indexed documents."""
+        return self.engine.documents
+    
+    def index_documents(self, documents: Iterable[Dict[str, str]], batch_size: int = None) -> None:
+        """
+        Index documents and project them onto the latent dimensions.
+        
+        Args:
+            documents: Document dicts with 'title' and 'content' (may be a stream)
+            batch_size: Documents preprocessed at a time (default: all)
+        """
+        self.engine.index_documents(documents, batch_size=batch_size)
+        matrix = self.engine.document_matrix()
+        
+        logger.info("Computing a rank-%d SVD of the %d x %d matrix...", self.dims, *matrix.shape)
+        u, singular_values, vt = randomized_svd(matrix, self.dims, self.oversamples,
+                                                self.power_iterations, self.seed)
+        self.term_vectors = np.ascontiguousarray(vt.T, dtype=np.float32)
+        self.singular_values = singular_values
+        self.doc_vectors = normalize_rows(u * singular_values)
+        if self.ann is not None:
+            self.ann.build(self.doc_vectors)
+        logger.info("Reduced %d term dimensions to %d", matrix.shape[1], len(singular_values))
+    
+    def fold_in(self, query: str) -> np.ndarray:
+        """
+        Project a query into the latent space.
+        
+        Args:
+            query: Search query string
+        
+        Returns:
+            k-dimensional query vector (all zeros if no query term is known)
+        """
+        if self.term_vectors is None:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        vector = np.zeros(self.term_vectors.shape[1], dtype=np.float32)
+        query_tokens = self.engine.preprocessor.preprocess(query)
+        if query_tokens:
+            term_ids, weights = self.engine.model.query_weights(self.engine.vectorizer, query_tokens)
+            vector = weights.astype(np.float32) @ self.term_vectors[term_ids]
+        return vector
+    
+    def search(self, query: str, top_k: int = 5, nprobe: int = None) -> List[Dict[str, any]]:
+        """
+        Search for the documents closest to the query in the latent space.
+        
+        Args:
+            query: Search query string
+            top_k: Number of top results to return
+            nprobe: Lists scanned by the ANN index (default: its nprobe)
+        
+        Returns:
+            List of result dicts with 'rank', 'title', 'score' (cosine in
+            the latent space), 'preview' and 'doc_index'
+        """
+        query_vector = self.fold_in(query)
+        if not query_vector.any():
+            return []
+        if self.ann is not None:
+            hits = self.ann.search(query_vector, top_k, nprobe)
+        else:
+            scores = self.doc_vectors @ normalize_rows(query_vector[None, :])[0]
+            hits = [(doc_idx, scores[doc_idx]) for doc_idx in select_top_k(scores, top_k)]
+        return self.engine._build_results(hits)
+    
+    def search_many(self, queries: List[str], top_k: int = 5,
+                    chunk_size: int = None) -> List[List[Dict[str, any]]]:
+        """
+        Search for many queries with dense matrix products.
+        
+        Exhaustive even if an ANN index is set. The queries are scored
+        against all documents chunk_size queries at a time.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of top results per query
+            chunk_size: Queries scored per matrix product (default: enough
+                for about 4M scores)
+        
+        Returns:
+            Result list of each query, as returned by search()
+        """
+        query_vectors = normalize_rows(np.array([self.fold_in(query) for query in queries]).reshape(len(queries), -1))
+        if chunk_size is None:
+            chunk_size = max(1, (1 << 22) // max(len(self.doc_vectors), 1))
+        
+        all_results = []
+        for start in range(0, len(query_vectors), chunk_size):
+            scores = query_vectors[start:start + chunk_size] @ self.doc_vectors.T
+            all_results.extend(
+                self.engine._build_results([(doc_idx, scores[row, doc_idx]) for doc_idx in doc_ids])
+                for row, doc_ids in enumerate(select_top_k_rows(scores, top_k))
+            )
+        return all_results
+    
+    def print_results(self, query: str, results: List[Dict[str, any]]) -> None:
+        """Pretty print search results."""
+        self.engine.print_results(query, results)
+    
+    def save(self, path: str) -> None:
+        """
+        Write the engine and its latent vectors to a directory.
+        
+        The sparse document vectors and posting lists of the underlying
+        engine are not stored; queries are folded in with its vocabulary
+        and term weights only.
+        
+        Args:
+            path: Target directory (replaced if it exists)
+        """
+        if self.term_vectors is None:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        tmp_path = path.rstrip(os.sep) + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        self.engine.save(os.path.join(tmp_path, 'engine'), query_only=True)
+        for name in ('term_vectors', 'singular_values', 'doc_vectors'):
+            save_array(tmp_path, name, getattr(self, name))
+        write_manifest(tmp_path, {
+            'dims': self.dims,
+            'oversamples': self.oversamples,
+            'power_iterations': self.power_iterations,
+            'seed': self.seed,
+            'ann': self.ann.save(tmp_path) if self.ann is not None else None,
+        })
+        replace_directory(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'LSASearchEngine':
+        """
+        Open an LSA index written by save(), memory-mapping its arrays.
+        
+        Args:
+            path: Index directory
+        
+        Returns:
+            Fitted LSA search engine
+        """
+        manifest = read_manifest(path)
+        lsa = cls(manifest['dims'], manifest['oversamples'], manifest['power_iterations'], manifest['seed'])
+        lsa.engine = SearchEngine.load(os.path.join(path, 'engine'))
+        for name in ('term_vectors', 'singular_values', 'doc_vectors'):
+            setattr(lsa, name, load_array(path, name))
+        if manifest['ann'] is not None:
+            lsa.ann = IVFIndex.load(path, manifest['ann'])
+        return lsa
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Per-stage timing and counters for the search pipeline.
+
+A QueryProfile times the stages of one search (preprocessing, cache
+lookup, query weighting, scoring, result assembly) and collects its
+counters (postings scored, documents scored, cache hits). SearchMetrics
+accumulates the profiles of many searches. An engine that neither
+collects metrics nor has a profile hook uses NO_PROFILE, whose methods do
+nothing, so uninstrumented searches only pay for a few empty calls.
+"""
+
+import threading
+import time
+from typing import Dict
+
+# Pipeline stages in the order a search runs them
+STAGES = ('refresh', 'parse', 'preprocess', 'cache', 'weight', 'score', 'results')
+
+
+class QueryProfile:
+    """Stage timings and counters of one search."""
+    
+    def __init__(self, query: str = None, num_queries: int = 1):
+        """
+        Start timing a search.
+        
+        Args:
+            query: Query string (None for a batch)
+            num_queries: Number of queries answered by this search
+        """
+        self.query = query
+        self.num_queries = num_queries
+        self.timings: Dict[str, float] = {}  # stage -> seconds
+        self.counters: Dict[str, int] = {}
+        self._start = self._last = time.perf_counter()
+    
+    def lap(self, stage: str) -> None:
+        """Attribute the time since the previous lap to a stage."""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last)
+        self._last = now
+    
+    def count(self, name: str, value: int = 1) -> None:
+        """Add to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+    
+    def update(self, counters: Dict[str, int]) -> None:
+        """Add several counters at once, e.g. the engine's last_query_stats."""
+        for name, value in counters.items():
+            self.count(name, value)
+    
+    @property
+    def total(self) -> float:
+        """Seconds from the start of the search to the last lap."""
+        return self._last - self._start
+    
+    def to_dict(self) -> Dict:
+        """Profile as passed to profile hooks."""
+        return {
+            'query': self.query,
+            'num_queries': self.num_queries,
+            'total_ms': self.total * 1000,
+            'stages_ms': {stage: seconds * 1000 for stage, seconds in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+
+
+class _NullProfile:
+    """Stand-in for QueryProfile when nothing is recorded."""
+    
+    def lap(self, stage: str) -> None:
+        pass
+    
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+    
+    def update(self, counters: Dict[str, int]) -> None:
+        pass
+
+
+NO_PROFILE = _NullProfile()
+
+
+class SearchMetrics:
+    """Stage timings and counters accumulated over many searches."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.searches = 0
+            self.queries = 0
+            self.total_seconds = 0.0
+            self.stage_seconds: Dict[str, float] = {}
+            self.stage_calls: Dict[str, int] = {}
+            self.counters: Dict[str, int] = {}
+    
+    def record(self, profile: QueryProfile) -> None:
+        """Add the timings and counters of one search."""
+        with self._lock:
+            self.searches += 1
+            self.queries += profile.num_queries
+            self.total_seconds += profile.total
+            for stage, seconds in profile.timings.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+                self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+            for name, value in profile.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+    
+    def summary(self) -> Dict:
+        """
+        Snapshot of the accumulated metrics.
+        
+        Returns:
+            Dict with searches, queries, total_ms, mean_ms (per search),
+            stages (stage -> calls, total_ms, mean_ms and share of the total
+            time) and counters
+        """
+        with self._lock:
+            stages = {}
+            order = lambda stage: STAGES.index(stage) if stage in STAGES else len(STAGES)
+            for stage in sorted(self.stage_seconds, key=order):
+                seconds, calls = self.stage_seconds[stage], self.stage_calls[stage]
+                stages[stage] = {
+                    'calls': calls,
+                    'total_ms': seconds * 1000,
+                    'mean_ms': seconds / calls * 1000,
+                    'share': seconds / self.total_seconds if self.total_seconds else 0.0,
+                }
+            return {
+                'searches': self.searches,
+                'queries': self.queries,
+                'total_ms': self.total_seconds * 1000,
+                'mean_ms': self.total_seconds / self.searches * 1000 if self.searches else 0.0,
+                'stages': stages,
+                'counters': dict(self.counters),
+            }
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""
+Passage-level retrieval for long documents.
+
+Each document is split into overlapping passages of a fixed number of
+words, and the passages are indexed by an ordinary SearchEngine, so a
+long book no longer dilutes term frequencies. A document scores the max
+(or sum) of its passage scores, and its preview is a snippet cut from its
+best passage, with the query words highlighted. The character offsets of
+every indexed word are recorded at index time, so snippets are sliced
+from the stored text without tokenizing it again. Words, passages and
+offsets come from the engine's own tokenizer, so the highlighted words
+are exactly those the engine matched.
+"""
+
+import os
+import shutil
+import logging
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Tuple
+from src.search import SearchEngine, select_top_k
+from src.positions import parse_query, has_query_operators
+from src.storage import (save_array, load_array, save_documents, MappedDocuments,
+                         write_manifest, read_manifest, replace_directory)
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ('max', 'sum')
+
+# Passages fetched per requested document by a pruned search; doubled
+# until the passages cover enough documents
+PASSAGE_FETCH_FACTOR = 4
+
+
+def split_passages(num_words: int, passage_words: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Split a sequence of words into overlapping windows.
+    
+    Args:
+        num_words: Number of words in the document
+        passage_words: Words per passage
+        overlap: Words shared by consecutive passages
+    
+    Returns:
+        (first word, end word) of each passage; at least one passage, and
+        no passage lies entirely within the overlap of the previous one
+    """
+    stride = passage_words - overlap
+    starts = range(0, max(num_words - overlap, 1), stride)
+    return [(start, min(start + passage_words, num_words)) for start in starts]
+
+
+class PassageSearchEngine:
+    """Ranks documents by their best passages and previews them with snippets."""
+    
+    def __init__(self, passage_words: int = 200, overlap: int = 50, aggregation: str = 'max',
+                 snippet_chars: int = 200, highlight: Tuple[str, str] = ('**', '**'),
+                 **engine_options):
+        """
+        Initialize passage search.
+        
+        Args:
+            passage_words: Words per passage
+            overlap: Words shared by consecutive passages of a document
+            aggregation: 'max' scores a document by its best passage, 'sum'
+                by the total of its passage scores
+            snippet_chars: Approximate length of result snippets
+            highlight: Markers placed before and after matched words
+            **engine_options: Passed to the SearchEngine over passages,
+                e.g. model, positional or num_workers
+        """
+        if not 0 <= overlap < passage_words:
+            raise ValueError("overlap must be at least 0 and smaller than passage_words")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}'. Choose from {AGGREGATIONS}")
+        
+        self.passage_words = passage_words
+        self.overlap = overlap
+        self.aggregation = aggregation
+        self.snippet_chars = snippet_chars
+        self.highlight = highlight
+        self.engine = SearchEngine(**engine_options)
+        self.documents = []
+        
+        self.passage_offsets = np.zeros(1, dtype=np.int64)    # document -> passage range
+        self.passage_spans = np.empty((0, 2), dtype=np.int64)  # character range of each passage
+        self.word_offsets = np.zeros(1, dtype=np.int64)       # document -> indexed word range
+        self.word_terms = np.empty(0, dtype=np.int64)         # term id of each indexed word
+        self.word_spans = np.empty((0, 2), dtype=np.int64)    # character range of each indexed word
+    
+    def index_documents(self, documents: Iterable[Dict[str, str]], batch_size: int = None) -> None:
+        """
+        Split documents into passages and index them.
+        
+        Args:
+            documents: Document dicts with 'title' and 'content' (may be a stream)
+            batch_size: Passages preprocessed at a time (default: all)
+        """
+        self.documents = []
+        preprocessor = self.engine.preprocessor
+        passage_counts, spans = [], []
+        word_counts, word_stems, word_spans = [], [], []
+        
+        def passages() -> Iterator[Dict[str, str]]:
+            for doc in documents:
+                self.documents.append(doc)
+                content = doc['content']
+                words, words_spans = preprocessor.word_spans(content)
+                
+                doc_passages = split_passages(len(words), self.passage_words, self.overlap)
+                passage_counts.append(len(doc_passages))
+                for first, end in doc_passages:
+                    span = (words_spans[first][0], words_spans[end - 1][1]) if end > first else (0, 0)
+                    spans.append(span)
+                    yield {'title': doc['title'], 'content': content[span[0]:span[1]]}
+                
+                # Offsets of the words that queries can match, for snippets
+                stems, kept = preprocessor.filter_words(words)
+                word_counts.append(len(kept))
+                word_stems.extend(stems)
+                word_spans.extend(words_spans[i] for i in kept)
+        
+        self.engine.index_documents(passages(), batch_size=batch_size, store_content=False)
+        
+        self.passage_offsets = np.zeros(len(passage_counts) + 1, dtype=np.int64)
+        np.cumsum(passage_counts, out=self.passage_offsets[1:])
+        self.passage_spans = np.array(spans, dtype=np.int64).reshape(-1, 2)
+        self.word_offsets = np.zeros(len(word_counts) + 1, dtype=np.int64)
+        np.cumsum(word_counts, out=self.word_offsets[1:])
+        vocabulary = self.engine.vectorizer.vocabulary
+        self.word_terms = np.array([vocabulary.get(stem, -1) for stem in word_stems], dtype=np.int64)
+        self.word_spans = np.array(word_spans, dtype=np.int64).reshape(-1, 2)
+        logger.info("Split %d documents into %d passages", len(self.documents), len(spans))
+    
+    def search(self, query: str, top_k: int = 5, strategy: str = None) -> List[Dict[str, any]]:
+        """
+        Search for documents by their passages.
+        
+        With 'max' aggregation a document scores its best passage, so the
+        top passages of an ordinary (pruned) passage search decide the
+        ranking; more passages are fetched until they cover top_k
+        documents. 'sum' needs the score of every passage of a document,
+        so all passages are scored exhaustively and strategy is ignored.
+        
+        Args:
+            query: Search query string (phrase and NEAR/k syntax allowed if
+                the engine is positional)
+            top_k: Number of documents to return
+            strategy: Override the engine's evaluation strategy for this query
+        
+        Returns:
+            List of result dicts with 'rank', 'title', 'score', 'preview'
+            (a snippet of the best passage), 'doc_index' and 'passage'
+            (character range of the best passage)
+        """
+        if self.aggregation == 'max':
+            hits = self._best_passages(query, top_k, strategy)
+        else:
+            hits = self._summed_passages(query, top_k)
+        
+        # Terms to highlight: every query word, including phrase words
+        text = parse_query(query)[0] if has_query_operators(query) else query
+        vocabulary = self.engine.vectorizer.vocabulary
+        term_ids = {vocabulary[token] for token in self.engine.preprocessor.preprocess(text)
+                    if token in vocabulary}
+        
+        results = []
+        for doc_idx, score, best in hits:
+            results.append({
+                'rank': len(results) + 1,
+                'title': self.documents[doc_idx]['title'],
+                'score': score,
+                'preview': self.snippet(doc_idx, best, term_ids),
+                'doc_index': int(doc_idx),
+                'passage': tuple(int(offset) for offset in self.passage_spans[best]),
+            })
+        return results
+    
+    def _best_passages(self, query: str, top_k: int, strategy: str) -> List[Tuple[int, float, int]]:
+        """(doc index, score, best passage) of the documents with the best passages."""
+        num_passages = int(self.passage_offsets[-1])
+        fetch = min(top_k * PASSAGE_FETCH_FACTOR, num_passages)
+        while fetch > 0:
+            passages = self.engine.search(query, fetch, strategy)
+            best = {}  # doc index -> (score, passage), best first
+            for result in passages:
+                passage = result['doc_index']
+                doc_idx = int(np.searchsorted(self.passage_offsets, passage, side='right')) - 1
+                best.setdefault(doc_idx, (result['score'], passage))
+            if len(best) >= top_k or len(passages) < fetch or fetch == num_passages:
+                return [(doc_idx, score, passage) for doc_idx, (score, passage) in best.items()][:top_k]
+            fetch = min(2 * fetch, num_passages)
+        return []
+    
+    def _summed_passages(self, query: str, top_k: int) -> List[Tuple[int, float, int]]:
+        """(doc index, score, best passage) of the documents with the highest passage totals."""
+        scores = self.engine.score_all(query)
+        starts = self.passage_offsets[:-1]
+        if not len(starts):
+            return []
+        doc_scores = np.add.reduceat(scores, starts)
+        
+        hits = []
+        for doc_idx in select_top_k(doc_scores, top_k):
+            if doc_scores[doc_idx] <= 0:
+                break
+            start, end = self.passage_offsets[doc_idx], self.passage_offsets[doc_idx + 1]
+            hits.append((int(doc_idx), doc_scores[doc_idx], start + int(np.argmax(scores[start:end]))))
+        return hits
+    
+    def snippet(self, doc_idx: int, passage: int, term_ids: set) -> str:
+        """
+        Build a query-biased snippet from a passage.
+        
+        The snippet window starts shortly before the match that sees the
+        most distinct query terms within snippet_chars characters.
+        
+        Args:
+            doc_idx: Document index
+            passage: Global passage index within that document
+            term_ids: Vocabulary indices of the query terms
+        
+        Returns:
+            Snippet text with matched words wrapped in the highlight markers
+        """
+        content = self.documents[doc_idx]['content']
+        passage_start, passage_end = (int(offset) for offset in self.passage_spans[passage])
+        
+        # Matched words inside the passage, from the stored offsets
+        first, last = self.word_offsets[doc_idx], self.word_offsets[doc_idx + 1]
+        spans = self.word_spans[first:last]
+        inside = slice(np.searchsorted(spans[:, 0], passage_start),
+                       np.searchsorted(spans[:, 0], passage_end))
+        terms = self.word_terms[first:last][inside]
+        matched = np.isin(terms, list(term_ids))
+        match_spans = spans[inside][matched].tolist()
+        match_terms = terms[matched].tolist()
+        
+        begin = passage_start
+        if match_spans:
+            match_starts = [start for start, _ in match_spans]
+            best, best_terms = 0, 0
+            for i, window_start in enumerate(match_starts):
+                window_end = np.searchsorted(match_starts, window_start + self.snippet_chars)
+                distinct = len(set(match_terms[i:window_end]))
+                if distinct > best_terms:
+                    best, best_terms = i, distinct
+            begin = max(passage_start, match_starts[best] - self.snippet_chars // 5)
+            begin = max(passage_start, content.rfind(' ', passage_start, begin) + 1)
+        end = min(passage_end, begin + self.snippet_chars)
+        if end < passage_end:
+            end = max(content.rfind(' ', begin, end), begin + self.snippet_chars // 2)
+        
+        # Insert the highlight markers, then normalize whitespace
+        pieces, position = [], begin
+        for start, stop in match_spans:
+            if start >= begin and stop <= end:
+                pieces += [content[position:start], self.highlight[0], content[start:stop], self.highlight[1]]
+                position = stop
+        pieces.append(content[position:end])
+        snippet = ' '.join(''.join(pieces).split())
+        return ('...' if begin > 0 else '') + snippet + ('...' if end < len(content) else '')
+    
+    def print_results(self, query: str, results: List[Dict[str, any]]) -> None:
+        """Pretty print search results."""
+        self.engine.print_results(query, results)
+    
+    def save(self, path: str) -> None:
+        """
+        Write the passage index and its documents to a directory.
+        
+        Args:
+            path: Target directory (replaced if it exists)
+        """
+        tmp_path = path.rstrip(os.sep) + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        self.engine.save(os.path.join(tmp_path, 'passages'))
+        for name in ('passage_offsets', 'passage_spans', 'word_offsets', 'word_terms', 'word_spans'):
+            save_array(tmp_path, name, getattr(self, name))
+        write_manifest(tmp_path, {
+            'passage_words': self.passage_words,
+            'overlap': self.overlap,
+            'aggregation': self.aggregation,
+            'snippet_chars': self.snippet_chars,
+            'highlight': list(self.highlight),
+            'num_documents': len(self.documents),
+            'document_fields': save_documents(tmp_path, self.documents),
+        })
+        replace_directory(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'PassageSearchEngine':
+        """
+        Open a passage index written by save(), memory-mapping its arrays.
+        
+        Args:
+            path: Index directory
+        
+        Returns:
+            Fitted passage search engine
+        """
+        manifest = read_manifest(path)
+        passages = cls(manifest['passage_words'], manifest['overlap'], manifest['aggregation'],
+                       manifest['snippet_chars'], tuple(manifest['highlight']))
+        passages.engine = SearchEngine.load(os.path.join(path, 'passages'))
+        for name in ('passage_offsets', 'passage_spans', 'word_offsets', 'word_terms', 'word_spans'):
+            setattr(passages, name, load_array(path, name))
+        passages.documents = MappedDocuments(path, manifest['document_fields'], manifest['num_documents'])
+        return passages
\ No newline at end of file
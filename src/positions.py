@@ -0,0 +1,316 @@
+"""
+Positional index for phrase and proximity queries.
+
+Positions are stored per count entry (document, term) of a segment, in the
+same document-major order as the segment's forward counts, and are
+delta-encoded within each entry. Queries first intersect posting lists to
+find the documents containing every term, and only decode the positions
+of those candidates.
+
+Query syntax:
+    "quoted phrase"   the words in this order, at the same distances
+    word NEAR/k word  both words within k positions of each other
+"""
+
+import re
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Tuple
+from scipy.sparse import csr_matrix
+from src.index import InvertedIndex, smallest_uint_dtype
+from src.compression import take_ragged
+from src.storage import save_array, load_array
+
+if TYPE_CHECKING:
+    from src.segments import IndexSegment
+
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+NEAR_PATTERN = re.compile(r'NEAR/(\d+)')
+
+
+def parse_query(query: str) -> Tuple[str, List[str], List[Tuple[str, str, int]]]:
+    """
+    Split a query into free text, quoted phrases and NEAR/k pairs.
+    
+    NEAR/k joins the words directly before and after it (and is ignored
+    next to a phrase). The words of phrases and NEAR pairs stay in the free
+    text, so they still contribute to the ranking.
+    
+    Args:
+        query: Search query string
+    
+    Returns:
+        Tuple of (text to rank by, phrases, (word, word, k) pairs)
+    """
+    items = []  # (text, is phrase)
+    for match in QUERY_PATTERN.finditer(query):
+        phrase, word = match.groups()
+        items.append((phrase, True) if phrase is not None else (word, False))
+    
+    words, phrases, nears = [], [], []
+    for i, (item, is_phrase) in enumerate(items):
+        near = None if is_phrase else NEAR_PATTERN.fullmatch(item)
+        if near is None:
+            words.append(item)
+            if is_phrase:
+                phrases.append(item)
+        elif 0 < i < len(items) - 1 and not items[i - 1][1] and not items[i + 1][1]:
+            nears.append((items[i - 1][0], items[i + 1][0], int(near.group(1))))
+    return ' '.join(words), phrases, nears
+
+
+def has_query_operators(query: str) -> bool:
+    """Whether a query uses phrase or NEAR/k syntax (empty phrases do not count)."""
+    if '"' not in query and 'NEAR/' not in query:
+        return False
+    _, phrases, nears = parse_query(query)
+    return any(phrase.strip() for phrase in phrases) or bool(nears)
+
+
+class PositionalIndex:
+    """Delta-encoded term positions for each count entry of a segment."""
+    
+    # Arrays written by save()
+    ARRAYS = ('entry_offsets', 'position_gaps')
+    
+    def __init__(self):
+        """Initialize empty index."""
+        self.entry_offsets: np.ndarray = np.zeros(1, dtype=np.int64)  # entry -> position range
+        self.position_gaps: np.ndarray = np.empty(0, dtype=np.uint8)  # delta-encoded positions
+        self._entry_keys: np.ndarray = None  # (row << 32) | term of each entry, built lazily
+    
+    @classmethod
+    def build(cls, counts: csr_matrix, positions: np.ndarray) -> 'PositionalIndex':
+        """
+        Build from the positions of every term occurrence.
+        
+        Args:
+            counts: Sparse CSR count matrix of the segment (sorted indices)
+            positions: Positions grouped by count entry, in CSR order, and
+                ascending within each entry
+        
+        Returns:
+            New positional index
+        """
+        offsets = np.zeros(counts.nnz + 1, dtype=np.int64)
+        np.cumsum(counts.data, out=offsets[1:])
+        return cls._from_positions(offsets, np.asarray(positions, dtype=np.int64))
+    
+    @classmethod
+    def merge(cls, parts: List['PositionalIndex'], keep: np.ndarray = None) -> 'PositionalIndex':
+        """
+        Concatenate the positions of consecutive segments.
+        
+        Args:
+            parts: Positional indexes in doc id order
+            keep: Optional mask over the concatenated entries to retain
+        
+        Returns:
+            New positional index
+        """
+        offsets = [np.zeros(1, dtype=np.int64)]
+        total = 0
+        for part in parts:
+            offsets.append(part.entry_offsets[1:] + total)
+            total += part.entry_offsets[-1]
+        offsets = np.concatenate(offsets)
+        positions = np.concatenate([part.decode_all() for part in parts])
+        
+        if keep is not None:
+            kept = np.flatnonzero(keep)
+            positions = take_ragged(positions, offsets, kept)
+            lengths = np.diff(offsets)[kept]
+            offsets = np.zeros(len(kept) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+        return cls._from_positions(offsets, positions)
+    
+    @classmethod
+    def _from_positions(cls, offsets: np.ndarray, positions: np.ndarray) -> 'PositionalIndex':
+        """Delta-encode absolute positions within each entry."""
+        gaps = positions.copy()
+        gaps[1:] -= positions[:-1]
+        starts = offsets[:-1][np.diff(offsets) > 0]
+        gaps[starts] = positions[starts]
+        
+        index = cls()
+        index.entry_offsets = offsets
+        index.position_gaps = gaps.astype(smallest_uint_dtype(gaps.max(initial=0)))
+        return index
+    
+    def decode_all(self) -> np.ndarray:
+        """Decode the absolute positions of every entry."""
+        return self.decode(np.arange(len(self.entry_offsets) - 1))[1]
+    
+    def decode(self, entries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode the positions of some entries.
+        
+        Args:
+            entries: Entry indices
+        
+        Returns:
+            Tuple of (index into entries of each position, positions),
+            ascending within each entry
+        """
+        lengths = self.entry_offsets[entries + 1] - self.entry_offsets[entries]
+        owners = np.repeat(np.arange(len(entries), dtype=np.int64), lengths)
+        positions = np.cumsum(take_ragged(self.position_gaps, self.entry_offsets, entries),
+                              dtype=np.int64)
+        
+        # Undo the running sum carried over from earlier entries
+        starts = np.cumsum(lengths) - lengths
+        nonempty = lengths > 0
+        carried = np.where(starts[nonempty] > 0, positions[starts[nonempty] - 1], 0)
+        positions -= np.repeat(carried, lengths[nonempty])
+        return owners, positions
+    
+    def find_entries(self, counts: csr_matrix, rows: np.ndarray, term_id: int) -> np.ndarray:
+        """
+        Locate the count entries of a term in some documents.
+        
+        Args:
+            counts: Sparse CSR count matrix of the segment
+            rows: Segment-local rows that contain the term, ascending
+            term_id: Vocabulary index of the term
+        
+        Returns:
+            Entry index of the term in each row
+        """
+        if self._entry_keys is None:
+            entry_rows = np.repeat(np.arange(counts.shape[0], dtype=np.int64), np.diff(counts.indptr))
+            self._entry_keys = (entry_rows << 32) | counts.indices
+        return np.searchsorted(self._entry_keys, (rows.astype(np.int64) << 32) | term_id)
+    
+    def save(self, path: str, prefix: str = 'positions') -> Dict:
+        """
+        Write the arrays into an index directory.
+        
+        Args:
+            path: Index directory
+            prefix: Prefix for the array file names
+        
+        Returns:
+            State to record in the manifest
+        """
+        for name in self.ARRAYS:
+            save_array(path, f'{prefix}_{name}', getattr(self, name))
+        return {'arrays': list(self.ARRAYS)}
+    
+    @classmethod
+    def load(cls, path: str, state: Dict, prefix: str = 'positions') -> 'PositionalIndex':
+        """
+        Memory-map an index written by save().
+        
+        Args:
+            path: Index directory
+            state: State returned by save()
+            prefix: Prefix used when saving
+        
+        Returns:
+            Positional index backed by read-only mapped arrays
+        """
+        index = cls()
+        for name in state['arrays']:
+            setattr(index, name, load_array(path, f'{prefix}_{name}'))
+        return index
+
+
+def match_phrase(segment: 'IndexSegment', term_ids: List[int], offsets: List[int],
+                 stats: Dict[str, int] = None) -> np.ndarray:
+    """
+    Find the documents of a segment containing a phrase.
+    
+    Args:
+        segment: Segment with a positional index
+        term_ids: Vocabulary index of each phrase term
+        offsets: Position of each term relative to the first one
+        stats: Optional dict to add candidate and match counts to
+    
+    Returns:
+        Matching doc ids, ascending
+    """
+    candidates = _candidates(segment.index, term_ids)
+    if len(term_ids) > 1 and len(candidates):
+        rows = candidates - segment.doc_offset
+        starts = None
+        for term_id, offset in zip(term_ids, offsets):
+            keys = _position_keys(segment, rows, term_id)
+            # Where the phrase would start, for occurrences that allow one
+            keys = keys[(keys & 0xFFFFFFFF) >= offset] - offset
+            starts = keys if starts is None else np.intersect1d(starts, keys, assume_unique=True)
+            if not len(starts):
+                break
+        matches = candidates[np.unique(starts >> 32)]
+    else:
+        matches = candidates
+    _count(stats, candidates, matches)
+    return matches
+
+
+def match_near(segment: 'IndexSegment', term_a: int, term_b: int, distance: int,
+               stats: Dict[str, int] = None) -> np.ndarray:
+    """
+    Find the documents of a segment where two terms occur within a distance.
+    
+    Args:
+        segment: Segment with a positional index
+        term_a: Vocabulary index of the first term
+        term_b: Vocabulary index of the second term
+        distance: Maximum number of positions between the occurrences
+        stats: Optional dict to add candidate and match counts to
+    
+    Returns:
+        Matching doc ids, ascending
+    """
+    candidates = _candidates(segment.index, [term_a, term_b])
+    if not len(candidates):
+        _count(stats, candidates, candidates)
+        return candidates
+    
+    rows = candidates - segment.doc_offset
+    keys_a = _position_keys(segment, rows, term_a)
+    owners_a = keys_a >> 32
+    if term_a == term_b:
+        # Two different occurrences of the same term: compare neighbours
+        close = (np.diff(keys_a) <= distance) & (owners_a[1:] == owners_a[:-1])
+        owners = owners_a[1:][close]
+    else:
+        # Compare each occurrence of a with the nearest occurrences of b
+        keys_b = _position_keys(segment, rows, term_b)
+        after = np.searchsorted(keys_b, keys_a)
+        next_b = keys_b[np.minimum(after, len(keys_b) - 1)]
+        prev_b = keys_b[np.maximum(after - 1, 0)]
+        close = (((after < len(keys_b)) & (next_b >> 32 == owners_a) & (next_b - keys_a <= distance))
+                 | ((after > 0) & (prev_b >> 32 == owners_a) & (keys_a - prev_b <= distance)))
+        owners = owners_a[close]
+    
+    matches = candidates[np.unique(owners)]
+    _count(stats, candidates, matches)
+    return matches
+
+
+def _candidates(index: InvertedIndex, term_ids: List[int]) -> np.ndarray:
+    """Doc ids whose posting lists contain every term, rarest list first."""
+    if any(term_id >= index.vocab_size for term_id in term_ids):
+        return np.empty(0, dtype=np.int64)  # term added after this segment was built
+    
+    candidates = None
+    for term_id in sorted(set(term_ids), key=index.doc_freq):
+        candidates = (index.postings(term_id)[0] if candidates is None
+                      else index.intersect(term_id, candidates))
+        if not len(candidates):
+            break
+    return candidates
+
+
+def _position_keys(segment: 'IndexSegment', rows: np.ndarray, term_id: int) -> np.ndarray:
+    """Sorted (candidate << 32) | position keys of a term's occurrences."""
+    entries = segment.positions.find_entries(segment.counts, rows, term_id)
+    owners, positions = segment.positions.decode(entries)
+    return (owners << 32) | positions
+
+
+def _count(stats: Dict[str, int], candidates: np.ndarray, matches: np.ndarray) -> None:
+    """Add candidate and match counts to a stats dict."""
+    if stats is not None:
+        stats['phrase_candidates'] = stats.get('phrase_candidates', 0) + len(candidates)
+        stats['phrase_matches'] = stats.get('phrase_matches', 0) + len(matches)
\ No newline at end of file
@@ -1,42 +1,250 @@
 """
 Text preprocessing module for search engine.
 Handles cleaning, tokenization, and stopword removal.
+
+NLTK is only imported when its tokenizer or stemmer is first used, so
+importing this module (e.g. in a fresh worker process) stays cheap, and
+the fast tokenizer works without any NLTK data.
 """
 
+import os
 import re
 import string
-from typing import List
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
-
-# Download required NLTK data (run once)
-import nltk
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Tuple
+from src.stopwords import ENGLISH_STOP_WORDS
+
+if TYPE_CHECKING:
+    from src.vectorizer import PartialCounts
+
+# Tokenizers: NLTK's word_tokenize on cleaned text, or one regex pass
+TOKENIZERS = ('nltk', 'fast')
+
+# Single-pass tokenizer over lowercased text: URLs and email addresses are
+# matched whole and dropped, words are runs of letters (optionally joined
+# by hyphens), and digits, underscores and other punctuation separate words
+FAST_TOKEN_PATTERN = re.compile(r'http\S+|www\S+|\S+@\S+|([^\W\d_]+(?:-[^\W\d_]+)*)')
+
+# The fast tokenizer's pattern for text that is not lowercased first
+FAST_SPAN_PATTERN = re.compile(FAST_TOKEN_PATTERN.pattern, re.IGNORECASE)
+
+# Tokens NLTK's word_tokenize writes for double quotes (and for `` or '')
+NLTK_QUOTES = ('``', "''")
+
+# Substitutions of clean_text, applied in order to lowercased text: URLs,
+# email addresses and numbers are removed and whitespace is collapsed
+CLEAN_STEPS = (
+    (re.compile(r'http\S+|www\S+'), ''),
+    (re.compile(r'\S+@\S+'), ''),
+    (re.compile(r'\d+'), ''),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+# NLTK's word_tokenize, once loaded by load_word_tokenize
+_word_tokenize: Callable[[str], List[str]] = None
+
+
+def load_word_tokenize() -> Callable[[str], List[str]]:
+    """
+    Import NLTK's word_tokenize on first use.
+    
+    NLTK data is never downloaded implicitly; install the Punkt model
+    once with nltk.download('punkt_tab').
+    
+    Returns:
+        The word_tokenize function
+        
+    Raises:
+        LookupError: If the Punkt model is not installed; the 'fast'
+            tokenizer needs no NLTK data
+    """
+    global _word_tokenize
+    if _word_tokenize is None:
+        from nltk.tokenize import word_tokenize
+        try:
+            word_tokenize('.')
+        except LookupError as error:
+            raise LookupError(
+                "NLTK's Punkt tokenizer model is not installed. Run "
+                "python -c \"import nltk; nltk.download('punkt_tab')\", or use "
+                "TextPreprocessor(tokenizer='fast'), which needs no NLTK data."
+            ) from error
+        _word_tokenize = word_tokenize
+    return _word_tokenize
+
+
+class StemCache:
+    """
+    Bounded token -> stem memo.
+    
+    Word frequencies are Zipfian, so a few thousand distinct tokens cover
+    most occurrences and each is stemmed only once. When full, the least
+    recently used entry is evicted ('lru'), or the oldest one ('fifo',
+    which skips the reordering on every hit).
+    """
+    
+    POLICIES = ('lru', 'fifo')
+    
+    def __init__(self, stem: Callable[[str], str], max_size: int = 100000, policy: str = 'lru'):
+        """
+        Initialize empty cache.
+        
+        Args:
+            stem: Stemming function to memoize
+            max_size: Maximum number of cached tokens
+            policy: Eviction policy, 'lru' or 'fifo'
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'. Choose from {self.POLICIES}")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        
+        self.stem_function = stem
+        self.max_size = max_size
+        self.policy = policy
+        self.entries: OrderedDict = OrderedDict()  # token -> stem, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.added: List[Tuple[str, str]] = None  # new entries, if tracked (see track_added)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def stem(self, token: str) -> str:
+        """Stem one token, using the cached stem if there is one."""
+        return self.stem_tokens([token])[0]
+    
+    def stem_tokens(self, tokens: List[str]) -> List[str]:
+        """
+        Stem a list of tokens.
+        
+        Args:
+            tokens: Tokens to stem
+            
+        Returns:
+            Stem of each token
+        """
+        entries = self.entries
+        lru = self.policy == 'lru'
+        stems = []
+        misses = 0
+        for token in tokens:
+            stem = entries.get(token)
+            if stem is None:
+                misses += 1
+                stem = self.stem_function(token)
+                entries[token] = stem
+                if self.added is not None:
+                    self.added.append((token, stem))
+                if len(entries) > self.max_size:
+                    entries.popitem(last=False)
+            elif lru:
+                try:
+                    entries.move_to_end(token)
+                except KeyError:
+                    pass  # Evicted meanwhile by another thread sharing the cache
+            stems.append(stem)
+        
+        self.hits += len(tokens) - misses
+        self.misses += misses
+        return stems
+    
+    def update(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """
+        Insert known (token, stem) pairs, e.g. from another process or disk.
+        
+        Args:
+            entries: Pairs to insert, oldest first
+        """
+        for token, stem in entries:
+            self.entries[token] = stem
+            self.entries.move_to_end(token)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def track_added(self) -> None:
+        """Start recording entries computed on misses (see take_added)."""
+        self.added = []
+    
+    def take_added(self) -> List[Tuple[str, str]]:
+        """Return and forget the entries recorded since the last call."""
+        added, self.added = self.added, []
+        return added
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache counters.
+        
+        Returns:
+            Dict with size, max_size, hits, misses and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
 
 
 class TextPreprocessor:
     """Preprocesses text documents for search indexing."""
     
-    def __init__(self, use_stemming: bool = True, remove_stopwords: bool = True):
+    def __init__(self, use_stemming: bool = True, remove_stopwords: bool = True,
+                 stem_cache_size: int = 100000, stem_cache_policy: str = 'lru',
+                 tokenizer: str = 'nltk'):
         """
         Initialize preprocessor.
         
         Args:
             use_stemming: Apply Porter stemming to tokens
             remove_stopwords: Remove English stopwords
+            stem_cache_size: Maximum number of memoized stems (0 disables
+                the cache)
+            stem_cache_policy: Stem cache eviction policy, 'lru' or 'fifo'
+            tokenizer: 'nltk' cleans the text and runs NLTK's word_tokenize;
+                'fast' cleans and splits it in one regex pass. The fast
+                tokenizer splits contractions and abbreviations at
+                punctuation ("don't" -> "don", "t") where NLTK keeps
+                Treebank tokens such as "n't" and "u.s.a".
         """
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Unknown tokenizer '{tokenizer}'. Choose from {TOKENIZERS}")
+        
+        self._stemmer = None
         self.use_stemming = use_stemming
         self.remove_stopwords = remove_stopwords
-        self.stemmer = PorterStemmer() if use_stemming else None
-        self.stop_words = set(stopwords.words('english')) if remove_stopwords else set()
+        self.stop_words = ENGLISH_STOP_WORDS if remove_stopwords else frozenset()
+        self.stem_cache = (StemCache(self._stem_token, stem_cache_size, stem_cache_policy)
+                           if use_stemming and stem_cache_size else None)
+        self.stem_cache_size = stem_cache_size
+        self.stem_cache_policy = stem_cache_policy
+        self.tokenizer = tokenizer
+    
+    @property
+    def stemmer(self):
+        """Porter stemmer, created on first use (None without stemming)."""
+        if self._stemmer is None and self.use_stemming:
+            from nltk.stem import PorterStemmer
+            self._stemmer = PorterStemmer()
+        return self._stemmer
+    
+    def _stem_token(self, token: str) -> str:
+        """Stem one token with the Porter stemmer."""
+        return self.stemmer.stem(token)
+    
+    def settings(self) -> Dict:
+        """Return the constructor arguments of this preprocessor."""
+        return {
+            'use_stemming': self.use_stemming,
+            'remove_stopwords': self.remove_stopwords,
+            'stem_cache_size': self.stem_cache_size,
+            'stem_cache_policy': self.stem_cache_policy,
+            'tokenizer': self.tokenizer,
+        }
     
     def clean_text(self, text: str) -> str:
         """
@@ -48,22 +256,40 @@ class TextPreprocessor:
         Returns:
             Cleaned lowercase text
         """
-        # Lowercase
         text = text.lower()
+        for pattern, replacement in CLEAN_STEPS:
+            text = pattern.sub(replacement, text)
+        return text.strip()
+    
+    def clean_text_offsets(self, text: str) -> Tuple[str, List[int]]:
+        """
+        Basic text cleaning, keeping track of where each character came from.
         
-        # Remove URLs
-        text = re.sub(r'http\S+|www\S+', '', text)
-        
-        # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
-        
-        # Remove numbers
-        text = re.sub(r'\d+', '', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        Args:
+            text: Raw text string
+            
+        Returns:
+            Tuple of (cleaned text as returned by clean_text, index in text
+            of each cleaned character)
+        """
+        cleaned = text.lower()
+        if len(cleaned) != len(text):
+            # A few characters lowercase to several; keep one per character
+            cleaned = ''.join(char.lower()[0] for char in text)
+        offsets = list(range(len(text)))
+        for pattern, replacement in CLEAN_STEPS:
+            pieces, kept, position = [], [], 0
+            for match in pattern.finditer(cleaned):
+                start = match.start()
+                pieces += [cleaned[position:start], replacement]
+                kept += offsets[position:start] + offsets[start:start + len(replacement)]
+                position = match.end()
+            pieces.append(cleaned[position:])
+            kept += offsets[position:]
+            cleaned, offsets = ''.join(pieces), kept
+        first = len(cleaned) - len(cleaned.lstrip())
+        cleaned = cleaned.strip()
+        return cleaned, offsets[first:first + len(cleaned)]
     
     def tokenize(self, text: str) -> List[str]:
         """
@@ -75,23 +301,134 @@ class TextPreprocessor:
         Returns:
             List of processed tokens
         """
-        # Tokenize
-        tokens = word_tokenize(text)
+        return self.tokenize_positions(text)[0]
+    
+    def tokenize_positions(self, text: str) -> Tuple[List[str], List[int]]:
+        """
+        Tokenize and filter text, keeping the position of each kept token.
+        
+        Positions count every word of the tokenizer's output, including
+        removed stopwords and short words but not punctuation, so a phrase
+        only matches where its words stand at the same distances in the text.
+        
+        Args:
+            text: Cleaned text string
+            
+        Returns:
+            Tuple of (processed tokens, their positions)
+        """
+        return self.filter_words(self.words(text))
+    
+    def filter_words(self, words: List[str]) -> Tuple[List[str], List[int]]:
+        """
+        Remove short words and stopwords, and stem the rest.
         
-        # Remove punctuation and short tokens
-        tokens = [
-            token for token in tokens 
-            if token not in string.punctuation and len(token) > 2
+        Args:
+            words: Lowercase words, as returned by words()
+            
+        Returns:
+            Tuple of (processed tokens, indices of the kept words)
+        """
+        stop_words = self.stop_words
+        positions = [
+            i for i, token in enumerate(words)
+            if len(token) > 2 and token not in stop_words
         ]
+        tokens = self.stem([words[i] for i in positions])
+        return tokens, positions
+    
+    def words(self, text: str) -> List[str]:
+        """
+        Split text into words, dropping punctuation.
+        
+        Args:
+            text: Cleaned text string (the fast tokenizer also accepts raw text)
+            
+        Returns:
+            Lowercase words, including stopwords and short words
+        """
+        if self.tokenizer == 'fast':
+            return [word for word in FAST_TOKEN_PATTERN.findall(text.lower()) if word]
+        return [token for token in load_word_tokenize()(text) if token not in string.punctuation]
+    
+    def word_spans(self, text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Clean and split raw text into words, keeping where each word stands.
         
-        # Remove stopwords
-        if self.remove_stopwords:
-            tokens = [token for token in tokens if token not in self.stop_words]
+        The words are those preprocess() filters and stems, except that the
+        few tokens NLTK rewrites so that they no longer occur in the cleaned
+        text (quotes) are dropped.
         
-        # Apply stemming
-        if self.use_stemming:
-            tokens = [self.stemmer.stem(token) for token in tokens]
+        Args:
+            text: Raw text string
+            
+        Returns:
+            Tuple of (lowercase words, (start, end) character range of each
+            word in text)
+        """
+        words, spans = [], []
+        if self.tokenizer == 'fast':
+            for match in FAST_SPAN_PATTERN.finditer(text):
+                if match.group(1):
+                    words.append(match.group(1).lower())
+                    spans.append(match.span(1))
+            return words, spans
         
+        cleaned, offsets = self.clean_text_offsets(text)
+        cursor = 0
+        for word in self.words(cleaned):
+            if word in NLTK_QUOTES:
+                # Quotes ", `` and '' all come back as `` or ''
+                found = [(cleaned.find(quote, cursor), len(quote)) for quote in NLTK_QUOTES + ('"',)]
+                found = [(start, length) for start, length in found if start >= 0]
+                if found:
+                    start, length = min(found)
+                    cursor = start + length
+                continue
+            start = cleaned.find(word, cursor)
+            if start < 0:
+                continue
+            cursor = start + len(word)
+            words.append(word)
+            spans.append((offsets[start], offsets[cursor - 1] + 1))
+        return words, spans
+    
+    def iter_tokens(self, text: str) -> Iterator[str]:
+        """
+        Yield the processed tokens of a raw text one at a time.
+        
+        With the fast tokenizer, words are matched as the generator is
+        consumed, so no cleaned copy of the text or list of words is built.
+        
+        Args:
+            text: Raw text string
+            
+        Yields:
+            Processed tokens, as returned by preprocess()
+        """
+        if self.tokenizer == 'fast':
+            words = (match.group(1) for match in FAST_TOKEN_PATTERN.finditer(text.lower()))
+        else:
+            words = iter(self.words(self.clean_text(text)))
+        stop_words = self.stop_words
+        for word in words:
+            if word and len(word) > 2 and word not in stop_words:
+                yield self.stem([word])[0]
+    
+    def stem(self, tokens: List[str]) -> List[str]:
+        """
+        Apply stemming (through the stem cache, if enabled) to filtered tokens.
+        
+        Args:
+            tokens: Lowercase tokens
+            
+        Returns:
+            Stemmed tokens (unchanged if stemming is disabled)
+        """
+        if self.stem_cache is not None:
+            return self.stem_cache.stem_tokens(tokens)
+        if self.use_stemming:
+            return [self.stemmer.stem(token) for token in tokens]
         return tokens
     
     def preprocess(self, text: str) -> List[str]:
@@ -104,18 +441,148 @@ class TextPreprocessor:
         Returns:
             List of processed tokens
         """
+        if self.tokenizer == 'fast':
+            # Cleaning happens in the tokenizer's single pass
+            return self.tokenize(text)
         cleaned = self.clean_text(text)
         tokens = self.tokenize(cleaned)
         return tokens
     
-    def preprocess_documents(self, documents: List[str]) -> List[List[str]]:
+    def preprocess_positions(self, text: str) -> Tuple[List[str], List[int]]:
+        """
+        Full preprocessing pipeline, keeping token positions.
+        
+        Args:
+            text: Raw text string
+            
+        Returns:
+            Tuple of (processed tokens, their positions in the cleaned text)
+        """
+        if self.tokenizer == 'fast':
+            return self.tokenize_positions(text)
+        return self.tokenize_positions(self.clean_text(text))
+    
+    def preprocess_documents(self, documents: List[str], num_workers: int = 1,
+                             chunk_size: int = None) -> List[List[str]]:
         """
         Preprocess multiple documents.
         
         Args:
             documents: List of raw text strings
+            num_workers: Number of worker processes (None: one per CPU)
+            chunk_size: Documents sent to a worker at a time (default:
+                about four chunks per worker)
+            
+        Returns:
+            List of token lists, in input order
+        """
+        num_workers = num_workers or os.cpu_count()
+        if num_workers == 1:
+            return [self.preprocess(doc) for doc in documents]
+        
+        chunks = self._map_chunks(_preprocess_chunk, documents, num_workers, chunk_size)
+        return [tokens for chunk in chunks for tokens in chunk]
+    
+    def count_documents(self, documents: List[str], num_workers: int = 1,
+                        chunk_size: int = None, positions: bool = False) -> List['PartialCounts']:
+        """
+        Preprocess documents and count their terms chunk by chunk.
+        
+        Each chunk is counted over its own vocabulary, so workers send back
+        compact sparse counts instead of token lists; TFIDFVectorizer merges
+        them with fit_partial_counts or merge_counts.
+        
+        Args:
+            documents: List of raw text strings
+            num_workers: Number of worker processes (None: one per CPU)
+            chunk_size: Documents per chunk (default: about four chunks per
+                worker)
+            positions: Also record the positions of every term occurrence
             
         Returns:
-            List of token lists
+            Partial counts of consecutive chunks, in input order
+        """
+        num_workers = num_workers or os.cpu_count()
+        if num_workers == 1:
+            return [self._count(chunk, positions)
+                    for chunk in _split(documents, chunk_size or len(documents))]
+        return self._map_chunks(_count_positions_chunk if positions else _count_chunk,
+                                documents, num_workers, chunk_size)
+    
+    def _count(self, documents: List[str], positions: bool = False) -> 'PartialCounts':
+        """Preprocess a chunk of documents and count its terms."""
+        # Imported here so that importing this module does not load SciPy
+        from src.vectorizer import PartialCounts
+        if not positions:
+            return PartialCounts.from_documents(self.preprocess_documents(documents))
+        processed = [self.preprocess_positions(doc) for doc in documents]
+        return PartialCounts.from_documents([tokens for tokens, _ in processed],
+                                            [doc_positions for _, doc_positions in processed])
+    
+    def _map_chunks(self, func: Callable, documents: List[str], num_workers: int,
+                    chunk_size: int = None) -> List:
+        """
+        Apply a chunk function in a process pool, keeping chunk order.
+        
+        Workers start with a copy of this preprocessor's stem cache and send
+        back the stems they compute, which are merged into it.
         """
-        return [self.preprocess(doc) for doc in documents]
\ No newline at end of file
+        if chunk_size is None:
+            chunk_size = -(-len(documents) // (4 * num_workers))
+        
+        cache = self.stem_cache
+        initargs = (self.settings(), list(cache.entries.items()) if cache is not None else [])
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            results = []
+            for result, added, hits, misses in pool.map(func, _split(documents, chunk_size)):
+                if cache is not None:
+                    cache.update(added)
+                    cache.hits += hits
+                    cache.misses += misses
+                results.append(result)
+            return results
+
+
+# Preprocessor of a pool worker, created once per process by _init_worker
+_worker_preprocessor: TextPreprocessor = None
+
+
+def _init_worker(settings: Dict, stem_entries: List[Tuple[str, str]]) -> None:
+    """Set up the preprocessor of a worker process with a warm stem cache."""
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(**settings)
+    if _worker_preprocessor.stem_cache is not None:
+        _worker_preprocessor.stem_cache.update(stem_entries)
+        _worker_preprocessor.stem_cache.track_added()
+
+
+def _run_chunk(func: Callable, documents: List[str]) -> Tuple:
+    """Run a worker task, returning its result with the stem cache changes."""
+    cache = _worker_preprocessor.stem_cache
+    if cache is None:
+        return func(documents), [], 0, 0
+    hits, misses = cache.hits, cache.misses
+    result = func(documents)
+    return result, cache.take_added(), cache.hits - hits, cache.misses - misses
+
+
+def _preprocess_chunk(documents: List[str]) -> Tuple:
+    """Worker task: preprocess a chunk of documents."""
+    return _run_chunk(_worker_preprocessor.preprocess_documents, documents)
+
+
+def _count_chunk(documents: List[str]) -> Tuple:
+    """Worker task: preprocess a chunk of documents and count its terms."""
+    return _run_chunk(_worker_preprocessor._count, documents)
+
+
+def _count_positions_chunk(documents: List[str]) -> Tuple:
+    """Worker task: count the terms of a chunk of documents with their positions."""
+    return _run_chunk(lambda chunk: _worker_preprocessor._count(chunk, positions=True), documents)
+
+
+def _split(documents: List[str], chunk_size: int) -> List[List[str]]:
+    """Cut documents into consecutive chunks (at least one, possibly empty)."""
+    chunk_size = max(chunk_size, 1)
+    return [documents[i:i + chunk_size] for i in range(0, max(len(documents), 1), chunk_size)]
\ No newline at end of file
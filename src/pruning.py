@@ -0,0 +1,344 @@
+"""
+Dynamic pruning strategies for top-k retrieval over an inverted index.
+
+WAND, Block-Max WAND and MaxScore skip postings whose documents cannot
+enter the current top-k, using the per-term and per-block upper bounds
+from InvertedIndex.compute_upper_bounds. Every document that is scored is
+scored completely, in query term order, so results are identical to
+exhaustive evaluation.
+"""
+
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+import numpy as np
+from src.index import InvertedIndex, ImpactFunction
+
+# Upper bounds are inflated slightly so that floating point summation order
+# can never make a bound smaller than the score it is meant to cover.
+BOUND_SLACK = 1.0 + 1e-9
+
+END_OF_LIST = float('inf')
+
+
+class PostingCursor:
+    """Iterates one posting list, skipping block-wise and scoring lazily."""
+    
+    def __init__(self, index: InvertedIndex, term_id: int, weight: float,
+                 impact: ImpactFunction, stats: Dict[str, int]):
+        """
+        Position a cursor on the first posting of a term.
+        
+        Args:
+            index: Inverted index with precomputed upper bounds
+            term_id: Vocabulary index of the term
+            weight: Query weight of the term
+            impact: Per-posting document impact function
+            stats: Counters shared by all cursors of a query
+        """
+        self.term_id = term_id
+        self.weight = weight
+        self.impact = impact
+        self.stats = stats
+        
+        self.doc_array, self.tf_array = index.postings(term_id)
+        self.docs = self.doc_array.tolist()
+        self.pos = 0
+        self.doc = self.docs[0] if self.docs else END_OF_LIST
+        
+        self.upper_bound = float(index.term_max_impacts[term_id]) * weight * BOUND_SLACK
+        start, end = index.block_offsets[term_id], index.block_offsets[term_id + 1]
+        self.block_size = index.block_size
+        self.block_last_docs = index.block_last_docs[start:end].tolist()
+        self.block_bounds = (index.block_max_impacts[start:end] * weight * BOUND_SLACK).tolist()
+        self._block_scores = {}
+        
+        stats['postings_total'] += len(self.docs)
+    
+    def next(self) -> None:
+        """Move to the next posting."""
+        self.pos += 1
+        self.doc = self.docs[self.pos] if self.pos < len(self.docs) else END_OF_LIST
+    
+    def advance(self, target: int) -> None:
+        """
+        Move to the first posting with doc id >= target.
+        
+        Whole blocks are skipped by their last doc id before searching
+        inside the block that may contain the target.
+        
+        Args:
+            target: Doc id to advance to
+        """
+        if self.doc >= target:
+            return
+        block = bisect_left(self.block_last_docs, target, self.pos // self.block_size)
+        if block == len(self.block_last_docs):
+            self.pos = len(self.docs)
+            self.doc = END_OF_LIST
+            return
+        lo = max(self.pos, block * self.block_size)
+        hi = min(lo - lo % self.block_size + self.block_size, len(self.docs))
+        self.pos = bisect_left(self.docs, target, lo, hi)
+        self.doc = self.docs[self.pos]
+    
+    def block_bound(self, target: int) -> float:
+        """
+        Upper bound of the block that would contain target, without moving.
+        
+        Args:
+            target: Doc id to look up
+        
+        Returns:
+            Weighted block maximum, or 0 if the list ends before target
+        """
+        block = bisect_left(self.block_last_docs, target, self.pos // self.block_size)
+        return self.block_bounds[block] if block < len(self.block_bounds) else 0.0
+    
+    def block_last_doc(self, target: int) -> float:
+        """Last doc id of the block that would contain target."""
+        block = bisect_left(self.block_last_docs, target, self.pos // self.block_size)
+        return self.block_last_docs[block] if block < len(self.block_last_docs) else END_OF_LIST
+    
+    def score(self) -> float:
+        """
+        Weighted contribution of the current posting.
+        
+        Impacts are computed for a whole block on first use, with the same
+        arithmetic as the other strategies.
+        """
+        block = self.pos // self.block_size
+        scores = self._block_scores.get(block)
+        if scores is None:
+            start = block * self.block_size
+            end = start + self.block_size
+            impacts = self.impact(self.term_id, self.doc_array[start:end], self.tf_array[start:end])
+            scores = (impacts * self.weight).tolist()
+            self._block_scores[block] = scores
+        self.stats['postings_scored'] += 1
+        return scores[self.pos % self.block_size]
+
+
+class TopKHeap:
+    """Keeps the k best (doc, score) pairs seen in doc id order."""
+    
+    def __init__(self, k: int):
+        """
+        Initialize empty heap.
+        
+        Args:
+            k: Number of results to keep
+        """
+        self.k = k
+        self.entries = []  # min-heap of (score, -doc_id)
+    
+    @property
+    def threshold(self) -> float:
+        """Score a new document must beat to enter the heap."""
+        return self.entries[0][0] if len(self.entries) >= self.k else 0.0
+    
+    def push(self, doc_id: int, score: float) -> None:
+        """Offer a fully scored document."""
+        if score <= self.threshold:
+            return
+        if len(self.entries) < self.k:
+            heapq.heappush(self.entries, (score, -doc_id))
+        else:
+            heapq.heapreplace(self.entries, (score, -doc_id))
+    
+    def results(self) -> List[Tuple[int, float]]:
+        """Return (doc_id, score) pairs, best first, ties by doc id."""
+        ranked = sorted(self.entries, key=lambda e: (-e[0], -e[1]))
+        return [(-neg_doc, score) for score, neg_doc in ranked]
+
+
+def _open_cursors(index: InvertedIndex, term_ids: np.ndarray, weights: np.ndarray,
+                  impact: ImpactFunction, stats: Dict[str, int]) -> List[PostingCursor]:
+    """Create one cursor per query term, dropping empty posting lists."""
+    if index.term_max_impacts is None:
+        raise ValueError("Index has no upper bounds. Call compute_upper_bounds() first.")
+    cursors = [PostingCursor(index, int(t), float(w), impact, stats)
+               for t, w in zip(term_ids, weights) if t < index.vocab_size]
+    return [c for c in cursors if c.doc != END_OF_LIST]
+
+
+def _score_document(cursors: List[PostingCursor], doc_id: int) -> float:
+    """Fully score a document, summing contributions in query term order."""
+    matched = sorted((c for c in cursors if c.doc == doc_id), key=lambda c: c.term_id)
+    score = 0.0
+    for cursor in matched:
+        score += cursor.score()
+    return score
+
+
+def _new_stats() -> Dict[str, int]:
+    """Create zeroed pruning counters."""
+    return {'postings_total': 0, 'postings_scored': 0, 'docs_scored': 0}
+
+
+def wand_top_k(index: InvertedIndex, term_ids: np.ndarray, weights: np.ndarray,
+               impact: ImpactFunction, top_k: int, use_block_max: bool = True,
+               stats: Dict[str, int] = None,
+               deleted: np.ndarray = None) -> List[Tuple[int, float]]:
+    """
+    Top-k retrieval with WAND, optionally refined by block-max bounds (BMW).
+    
+    Cursors are kept sorted by current doc id. The pivot is the first
+    cursor at which the summed term upper bounds exceed the top-k
+    threshold; no document before the pivot doc can make the top-k. With
+    block-max enabled, the pivot is additionally checked against the
+    maxima of the blocks that contain it, and whole blocks are skipped
+    when they cannot qualify.
+    
+    Args:
+        index: Inverted index with precomputed upper bounds
+        term_ids: Query term indices, ascending
+        weights: Query weight for each term
+        impact: Per-posting document impact function
+        top_k: Number of results to return
+        use_block_max: Use per-block bounds (Block-Max WAND)
+        stats: Optional dict receiving postings_total/postings_scored/docs_scored
+        deleted: Optional mask of deleted doc ids, skipped without scoring
+    
+    Returns:
+        List of (doc_id, score) with positive scores, best first
+    """
+    stats = stats if stats is not None else _new_stats()
+    for key, value in _new_stats().items():
+        stats.setdefault(key, value)
+    if top_k <= 0:
+        return []
+    
+    cursors = _open_cursors(index, term_ids, weights, impact, stats)
+    heap = TopKHeap(top_k)
+    
+    while True:
+        cursors = [c for c in cursors if c.doc != END_OF_LIST]
+        if not cursors:
+            break
+        cursors.sort(key=lambda c: c.doc)
+        threshold = heap.threshold
+        
+        # Find the pivot: first cursor where the bound sum beats the threshold
+        bound = 0.0
+        pivot = None
+        for i, cursor in enumerate(cursors):
+            bound += cursor.upper_bound
+            if bound > threshold:
+                pivot = i
+                break
+        if pivot is None:
+            break
+        
+        # Include later cursors already sitting on the pivot doc
+        pivot_doc = cursors[pivot].doc
+        while pivot + 1 < len(cursors) and cursors[pivot + 1].doc == pivot_doc:
+            pivot += 1
+        
+        if use_block_max:
+            block_bound = sum(c.block_bound(pivot_doc) for c in cursors[:pivot + 1])
+            if block_bound <= threshold:
+                # No doc up to the end of the shortest current block can qualify
+                next_doc = min(c.block_last_doc(pivot_doc) for c in cursors[:pivot + 1]) + 1
+                if pivot + 1 < len(cursors):
+                    next_doc = min(next_doc, cursors[pivot + 1].doc)
+                next_doc = max(next_doc, pivot_doc + 1)
+                for cursor in cursors[:pivot + 1]:
+                    cursor.advance(next_doc)
+                continue
+        
+        if cursors[0].doc == pivot_doc:
+            if deleted is None or not deleted[pivot_doc]:
+                stats['docs_scored'] += 1
+                heap.push(pivot_doc, _score_document(cursors, pivot_doc))
+            for cursor in cursors:
+                if cursor.doc == pivot_doc:
+                    cursor.next()
+        else:
+            # Documents before the pivot doc cannot reach the threshold
+            for cursor in cursors[:pivot]:
+                cursor.advance(pivot_doc)
+    
+    return heap.results()
+
+
+def maxscore_top_k(index: InvertedIndex, term_ids: np.ndarray, weights: np.ndarray,
+                   impact: ImpactFunction, top_k: int,
+                   stats: Dict[str, int] = None,
+                   deleted: np.ndarray = None) -> List[Tuple[int, float]]:
+    """
+    Top-k retrieval with MaxScore.
+    
+    Terms are ordered by upper bound. The lowest-bound terms whose bounds
+    together cannot beat the threshold are non-essential: they never
+    produce candidates and are only probed for documents found in the
+    essential lists, and probing stops early once a candidate's remaining
+    bound cannot reach the threshold.
+    
+    Args:
+        index: Inverted index with precomputed upper bounds
+        term_ids: Query term indices, ascending
+        weights: Query weight for each term
+        impact: Per-posting document impact function
+        top_k: Number of results to return
+        stats: Optional dict receiving postings_total/postings_scored/docs_scored
+        deleted: Optional mask of deleted doc ids, skipped without scoring
+    
+    Returns:
+        List of (doc_id, score) with positive scores, best first
+    """
+    stats = stats if stats is not None else _new_stats()
+    for key, value in _new_stats().items():
+        stats.setdefault(key, value)
+    if top_k <= 0:
+        return []
+    
+    cursors = _open_cursors(index, term_ids, weights, impact, stats)
+    cursors.sort(key=lambda c: c.upper_bound)
+    prefix_bounds = np.cumsum([c.upper_bound for c in cursors]).tolist()
+    heap = TopKHeap(top_k)
+    
+    first_essential = 0
+    while first_essential < len(cursors):
+        doc_id = min(c.doc for c in cursors[first_essential:])
+        if doc_id == END_OF_LIST:
+            break
+        if deleted is not None and deleted[doc_id]:
+            for cursor in cursors[first_essential:]:
+                if cursor.doc == doc_id:
+                    cursor.next()
+            continue
+        
+        # Essential lists contribute directly; probe the rest from the top
+        contributions = [(c.term_id, c.score()) for c in cursors[first_essential:]
+                         if c.doc == doc_id]
+        partial = sum(score for _, score in contributions)
+        qualifies = True
+        for i in range(first_essential - 1, -1, -1):
+            if partial + prefix_bounds[i] <= heap.threshold:
+                qualifies = False
+                break
+            cursors[i].advance(doc_id)
+            if cursors[i].doc == doc_id:
+                score = cursors[i].score()
+                contributions.append((cursors[i].term_id, score))
+                partial += score
+        
+        if qualifies:
+            # Re-add in query term order so scores match the other strategies
+            stats['docs_scored'] += 1
+            score = 0.0
+            for _, contribution in sorted(contributions):
+                score += contribution
+            heap.push(doc_id, score)
+        
+        for cursor in cursors[first_essential:]:
+            if cursor.doc == doc_id:
+                cursor.next()
+        
+        # A higher threshold can turn more lists non-essential
+        while (first_essential < len(cursors)
+               and prefix_bounds[first_essential] <= heap.threshold):
+            first_essential += 1
+    
+    return heap.results()
\ No newline at end of file
@@ -1,47 +1,1197 @@
 """
-Search engine module with cosine similarity ranking.
+Search engine module with pluggable ranking models.
 """
 
+import os
+import copy
+import shutil
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import Callable, Iterable, Iterator, List, Dict, Tuple
+from scipy.sparse import csr_matrix, diags, issparse, vstack
+from src.loader import batched
 from src.preprocessing import TextPreprocessor
 from src.vectorizer import TFIDFVectorizer
+from src.index import InvertedIndex, ImpactFunction
+from src.compression import CODECS
+from src.pruning import wand_top_k, maxscore_top_k
+from src.segments import IndexSegment, resize_columns, stack_counts
+from src.positions import (PositionalIndex, parse_query, has_query_operators,
+                           match_phrase, match_near)
+from src.metrics import SearchMetrics, QueryProfile, NO_PROFILE
+from src.storage import (save_array, load_array, save_vocabulary, MappedVocabulary,
+                         save_documents, MappedDocuments, save_strings, MappedStrings,
+                         write_manifest, read_manifest, replace_directory)
 
+logger = logging.getLogger(__name__)
 
-class SearchEngine:
-    """TF-IDF based document search engine."""
+# Characters of a document shown in result previews
+PREVIEW_CHARS = 200
+
+# Storage types of the document matrix: floats, or integer codes with a
+# per-term scale
+VECTOR_DTYPES = ('float64', 'float32', 'uint16', 'uint8')
+
+# Nonzeros of a document matrix converted or weighted at a time
+SCORE_BLOCK_NNZ = 1 << 20
+
+# Fewest queries search_many preprocesses in worker processes; smaller
+# batches are preprocessed in-process, as starting a pool costs more
+PARALLEL_QUERY_BATCH = 5000
+
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Select indices of the k highest scores without a full sort.
+    
+    Ties are broken by lower index, matching a stable descending sort.
+    
+    Args:
+        scores: Score for every candidate
+        k: Number of indices to select
+        
+    Returns:
+        Indices of the top k scores, best first
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    
+    if k < n:
+        # Partial selection finds the k-th best score in O(n)
+        partition = np.argpartition(-scores, k - 1)[:k]
+        kth_score = scores[partition].min()
+        
+        # Resolve ties at the boundary in favour of the lowest indices
+        above = np.flatnonzero(scores > kth_score)
+        tied = np.flatnonzero(scores == kth_score)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+    
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def select_top_k_rows(scores: np.ndarray, k: int) -> List[np.ndarray]:
+    """
+    Select the indices of the k highest positive scores of every row.
+    
+    Rows are processed together: one partial sort finds each row's k-th
+    best score, and only the candidates at or above it are sorted. Ties are
+    broken by lower index, as in select_top_k.
+    
+    Args:
+        scores: Score matrix, one row per query
+        k: Number of indices to select per row
+        
+    Returns:
+        Indices of each row's top k positive scores, best first
+    """
+    num_rows, n = scores.shape
+    k = min(k, n)
+    if k <= 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(num_rows)]
+    
+    # k-th best score of each row; rows with fewer than k positive
+    # scores keep all of them
+    kth_scores = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+    rows, cols = np.nonzero((scores >= kth_scores[:, None]) & (scores > 0))
+    
+    # Order candidates by row, then score descending, then index
+    order = np.lexsort((cols, -scores[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    
+    # Keep the first k candidates of each row (more may tie at the k-th score)
+    row_starts = np.searchsorted(rows, np.arange(num_rows + 1))
+    keep = np.arange(len(rows)) - row_starts[rows] < k
+    rows, cols = rows[keep], cols[keep]
+    row_starts = np.searchsorted(rows, np.arange(num_rows + 1))
+    return [cols[row_starts[r]:row_starts[r + 1]] for r in range(num_rows)]
+
+
+def row_blocks(matrix: csr_matrix, max_nnz: int = SCORE_BLOCK_NNZ) -> Iterator[Tuple[int, int, csr_matrix]]:
+    """
+    Split a CSR matrix into consecutive blocks of rows.
+    
+    Blocks share the matrix's arrays, so a memory-mapped matrix is only
+    read block by block.
+    
+    Args:
+        matrix: Sparse CSR matrix
+        max_nnz: Nonzeros per block (a single longer row is its own block)
+        
+    Yields:
+        Tuples of (first row, end row, block of those rows)
+    """
+    indptr = matrix.indptr
+    start = 0
+    while start < matrix.shape[0]:
+        stop = max(int(np.searchsorted(indptr, indptr[start] + max_nnz, side='right')) - 1,
+                   start + 1)
+        stop = min(stop, matrix.shape[0])
+        first, last = indptr[start], indptr[stop]
+        block = csr_matrix((matrix.data[first:last], matrix.indices[first:last],
+                            indptr[start:stop + 1] - first),
+                           shape=(stop - start, matrix.shape[1]), copy=False)
+        yield start, stop, block
+        start = stop
+
+
+def compact_vectors(doc_vectors: csr_matrix, dtype: str) -> Tuple[csr_matrix, np.ndarray]:
+    """
+    Store a document matrix in a narrower type.
+    
+    Integer types hold codes with one scale per term (max impact / (2^bits
+    - 1)), as in InvertedIndex.quantize_impacts, so each stored impact is
+    off by at most half its term's scale.
+    
+    Args:
+        doc_vectors: Sparse CSR float64 impact matrix
+        dtype: One of VECTOR_DTYPES
+        
+    Returns:
+        Tuple of (matrix with dtype data, per-term scales or None for floats)
+    """
+    if dtype == 'float64':
+        return doc_vectors, None
+    if dtype == 'float32':
+        return doc_vectors.astype(np.float32), None
+    
+    max_impacts = np.zeros(doc_vectors.shape[1])
+    if doc_vectors.nnz:
+        max_impacts = np.asarray(doc_vectors.max(axis=0).todense()).ravel()
+    scales = max_impacts / np.iinfo(dtype).max
+    posting_scales = scales[doc_vectors.indices]
+    codes = np.divide(doc_vectors.data, posting_scales, out=np.zeros(doc_vectors.nnz),
+                      where=posting_scales > 0)
+    return csr_matrix((np.rint(codes).astype(dtype), doc_vectors.indices, doc_vectors.indptr),
+                      shape=doc_vectors.shape), scales
+
+
+def rounded_impacts(impact: ImpactFunction, dtype: str, scales: np.ndarray = None) -> ImpactFunction:
+    """
+    Wrap an impact function to return impacts as compact_vectors stores them.
+    
+    Index-based strategies score with the wrapped function, so they see
+    exactly the impacts of the document vectors and rank like exhaustive
+    and batched search.
+    
+    Args:
+        impact: Per-posting document impact function
+        dtype: One of VECTOR_DTYPES
+        scales: Per-term scales of integer codes, as returned by compact_vectors
+        
+    Returns:
+        Impact function rounded to dtype (float64 for integer codes)
+    """
+    if dtype == 'float64':
+        return impact
+    
+    def rounded(term_id, doc_ids: np.ndarray, term_freqs: np.ndarray) -> np.ndarray:
+        impacts = impact(term_id, doc_ids, term_freqs)
+        if scales is None:
+            return impacts.astype(np.float32).astype(np.float64)
+        term_scales = scales[term_id]
+        codes = np.divide(impacts, term_scales, out=np.zeros_like(impacts), where=term_scales > 0)
+        return np.rint(codes) * term_scales
+    return rounded
+
+
+def score_vectors(doc_vectors: csr_matrix, queries, scales: np.ndarray = None) -> np.ndarray:
+    """
+    Multiply a stored document matrix with query vectors.
+    
+    float64 matrices are multiplied as they are. Narrower types are
+    converted one block of rows at a time to the float64 impacts they
+    store (integer codes times their term's scale), so no full-size float
+    copy of the matrix is made and each score is summed from the same
+    products, in the same order, as by index-based strategies.
+    
+    Args:
+        doc_vectors: Sparse CSR document matrix, as made by compact_vectors
+        queries: Dense query vector, or sparse matrix with one column per query
+        scales: Per-term scales of integer codes
+        
+    Returns:
+        Dense scores, one per document (and query)
+    """
+    if doc_vectors.dtype == np.float64:
+        scores = doc_vectors @ queries
+        return scores.toarray() if issparse(scores) else scores
+    
+    blocks = []
+    for _, _, block in row_blocks(doc_vectors):
+        impacts = block.data.astype(np.float64)
+        if scales is not None:
+            impacts *= scales[block.indices]
+        block = csr_matrix((impacts, block.indices, block.indptr), shape=block.shape, copy=False)
+        scores = block @ queries
+        blocks.append(scores.toarray() if issparse(scores) else scores)
+    if not blocks:
+        return np.zeros((0,) + queries.shape[1:])
+    return np.concatenate(blocks)
+
+
+class ScoringModel(ABC):
+    """
+    Ranking function over term counts.
+    
+    A document's score is the sum, over the query terms, of the query
+    weight times the term weight (IDF) times the term's impact in the
+    document. Term weights depend on the whole collection and are
+    recomputed by fit_terms() whenever it changes, at a cost proportional
+    to the vocabulary. Impacts depend only on the document's own counts and
+    per-document statistics (norms, length normalization), which
+    fit_documents() computes once, when the document is indexed.
+    """
+    
+    PARAMS = ()     # constructor arguments
+    STATE = ()      # attributes computed by fit()
+    DOC_STATE = ()  # per-document arrays among STATE
+    
+    def get_params(self) -> Dict[str, float]:
+        """Return the constructor arguments of this model."""
+        return {name: getattr(self, name) for name in self.PARAMS}
+    
+    def fit(self, vectorizer: TFIDFVectorizer, counts: csr_matrix,
+            doc_lengths: np.ndarray, live_docs: np.ndarray = None,
+            avg_doc_length: float = None) -> None:
+        """
+        Precompute term weights and the statistics of every document.
+        
+        Args:
+            vectorizer: Fitted vectorizer (vocabulary, document frequencies
+                and IDF values)
+            counts: Sparse CSR matrix of raw term counts
+            doc_lengths: Number of tokens in each document
+            live_docs: Mask of documents that are not deleted (default: all)
+            avg_doc_length: Mean document length of the whole collection, if
+                these documents are only part of it (default: their own mean)
+        """
+        self.fit_terms(vectorizer, doc_lengths, live_docs, avg_doc_length)
+        for name in self.DOC_STATE:
+            setattr(self, name, None)
+        self.fit_documents(vectorizer, counts, doc_lengths)
+    
+    @abstractmethod
+    def fit_terms(self, vectorizer: TFIDFVectorizer, doc_lengths: np.ndarray,
+                  live_docs: np.ndarray = None, avg_doc_length: float = None) -> None:
+        """
+        Precompute the statistics of the whole collection, e.g. IDF values.
+        
+        Args:
+            vectorizer: Fitted vectorizer
+            doc_lengths: Number of tokens in each document
+            live_docs: Mask of documents that are not deleted (default: all)
+            avg_doc_length: Mean document length of the whole collection, if
+                these documents are only part of it (default: their own mean)
+        """
+    
+    @abstractmethod
+    def document_stats(self, vectorizer: TFIDFVectorizer, counts: csr_matrix,
+                       doc_lengths: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Compute per-document statistics with the current term statistics.
+        
+        Args:
+            vectorizer: Fitted vectorizer
+            counts: Sparse CSR matrix of raw term counts of the documents
+            doc_lengths: Number of tokens in each of these documents
+            
+        Returns:
+            Values of each DOC_STATE array for these documents
+        """
+    
+    def fit_documents(self, vectorizer: TFIDFVectorizer, counts: csr_matrix,
+                      doc_lengths: np.ndarray, doc_offset: int = 0) -> None:
+        """
+        Precompute the statistics of a range of documents.
+        
+        Other documents keep their statistics, so indexing new documents
+        costs only their own rows.
+        
+        Args:
+            vectorizer: Fitted vectorizer
+            counts: Sparse CSR matrix of raw term counts of the documents
+            doc_lengths: Number of tokens in every document of the collection
+            doc_offset: Doc id of the first row of counts
+        """
+        lengths = doc_lengths[doc_offset:doc_offset + counts.shape[0]]
+        self.set_document_stats(self.document_stats(vectorizer, counts, lengths), doc_offset)
+    
+    def set_document_stats(self, stats: Dict[str, np.ndarray], doc_offset: int) -> None:
+        """
+        Replace (or append) the statistics of a range of documents.
+        
+        Arrays are replaced rather than written in place, so searches
+        running meanwhile keep a consistent view.
+        
+        Args:
+            stats: Values of each DOC_STATE array, as from document_stats()
+            doc_offset: Doc id of the first document
+        """
+        for name, values in stats.items():
+            current = getattr(self, name)
+            if current is None:
+                current = values[:0]
+            setattr(self, name, np.concatenate([current[:doc_offset], values,
+                                                current[doc_offset + len(values):]]))
+    
+    def term_weights(self, term_ids: np.ndarray) -> np.ndarray:
+        """
+        Collection weight (IDF) of terms, by which their impacts are scaled.
+        
+        Args:
+            term_ids: Vocabulary indices of the terms
+            
+        Returns:
+            Weight of each term
+        """
+        return self.idf_values[term_ids]
+    
+    @abstractmethod
+    def document_impacts(self, term_id, doc_ids: np.ndarray,
+                         term_freqs: np.ndarray) -> np.ndarray:
+        """
+        Compute document impacts for a slice of a posting list.
+        
+        Impacts do not include the term weight, so they stay valid while
+        the collection changes.
+        
+        Args:
+            term_id: Vocabulary index of the term (or one index per posting)
+            doc_ids: Documents in the posting list
+            term_freqs: Term frequency in each document
+            
+        Returns:
+            Impact of the term in each document
+        """
+    
+    @abstractmethod
+    def query_weights(self, vectorizer: TFIDFVectorizer,
+                      query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Weight the terms of a query.
+        
+        Args:
+            vectorizer: Fitted vectorizer
+            query_tokens: Preprocessed query tokens
+            
+        Returns:
+            Tuple of (term_ids, weights) for terms with nonzero weight
+        """
+
+
+class TFIDFCosineModel(ScoringModel):
+    """TF-IDF weights with cosine similarity (unit-length documents and queries)."""
+    
+    STATE = ('idf_values', 'doc_lengths', 'doc_inv_norms')
+    DOC_STATE = ('doc_lengths', 'doc_inv_norms')
     
     def __init__(self):
-        """Initialize search engine components."""
-        self.preprocessor = TextPreprocessor(use_stemming=True, remove_stopwords=True)
+        """Initialize model."""
+        self.idf_values: np.ndarray = None
+        self.doc_lengths: np.ndarray = None
+        self.doc_inv_norms: np.ndarray = None  # 1 / L2 norm of each TF-IDF row
+    
+    def fit_terms(self, vectorizer: TFIDFVectorizer, doc_lengths: np.ndarray,
+                  live_docs: np.ndarray = None, avg_doc_length: float = None) -> None:
+        """Use the vectorizer's IDF values as term weights."""
+        self.idf_values = vectorizer.idf_values
+    
+    def document_stats(self, vectorizer: TFIDFVectorizer, counts: csr_matrix,
+                       doc_lengths: np.ndarray) -> Dict[str, np.ndarray]:
+        """Compute the L2 norm of every TF-IDF document vector."""
+        # Weighted a block of rows at a time, so counts may be memory-mapped
+        norms = np.zeros(counts.shape[0])
+        for start, stop, block in row_blocks(counts):
+            tfidf = vectorizer.weight_counts(block, doc_lengths[start:stop])
+            norms[start:stop] = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        return {'doc_lengths': np.asarray(doc_lengths), 'doc_inv_norms': inv_norms}
+    
+    def document_impacts(self, term_id, doc_ids: np.ndarray,
+                         term_freqs: np.ndarray) -> np.ndarray:
+        """Normalized term frequency: tf / doc_length / ||doc||."""
+        tf = term_freqs / self.doc_lengths[doc_ids]
+        return tf * self.doc_inv_norms[doc_ids]
+    
+    def query_weights(self, vectorizer: TFIDFVectorizer,
+                      query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Unit-length TF-IDF query vector in sparse form."""
+        counts = vectorizer.count_matrix([query_tokens])
+        tf = counts.data / len(query_tokens)
+        weights = tf * vectorizer.idf_values[counts.indices]
+        # Terms left only in deleted documents are out of vocabulary
+        weights[vectorizer.doc_freq[counts.indices] == 0] = 0.0
+        
+        norm = np.linalg.norm(weights)
+        if norm == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        
+        nonzero = weights > 0
+        return counts.indices[nonzero].astype(np.int64), weights[nonzero] / norm
+
+
+class BM25Model(ScoringModel):
+    """Okapi BM25 with document length normalization."""
+    
+    PARAMS = ('k1', 'b')
+    STATE = ('idf_values', 'avg_doc_length', 'length_norms')
+    DOC_STATE = ('length_norms',)
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize model.
+        
+        Args:
+            k1: Term frequency saturation
+            b: Strength of document length normalization (0 to 1)
+        """
+        if k1 < 0 or not 0 <= b <= 1:
+            raise ValueError("BM25 requires k1 >= 0 and 0 <= b <= 1")
+        self.k1 = k1
+        self.b = b
+        self.idf_values: np.ndarray = None
+        self.avg_doc_length: float = 0.0
+        self.length_norms: np.ndarray = None  # k1 * (1 - b + b * |d| / avgdl)
+    
+    def fit_terms(self, vectorizer: TFIDFVectorizer, doc_lengths: np.ndarray,
+                  live_docs: np.ndarray = None, avg_doc_length: float = None) -> None:
+        """Precompute BM25 IDF and the mean document length."""
+        num_docs = vectorizer.num_documents
+        doc_freq = vectorizer.doc_freq
+        
+        # Non-negative BM25 IDF (as in Lucene)
+        self.idf_values = np.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        if avg_doc_length is not None:
+            self.avg_doc_length = avg_doc_length
+        else:
+            live_lengths = doc_lengths if live_docs is None else doc_lengths[live_docs]
+            self.avg_doc_length = float(live_lengths.mean()) if num_docs else 0.0
+    
+    def document_stats(self, vectorizer: TFIDFVectorizer, counts: csr_matrix,
+                       doc_lengths: np.ndarray) -> Dict[str, np.ndarray]:
+        """Compute each document's length normalization."""
+        relative_lengths = (doc_lengths / self.avg_doc_length if self.avg_doc_length
+                            else np.ones(len(doc_lengths)))
+        return {'length_norms': self.k1 * (1 - self.b + self.b * relative_lengths)}
+    
+    def document_impacts(self, term_id, doc_ids: np.ndarray,
+                         term_freqs: np.ndarray) -> np.ndarray:
+        """Saturated term frequency: tf * (k1 + 1) / (tf + length_norm)."""
+        return term_freqs * (self.k1 + 1) / (term_freqs + self.length_norms[doc_ids])
+    
+    def query_weights(self, vectorizer: TFIDFVectorizer,
+                      query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Each query term is weighted by how often it occurs in the query."""
+        counts = vectorizer.count_matrix([query_tokens])
+        return counts.indices.astype(np.int64), counts.data.astype(np.float64)
+
+
+class BM25PlusModel(BM25Model):
+    """BM25+ adds a floor to each matching term so long documents are not over-penalized."""
+    
+    PARAMS = ('k1', 'b', 'delta')
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75, delta: float = 1.0):
+        """
+        Initialize model.
+        
+        Args:
+            k1: Term frequency saturation
+            b: Strength of document length normalization (0 to 1)
+            delta: Lower bound added to the saturated term frequency
+        """
+        super().__init__(k1=k1, b=b)
+        self.delta = delta
+    
+    def document_impacts(self, term_id, doc_ids: np.ndarray,
+                         term_freqs: np.ndarray) -> np.ndarray:
+        """Saturated term frequency plus the floor: tf * (k1 + 1) / (tf + length_norm) + delta."""
+        return super().document_impacts(term_id, doc_ids, term_freqs) + self.delta
+
+
+SCORING_MODELS = {cls.__name__: cls for cls in (TFIDFCosineModel, BM25Model, BM25PlusModel)}
+
+
+class ResultCache:
+    """
+    LRU cache of search results with an optional time-to-live.
+    
+    Entries are tagged with the index generation they were computed at. A
+    lookup at a newer generation empties the cache, so no result outlives
+    a change to the index; results computed at an older generation (by a
+    search that raced with an update) are not stored.
+    """
+    
+    def __init__(self, max_size: int = 1024, ttl: float = None):
+        """
+        Initialize empty cache.
+        
+        Args:
+            max_size: Maximum number of cached result lists
+            ttl: Seconds an entry stays valid (None: until evicted)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()  # key -> (results, expiry time), oldest first
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: Tuple, generation: int) -> List[Dict[str, any]]:
+        """
+        Look up the results of a query.
+        
+        Args:
+            key: Normalized query key
+            generation: Current index generation
+            
+        Returns:
+            Copy of the cached results, or None
+        """
+        with self._lock:
+            entry = self.entries.get(key) if self._sync(generation) else None
+            if entry is not None and entry[1] is not None and time.monotonic() >= entry[1]:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return [dict(result) for result in entry[0]]
+    
+    def put(self, key: Tuple, results: List[Dict[str, any]], generation: int) -> None:
+        """
+        Store the results of a query.
+        
+        Args:
+            key: Normalized query key
+            results: Result dicts to cache (copied)
+            generation: Index generation the results were computed at
+        """
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if not self._sync(generation):
+                return
+            self.entries[key] = ([dict(result) for result in results], expiry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self.entries.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache counters.
+        
+        Returns:
+            Dict with size, max_size, hits, misses, hit_rate, expirations
+            and invalidations
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+    
+    def _sync(self, generation: int) -> bool:
+        """Drop entries older than generation; False if generation is outdated."""
+        if generation > self.generation:
+            if self.entries:
+                self.entries.clear()
+                self.invalidations += 1
+            self.generation = generation
+        return generation == self.generation
+
+
+class SearchEngine:
+    """Document search engine over an inverted index with pluggable ranking."""
+    
+    STRATEGIES = ('exhaustive', 'taat', 'daat', 'wand', 'bmw', 'maxscore')
+    
+    def __init__(self, strategy: str = 'taat', model: ScoringModel = None,
+                 quantize_bits: int = None, max_segments: int = 8,
+                 num_workers: int = 1, result_cache_size: int = 1024,
+                 result_cache_ttl: float = None, positional: bool = False,
+                 codec: str = None, vector_dtype: str = 'float64', tokenizer: str = 'nltk',
+                 collect_metrics: bool = False, profile_hook: Callable[[Dict], None] = None):
+        """
+        Initialize search engine components.
+        
+        Args:
+            strategy: Query evaluation strategy. 'exhaustive' scores every
+                document with one matrix-vector product, 'taat' and 'daat'
+                walk the inverted index term-at-a-time or document-at-a-time,
+                and 'wand', 'bmw' (Block-Max WAND) and 'maxscore' use
+                dynamic pruning to skip postings that cannot reach the top-k.
+            model: Ranking function (default: TF-IDF cosine similarity).
+                Pass e.g. BM25Model(k1=1.5, b=0.6) to tune BM25 per engine.
+            quantize_bits: If 8 or 16, precompute each posting's impact and
+                store it quantized with a per-term scale; all strategies
+                then score from these codes instead of recomputing impacts
+                from term frequencies.
+            max_segments: Number of segments add_documents() may create
+                before they are merged in a background thread.
+            num_workers: Processes used to preprocess and count documents
+                when indexing (None: one per CPU).
+            result_cache_size: Number of queries whose results are cached
+                (0 disables the cache). Entries are dropped whenever the
+                index changes.
+            result_cache_ttl: Seconds a cached result stays valid (None: no
+                time limit).
+            positional: Also store the position of every term occurrence,
+                which enables "quoted phrase" and word NEAR/k word queries.
+            codec: Compress posting lists with 'varbyte', 'simple8b' or
+                'bitpack' instead of fixed-width integers (None).
+            vector_dtype: Storage type of the document matrix used by
+                exhaustive and batched search: 'float64', 'float32', or
+                'uint16' / 'uint8' codes with a per-term scale. Narrower
+                types use less memory and bandwidth and round scores;
+                index-based strategies round impacts the same way, so all
+                strategies rank alike. With quantize_bits, the matrix
+                holds the index's impact codes instead.
+            tokenizer: 'nltk' (word_tokenize) or 'fast' (one regex pass
+                that also does the cleaning) for documents and queries.
+            collect_metrics: Accumulate per-stage timings and counters of
+                every search in self.metrics (a SearchMetrics).
+            profile_hook: Called after every search with its profile: a dict
+                with the query, total_ms, stages_ms (stage -> milliseconds)
+                and counters (e.g. postings_scored, docs_scored, cache_hits).
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'. Choose from {self.STRATEGIES}")
+        if quantize_bits not in (None, 8, 16):
+            raise ValueError("quantize_bits must be None, 8 or 16")
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Choose from {tuple(CODECS)}")
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{vector_dtype}'. Choose from {VECTOR_DTYPES}")
+        
+        self.preprocessor = TextPreprocessor(use_stemming=True, remove_stopwords=True,
+                                             tokenizer=tokenizer)
         self.vectorizer = TFIDFVectorizer()
+        self.model = model if model is not None else TFIDFCosineModel()
+        self.strategy = strategy
+        self.quantize_bits = quantize_bits
         self.documents = []
-        self.doc_vectors = None
+        self.vector_dtype = vector_dtype
+        self.doc_lengths = None  # Tokens per document
+        self.segments: List[IndexSegment] = []  # in doc id order
+        self.deleted = np.zeros(0, dtype=bool)  # tombstones of deleted documents
+        self.max_segments = max_segments
+        self.num_workers = num_workers
+        self.positional = positional
+        self.codec = codec
+        self.generation = 0  # incremented whenever the collection changes
+        self.result_cache = ResultCache(result_cache_size, result_cache_ttl) if result_cache_size else None
+        self.last_query_stats: Dict[str, int] = {}  # scoring counters of last search
+        self.metrics = SearchMetrics() if collect_metrics else None
+        self.profile_hook = profile_hook
+        self.collection_avg_doc_length: float = None  # set on the shards of a sharded index
         self.is_fitted = False
+        
+        self._stale = False  # collection statistics changed since the last refresh
+        self._warned_operators = False  # operators ignored without positions (warned once)
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self._merge_thread: threading.Thread = None
+    
+    @property
+    def index(self) -> InvertedIndex:
+        """Posting lists of the first (oldest and usually largest) segment."""
+        return self.segments[0].index if self.segments else None
     
-    def index_documents(self, documents: List[Dict[str, str]]) -> None:
+    @property
+    def impact_index(self) -> InvertedIndex:
+        """Quantized impact index of the first segment, if enabled."""
+        return self.segments[0].impact_index if self.segments else None
+    
+    @property
+    def doc_vectors(self) -> csr_matrix:
+        """Model impacts per document (CSR) of the first segment, in vector_dtype."""
+        return self.segments[0].vectors if self.segments else None
+    
+    @property
+    def vector_scales(self) -> np.ndarray:
+        """Per-term scale of the first segment's integer doc_vectors, if any."""
+        return self.segments[0].vector_scales if self.segments else None
+    
+    def index_documents(self, documents: Iterable[Dict[str, str]], batch_size: int = None,
+                        store_content: bool = True) -> None:
         """
         Build search index from documents.
         
+        Documents may come from a stream (e.g. DocumentLoader.stream_documents):
+        with batch_size, only one batch of raw text and token lists is held
+        at a time, and only the compact term counts of earlier batches are
+        kept until the index is built.
+        
+        Args:
+            documents: Document dicts with 'title' and 'content'
+            batch_size: Documents preprocessed at a time (default: all)
+            store_content: Keep the full content of each document; if False,
+                only the part needed for result previews is kept
+        """
+        logger.info("Indexing documents...")
+        self.wait_for_merge()
+        self.documents = []
+        started = time.perf_counter()
+        
+        # Preprocess and count terms batch by batch, chunk by chunk
+        logger.info("Preprocessing text...")
+        partials = []
+        for batch in batched(documents, batch_size):
+            contents = [doc['content'] for doc in batch]
+            partials += self.preprocessor.count_documents(contents, num_workers=self.num_workers,
+                                                          positions=self.positional)
+            if not store_content:
+                batch = [dict(doc, content=doc['content'][:PREVIEW_CHARS + 1]) for doc in batch]
+            self.documents.extend(batch)
+            if batch_size is not None:
+                logger.info("%d documents counted", len(self.documents))
+        if not partials:
+            partials = self.preprocessor.count_documents([], positions=self.positional)
+        
+        # Merge chunk counts; per-document norms are computed once from these
+        logger.debug("Preprocessed in %.2fs", time.perf_counter() - started)
+        logger.info("Building document vectors...")
+        counts = self.vectorizer.fit_partial_counts(partials)
+        positions = self.vectorizer.merge_positions(partials) if self.positional else None
+        self.doc_lengths = np.concatenate([partial.doc_lengths for partial in partials])
+        self.deleted = np.zeros(len(self.documents), dtype=bool)
+        
+        # Build posting lists from the same term counts
+        logger.info("Building inverted index...")
+        with self._lock:
+            self.segments = [IndexSegment.build(counts, positions=positions, codec=self.codec)]
+            self._refit()
+            self.generation += 1
+        
+        self.is_fitted = True
+        logger.info("Indexed %d documents in %.2fs", len(self.documents), time.perf_counter() - started)
+        logger.info("Vocabulary size: %d", len(self.vectorizer.vocabulary))
+    
+    def add_documents(self, documents: List[Dict[str, str]]) -> List[int]:
+        """
+        Add documents to the index as a new segment.
+        
+        Only the new documents are preprocessed and indexed. Unseen terms
+        are appended to the vocabulary and document frequencies are updated
+        in place. Before the next search, IDF values are refreshed and the
+        impacts of the new documents computed, once; the impacts of earlier
+        documents keep the statistics they were computed with until their
+        segments are merged. When there are more than max_segments segments
+        they are merged in a background thread.
+        
         Args:
             documents: List of document dicts with 'title' and 'content'
+            
+        Returns:
+            Doc indices assigned to the new documents
         """
-        print("Indexing documents...")
-        self.documents = documents
+        if not self.is_fitted:
+            self.index_documents(documents)
+            return list(range(len(documents)))
+        if not documents:
+            return []
         
-        # Preprocess all documents
-        print("  Preprocessing text...")
         contents = [doc['content'] for doc in documents]
-        processed_docs = self.preprocessor.preprocess_documents(contents)
+        partials = self.preprocessor.count_documents(contents, num_workers=self.num_workers,
+                                                     positions=self.positional)
         
-        # Build TF-IDF vectors
-        print("  Building TF-IDF vectors...")
-        self.doc_vectors = self.vectorizer.fit_transform(processed_docs)
+        with self._lock:
+            self.vectorizer.add_terms(partial.terms for partial in partials)
+            counts = self.vectorizer.merge_counts(partials)
+            positions = self.vectorizer.merge_positions(partials) if self.positional else None
+            self.vectorizer.add_document_counts(counts)
+            
+            doc_offset = len(self.documents)
+            self.documents.extend(documents)
+            self.doc_lengths = np.concatenate(
+                [self.doc_lengths] + [partial.doc_lengths for partial in partials]
+            )
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(documents), dtype=bool)])
+            self.segments.append(IndexSegment.build(counts, doc_offset, positions, self.codec))
+            self._mark_changed()
         
-        self.is_fitted = True
-        print(f"✓ Indexed {len(documents)} documents")
-        print(f"✓ Vocabulary size: {len(self.vectorizer.vocabulary)}")
-        print()
+        if len(self.segments) > self.max_segments:
+            self.merge_segments(background=True)
+        return list(range(doc_offset, doc_offset + len(documents)))
+    
+    def delete_document(self, doc_index: int) -> None:
+        """
+        Delete a document by marking it with a tombstone.
+        
+        The document stops matching immediately and no longer counts
+        towards document frequencies; its postings are dropped when its
+        segment is next merged. Other documents keep their indices.
+        
+        Args:
+            doc_index: Index of the document to delete
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        with self._lock:
+            if not 0 <= doc_index < len(self.deleted) or self.deleted[doc_index]:
+                raise ValueError(f"No document with index {doc_index}")
+            
+            offsets = [segment.doc_offset for segment in self.segments]
+            segment = self.segments[bisect_right(offsets, doc_index) - 1]
+            row = segment.counts[doc_index - segment.doc_offset]
+            self.vectorizer.add_document_counts(row, sign=-1)
+            self.deleted[doc_index] = True
+            self._mark_changed()
+    
+    def update_document(self, doc_index: int, document: Dict[str, str]) -> int:
+        """
+        Replace a document with a new version.
+        
+        The old version is deleted and the new one added, so it gets a new
+        doc index.
+        
+        Args:
+            doc_index: Index of the document to replace
+            document: New document dict with 'title' and 'content'
+            
+        Returns:
+            Doc index of the new version
+        """
+        with self._lock:
+            self.delete_document(doc_index)
+            return self.add_documents([document])[0]
+    
+    def merge_segments(self, background: bool = False) -> None:
+        """
+        Merge all segments into one, purging postings of deleted documents.
+        
+        The impacts of the merged documents are recomputed with the current
+        statistics of the whole collection, so a merged index scores like
+        one built from scratch. The merged segment is built from a snapshot,
+        so searches and updates can continue meanwhile; segments added
+        during the merge are kept.
+        
+        Args:
+            background: Merge in a daemon thread and return immediately
+                (does nothing if a background merge is already running)
+        """
+        if background:
+            with self._lock:
+                if self._merge_thread is None or not self._merge_thread.is_alive():
+                    self._merge_thread = threading.Thread(target=self.merge_segments, daemon=True)
+                    self._merge_thread.start()
+            return
+        
+        with self._merge_lock:
+            with self._lock:
+                if self._stale:
+                    self._refresh()
+                segments = list(self.segments)
+                deleted = self.deleted.copy()
+                doc_lengths = self.doc_lengths
+                vocab_size = len(self.vectorizer.vocabulary)
+            if len(segments) < 2 and not any(s.has_deleted_postings(deleted) for s in segments):
+                return
+            
+            # Re-weight the merged documents on a copy of the model, which
+            # searches do not see until the merged segment replaces the old ones
+            merged = IndexSegment.merge(segments, deleted, vocab_size, self.codec)
+            stats = self.model.document_stats(
+                self.vectorizer, merged.counts,
+                doc_lengths[merged.doc_offset:merged.doc_offset + merged.num_documents]
+            )
+            model = copy.copy(self.model)
+            model.set_document_stats(stats, merged.doc_offset)
+            self._prepare(merged, model)
+            
+            with self._lock:
+                self.model.set_document_stats(stats, merged.doc_offset)
+                self.segments = [merged] + self.segments[len(segments):]
+                self.generation += 1
+    
+    def wait_for_merge(self) -> None:
+        """Block until a running background merge has finished."""
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join()
+    
+    def set_collection_stats(self, doc_freq: np.ndarray, num_documents: int,
+                             avg_doc_length: float) -> None:
+        """
+        Score with the statistics of a larger collection this index is part of.
+        
+        The shards of a ShardedSearchEngine share the document frequencies,
+        document count and mean document length of the whole collection, so
+        their scores are comparable. Later changes to this index would only
+        update its own statistics, so shards are not updated in place.
+        
+        Args:
+            doc_freq: Collection document frequency of each vocabulary term
+            num_documents: Number of documents in the collection
+            avg_doc_length: Mean document length in the collection
+        """
+        with self._lock:
+            self.vectorizer.doc_freq = np.asarray(doc_freq, dtype=np.int64)
+            self.vectorizer.num_documents = num_documents
+            self.collection_avg_doc_length = avg_doc_length
+            self._refit()
+            self.generation += 1
+    
+    def _mark_changed(self) -> None:
+        """Record a change to the collection; statistics refresh lazily."""
+        self.generation += 1
+        self._stale = True
+    
+    def _refresh(self) -> None:
+        """
+        Update collection statistics after the collection changed.
+        
+        Only term weights (IDF) depend on the whole collection, and they are
+        applied to queries, so a refresh recomputes them and computes the
+        statistics and impacts of the documents added since the last one,
+        once per batch of changes. Earlier documents keep theirs until
+        their segments are merged.
+        """
+        self.vectorizer.compute_idf()
+        self.model.fit_terms(self.vectorizer, self.doc_lengths, live_docs=~self.deleted,
+                             avg_doc_length=self.collection_avg_doc_length)
+        for segment in self.segments:
+            if not segment.is_prepared:
+                self.model.fit_documents(self.vectorizer, segment.counts, self.doc_lengths,
+                                         segment.doc_offset)
+                self._prepare(segment)
+        self._stale = False
+    
+    def _refit(self) -> None:
+        """Recompute term weights and the statistics and impacts of every document."""
+        counts = stack_counts(self.segments, len(self.vectorizer.vocabulary))
+        self.vectorizer.compute_idf()
+        self.model.fit(self.vectorizer, counts, self.doc_lengths, live_docs=~self.deleted,
+                       avg_doc_length=self.collection_avg_doc_length)
+        for segment in self.segments:
+            self._prepare(segment)
+        self._stale = False
+    
+    def _prepare(self, segment: IndexSegment, model: ScoringModel = None) -> None:
+        """
+        Compute a segment's document vectors and pruning bounds with a fitted model.
+        
+        Quantized impacts are stored with the same codes and scales in the
+        document vectors; otherwise the index is scored with impacts
+        rounded like the vectors. Either way every strategy, exhaustive and
+        batched search included, scores the same stored impacts.
+        """
+        model = model or self.model
+        dtype = f'uint{self.quantize_bits}' if self.quantize_bits else self.vector_dtype
+        segment.vectors, segment.vector_scales = compact_vectors(
+            segment.document_matrix(model.document_impacts), dtype
+        )
+        segment.prepare(self._impact_function(segment, model), self.quantize_bits)
+    
+    def _impact_function(self, segment: IndexSegment, model: ScoringModel = None) -> ImpactFunction:
+        """Impacts of a segment's term-frequency index, rounded like its document vectors."""
+        model = model or self.model
+        if self.quantize_bits:
+            return model.document_impacts  # quantized by the segment's impact index
+        return rounded_impacts(model.document_impacts, self.vector_dtype, segment.vector_scales)
+    
+    def save(self, path: str, query_only: bool = False) -> None:
+        """
+        Write the index to a directory in the versioned on-disk format.
+        
+        The directory is written next to its final location and moved into
+        place once complete, so readers never see a partial index. Segments
+        are merged first, so the saved index has a single segment.
+        
+        Args:
+            path: Target directory (replaced if it exists)
+            query_only: Write only what weighting queries and building
+                results need (vocabulary, term statistics, model state
+                without per-document arrays, preprocessor and documents),
+                for wrappers such as LSASearchEngine that score documents
+                with their own vectors. The loaded engine cannot search.
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        if not query_only:
+            self.merge_segments()
+        with self._lock:
+            if self._stale:
+                self._refresh()
+        
+        tmp_path = path.rstrip(os.sep) + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        save_vocabulary(tmp_path, self.vectorizer.vocabulary)
+        save_array(tmp_path, 'idf_values', self.vectorizer.idf_values)
+        save_array(tmp_path, 'doc_freq', self.vectorizer.doc_freq)
+        if not query_only:
+            segment = self.segments[0]
+            counts = resize_columns(segment.counts, len(self.vectorizer.vocabulary))
+            doc_vectors = resize_columns(segment.vectors, counts.shape[1])
+            save_array(tmp_path, 'doc_lengths', self.doc_lengths)
+            save_array(tmp_path, 'deleted', self.deleted)
+            for name in ('data', 'indices', 'indptr'):
+                save_array(tmp_path, f'doc_vectors_{name}', getattr(doc_vectors, name))
+                save_array(tmp_path, f'counts_{name}', getattr(counts, name))
+            if segment.vector_scales is not None:
+                save_array(tmp_path, 'vector_scales', segment.vector_scales)
+        
+        # Stems computed at index time are reused by query preprocessing
+        stem_cache = self.preprocessor.stem_cache
+        stem_entries = list(stem_cache.entries.items()) if stem_cache is not None else []
+        save_strings(tmp_path, 'stem_tokens', [token for token, _ in stem_entries])
+        save_strings(tmp_path, 'stem_stems', [stem for _, stem in stem_entries])
+        
+        # Model state: arrays go to .npy files, scalars into the manifest
+        model_scalars = {}
+        for name in self.model.STATE:
+            if query_only and name in self.model.DOC_STATE:
+                continue
+            value = getattr(self.model, name)
+            if isinstance(value, np.ndarray):
+                save_array(tmp_path, f'model_{name}', value)
+            else:
+                model_scalars[name] = value
+        
+        manifest = {
+            'strategy': self.strategy,
+            'quantize_bits': self.quantize_bits,
+            'preprocessor': self.preprocessor.settings(),
+            'num_documents': len(self.documents),
+            'vectorizer_num_documents': self.vectorizer.num_documents,
+            'model': {
+                'name': type(self.model).__name__,
+                'params': self.model.get_params(),
+                'scalars': model_scalars,
+            },
+            'positional': self.positional,
+            'codec': self.codec,
+            'vector_dtype': self.vector_dtype,
+            'collection_avg_doc_length': self.collection_avg_doc_length,
+            'query_only': query_only,
+            'document_fields': save_documents(tmp_path, self.documents),
+        }
+        if not query_only:
+            manifest.update({
+                'doc_vectors_shape': list(doc_vectors.shape),
+                'index': segment.index.save(tmp_path, 'index'),
+                'impact_index': (segment.impact_index.save(tmp_path, 'impact_index')
+                                 if segment.impact_index is not None else None),
+                'positions': (segment.positions.save(tmp_path, 'positions')
+                              if segment.positions is not None else None),
+            })
+        write_manifest(tmp_path, manifest)
+        replace_directory(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'SearchEngine':
+        """
+        Open an index written by save(), memory-mapping its arrays.
+        
+        No index data is read up front; pages are loaded on first access
+        and shared with other processes that map the same files.
+        
+        Args:
+            path: Index directory
+            
+        Returns:
+            Fitted search engine backed by read-only mapped arrays (an
+            index saved with query_only loads unfitted, without segments)
+        """
+        manifest = read_manifest(path)
+        query_only = manifest.get('query_only', False)
+        
+        model_info = manifest['model']
+        if model_info['name'] not in SCORING_MODELS:
+            raise ValueError(f"Unknown scoring model '{model_info['name']}'")
+        model = SCORING_MODELS[model_info['name']](**model_info['params'])
+        for name in model.STATE:
+            if query_only and name in model.DOC_STATE:
+                continue
+            if name in model_info['scalars']:
+                setattr(model, name, model_info['scalars'][name])
+            else:
+                setattr(model, name, load_array(path, f'model_{name}'))
+        
+        engine = cls(strategy=manifest['strategy'], model=model,
+                     quantize_bits=manifest['quantize_bits'],
+                     positional=manifest.get('positional', False),
+                     codec=manifest.get('codec'),
+                     vector_dtype=manifest.get('vector_dtype', 'float64'))
+        settings = manifest['preprocessor']
+        if settings != engine.preprocessor.settings():
+            engine.preprocessor = TextPreprocessor(**settings)
+        if engine.preprocessor.stem_cache is not None:
+            engine.preprocessor.stem_cache.update(
+                zip(MappedStrings(path, 'stem_tokens'), MappedStrings(path, 'stem_stems'))
+            )
+        
+        engine.vectorizer.vocabulary = MappedVocabulary(path)
+        engine.vectorizer.idf_values = load_array(path, 'idf_values')
+        engine.vectorizer.doc_freq = load_array(path, 'doc_freq')
+        engine.vectorizer.num_documents = manifest['vectorizer_num_documents']
+        if query_only:
+            # Weights queries and builds results, but has no index to search
+            engine.documents = MappedDocuments(path, manifest['document_fields'],
+                                               manifest['num_documents'])
+            return engine
+        engine.doc_lengths = load_array(path, 'doc_lengths')
+        engine.collection_avg_doc_length = manifest.get('collection_avg_doc_length')
+        # Copied so that deletions can update the tombstones in place
+        engine.deleted = np.array(load_array(path, 'deleted'))
+        doc_vectors, counts = (
+            csr_matrix(tuple(load_array(path, f'{prefix}_{name}') for name in ('data', 'indices', 'indptr')),
+                       shape=tuple(manifest['doc_vectors_shape']), copy=False)
+            for prefix in ('doc_vectors', 'counts')
+        )
+        
+        segment = IndexSegment(counts, InvertedIndex.load(path, manifest['index'], 'index'))
+        segment.vectors = doc_vectors
+        if doc_vectors.dtype.kind == 'u':
+            segment.vector_scales = load_array(path, 'vector_scales')
+        if manifest['impact_index'] is not None:
+            segment.impact_index = InvertedIndex.load(path, manifest['impact_index'], 'impact_index')
+        if manifest.get('positions') is not None:
+            segment.positions = PositionalIndex.load(path, manifest['positions'], 'positions')
+        engine.segments = [segment]
+        
+        engine.documents = MappedDocuments(path, manifest['document_fields'],
+                                           manifest['num_documents'])
+        engine.is_fitted = True
+        return engine
     
     def cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """
@@ -64,13 +1214,19 @@ class SearchEngine:
         # Compute cosine similarity
         return np.dot(vec1, vec2) / (norm1 * norm2)
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, any]]:
+    def search(self, query: str, top_k: int = 5, strategy: str = None) -> List[Dict[str, any]]:
         """
         Search for documents matching the query.
         
+        With a positional index, "quoted phrases" and word NEAR/k word pairs
+        restrict the results to documents containing them; all query words
+        still contribute to the score. Without one, the operators are
+        ignored and the words are ranked as free text.
+        
         Args:
             query: Search query string
             top_k: Number of top results to return
+            strategy: Override the engine's evaluation strategy for this query
             
         Returns:
             List of result dicts with 'rank', 'title', 'score', 'preview'
@@ -78,34 +1234,540 @@ class SearchEngine:
         if not self.is_fitted:
             raise ValueError("Search engine not fitted. Call index_documents() first.")
         
+        profile = self._start_profile(query)
+        results = self._search(query, top_k, strategy, profile)
+        self._finish_profile(profile)
+        return results
+    
+    def _search(self, query: str, top_k: int, strategy: str,
+                profile: QueryProfile) -> List[Dict[str, any]]:
+        """Run search(), timing each stage of the pipeline in profile."""
+        with self._lock:
+            if self._stale:
+                self._refresh()
+            segments, generation = self.segments, self.generation
+        profile.lap('refresh')
+        
+        strategy = strategy or self.strategy
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'. Choose from {self.STRATEGIES}")
+        
+        # Quoted phrases and NEAR/k pairs restrict which documents match
+        self.last_query_stats = {}
+        constraints = None
+        if has_query_operators(query):
+            query, phrases, nears = parse_query(query)
+            constraints = self._query_constraints(phrases, nears)
+            profile.lap('parse')
+            if constraints is None:
+                return []  # some phrase term occurs in no document
+        
         # Preprocess query
         query_tokens = self.preprocessor.preprocess(query)
+        profile.lap('preprocess')
         
         if not query_tokens:
-            print("Warning: Query resulted in no tokens after preprocessing")
+            logger.warning("Query %r resulted in no tokens after preprocessing", query)
+            return []
+        
+        # Repeated queries are answered from the result cache
+        key = self._cache_key(query_tokens, top_k, strategy, constraints)
+        if self.result_cache is not None:
+            cached = self.result_cache.get(key, generation)
+            profile.lap('cache')
+            if cached is not None:
+                profile.count('cache_hits')
+                return cached
+            profile.count('cache_misses')
+        
+        # Weight query terms according to the ranking model
+        term_ids, weights = self.model.query_weights(self.vectorizer, query_tokens)
+        profile.lap('weight')
+        
+        if len(term_ids) == 0:
+            return []
+        
+        hits = self._rank(term_ids, weights, top_k, strategy, constraints, segments)
+        profile.lap('score')
+        results = self._build_results(hits)
+        if self.result_cache is not None:
+            self.result_cache.put(key, results, generation)
+        profile.lap('results')
+        return results
+    
+    def search_terms(self, terms: List[str], weights: np.ndarray, top_k: int = 5,
+                     strategy: str = None, phrases: List[str] = (),
+                     nears: List[Tuple[str, str, int]] = ()) -> List[Dict[str, any]]:
+        """
+        Search with query term weights computed elsewhere.
+        
+        The coordinator of a ShardedSearchEngine weights each query once,
+        against the statistics of the whole collection, and sends the
+        weighted terms to every shard. Terms missing from this index are
+        skipped.
+        
+        Args:
+            terms: Preprocessed query terms
+            weights: Query weight of each term
+            top_k: Number of top results to return
+            strategy: Override the engine's evaluation strategy for this query
+            phrases: Quoted phrases the results must contain
+            nears: (word, word, k) pairs the results must contain
+            
+        Returns:
+            List of result dicts with 'rank', 'title', 'score', 'preview'
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        with self._lock:
+            if self._stale:
+                self._refresh()
+            segments = self.segments
+        
+        strategy = strategy or self.strategy
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'. Choose from {self.STRATEGIES}")
+        
+        constraints = None
+        if phrases or nears:
+            constraints = self._query_constraints(phrases, nears)
+            if constraints is None:
+                return []
+        
+        vocabulary = self.vectorizer.vocabulary
+        known = [i for i, term in enumerate(terms) if term in vocabulary]
+        term_ids = np.array([vocabulary[terms[i]] for i in known], dtype=np.int64)
+        if len(term_ids) == 0:
             return []
+        order = np.argsort(term_ids)
+        weights = np.asarray(weights, dtype=np.float64)[known]
+        
+        profile = self._start_profile(' '.join(terms))
+        self.last_query_stats = {}
+        hits = self._rank(term_ids[order], weights[order], top_k, strategy, constraints, segments)
+        profile.lap('score')
+        results = self._build_results(hits)
+        profile.lap('results')
+        self._finish_profile(profile)
+        return results
+    
+    def _rank(self, term_ids: np.ndarray, weights: np.ndarray, top_k: int, strategy: str,
+              constraints: Tuple, segments: List[IndexSegment]) -> List[Tuple[int, float]]:
+        """
+        Find the top-k documents for a weighted query.
+        
+        Args:
+            term_ids: Query term indices, ascending
+            weights: Query weight for each term (before term weights)
+            top_k: Number of results to return
+            strategy: Evaluation strategy
+            constraints: Phrase and NEAR/k constraints (None: no constraints)
+            segments: Segments to search, in doc id order
+            
+        Returns:
+            Ranked (doc_index, score) pairs, best first
+        """
+        # Stored impacts leave out term weights, which change with the collection
+        weights = weights * self.model.term_weights(term_ids)
+        if constraints:
+            # Check positions only in documents containing every constrained
+            # term, then score just the documents that match
+            candidates = self._match_constraints(constraints, segments)
+            query_vector = np.zeros(len(self.vectorizer.vocabulary))
+            query_vector[term_ids] = weights
+            scores = self._score_documents(segments, query_vector, candidates)
+            scores[self.deleted[candidates]] = 0.0
+            self._count_scored(len(candidates), len(candidates))
+            return [(candidates[i], scores[i]) for i in select_top_k(scores, top_k)]
+        if strategy == 'exhaustive':
+            # Score all documents with one sparse matrix-vector product per segment
+            query_vector = np.zeros(len(self.vectorizer.vocabulary))
+            query_vector[term_ids] = weights
+            scores = self._score_documents(segments, query_vector)
+            scores[self.deleted[:len(scores)]] = 0.0
+            self._count_scored(sum(segment.vectors.nnz for segment in segments), len(scores))
+            return [(doc_idx, scores[doc_idx]) for doc_idx in select_top_k(scores, top_k)]
+        return self._search_index(strategy, term_ids, weights, top_k, segments)
+    
+    @staticmethod
+    def _score_documents(segments: List[IndexSegment], queries,
+                         doc_ids: np.ndarray = None) -> np.ndarray:
+        """
+        Multiply the segments' document vectors with query vectors.
+        
+        Args:
+            segments: Segments to score, in doc id order
+            queries: Dense query vector, or sparse matrix with one column per
+                query, over the whole vocabulary (term weights applied)
+            doc_ids: Documents to score, ascending (default: all)
+            
+        Returns:
+            Dense scores, one per document (and query)
+        """
+        parts = []
+        for segment in segments:
+            vectors = segment.vectors
+            if doc_ids is not None:
+                first, last = np.searchsorted(doc_ids, [segment.doc_offset,
+                                                        segment.doc_offset + segment.num_documents])
+                vectors = vectors[doc_ids[first:last] - segment.doc_offset]
+            # Segments built before the vocabulary grew have fewer columns
+            parts.append(score_vectors(vectors, queries[:vectors.shape[1]], segment.vector_scales))
+        return np.concatenate(parts)
+    
+    def score_all(self, query: str) -> np.ndarray:
+        """
+        Score every document for a query with one sparse matrix-vector product.
+        
+        Args:
+            query: Search query string (phrase and NEAR/k syntax allowed)
+            
+        Returns:
+            Score of each document; deleted documents and documents that
+            fail a phrase or NEAR/k constraint score 0
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        with self._lock:
+            if self._stale:
+                self._refresh()
+            segments, deleted = self.segments, self.deleted
+            vocab_size = len(self.vectorizer.vocabulary)
+        num_documents = segments[-1].doc_offset + segments[-1].num_documents
+        
+        self.last_query_stats = {}
+        constraints = None
+        if has_query_operators(query):
+            query, phrases, nears = parse_query(query)
+            constraints = self._query_constraints(phrases, nears)
+            if constraints is None:
+                return np.zeros(num_documents)
+        
+        query_vector = np.zeros(vocab_size)
+        query_tokens = self.preprocessor.preprocess(query)
+        if query_tokens:
+            term_ids, weights = self.model.query_weights(self.vectorizer, query_tokens)
+            query_vector[term_ids] = weights * self.model.term_weights(term_ids)
+        scores = self._score_documents(segments, query_vector)
+        scores[deleted[:num_documents]] = 0.0
+        if constraints:
+            matched = np.zeros(len(scores), dtype=bool)
+            matched[self._match_constraints(constraints, segments)] = True
+            scores[~matched] = 0.0
+        return scores
+    
+    def document_matrix(self) -> csr_matrix:
+        """
+        Weighted impact of every term in every document, as search scores them.
+        
+        Returns:
+            Sparse CSR float64 matrix with one row per document and one
+            column per vocabulary term
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        with self._lock:
+            if self._stale:
+                self._refresh()
+            segments = self.segments
+            vocab_size = len(self.vectorizer.vocabulary)
+        
+        blocks = []
+        for segment in segments:
+            vectors = segment.vectors.astype(np.float64)
+            if segment.vector_scales is not None:
+                vectors = vectors @ diags(segment.vector_scales)
+            blocks.append(resize_columns(vectors.tocsr(), vocab_size))
+        term_weights = self.model.term_weights(np.arange(vocab_size))
+        return (vstack(blocks, format='csr') @ diags(term_weights)).tocsr()
+    
+    @staticmethod
+    def _cache_key(query_tokens: List[str], top_k: int, strategy: str,
+                   constraints: Tuple = None) -> Tuple:
+        """
+        Result cache key of a query.
+        
+        Scores depend only on how often each term occurs in the query, so
+        the sorted tokens identify it regardless of word order.
+        """
+        return tuple(sorted(query_tokens)), top_k, strategy, constraints
+    
+    def _query_constraints(self, phrases: List[str], nears: List[Tuple[str, str, int]]) -> Tuple:
+        """
+        Turn the phrases and NEAR/k pairs of a query into term id constraints.
+        
+        Phrase terms keep their positions relative to the first term, so
+        removed stopwords still count towards the distance. Parts without
+        any indexable word are ignored. Without a positional index there is
+        nothing to match positions against, so all parts are ignored and
+        the query is ranked by its words alone.
+        
+        Args:
+            phrases: Quoted phrases
+            nears: (word, word, k) pairs
+            
+        Returns:
+            Tuple of ('phrase', term_ids, offsets) and ('near', term_id,
+            term_id, k) constraints, or None if a term is unknown
+        """
+        if not self.positional:
+            if not self._warned_operators:
+                self._warned_operators = True
+                logger.warning("Phrase and NEAR/k operators ignored: the engine has no positional index "
+                               "(SearchEngine(positional=True))")
+            return ()
+        
+        vocabulary = self.vectorizer.vocabulary
+        constraints = []
+        for phrase in phrases:
+            tokens, positions = self.preprocessor.preprocess_positions(phrase)
+            if not tokens:
+                continue
+            if any(token not in vocabulary for token in tokens):
+                return None
+            constraints.append(('phrase', tuple(vocabulary[token] for token in tokens),
+                                tuple(position - positions[0] for position in positions)))
+        
+        for word_a, word_b, distance in nears:
+            tokens_a, tokens_b = self.preprocessor.preprocess(word_a), self.preprocessor.preprocess(word_b)
+            if not tokens_a or not tokens_b:
+                continue
+            if tokens_a[0] not in vocabulary or tokens_b[0] not in vocabulary:
+                return None
+            constraints.append(('near', vocabulary[tokens_a[0]], vocabulary[tokens_b[0]], distance))
+        return tuple(constraints)
+    
+    def _match_constraints(self, constraints: Tuple, segments: List[IndexSegment]) -> np.ndarray:
+        """
+        Find the documents satisfying every phrase and NEAR/k constraint.
+        
+        Args:
+            constraints: Constraints from _query_constraints
+            segments: Segments to search, in doc id order
+            
+        Returns:
+            Matching doc ids (deleted ones included), ascending
+        """
+        matches = []
+        for segment in segments:
+            doc_ids = None
+            for kind, *args in constraints:
+                match = match_phrase if kind == 'phrase' else match_near
+                found = match(segment, *args, stats=self.last_query_stats)
+                doc_ids = found if doc_ids is None else np.intersect1d(doc_ids, found, assume_unique=True)
+                if not len(doc_ids):
+                    break
+            matches.append(doc_ids)
+        return np.concatenate(matches)
+    
+    def search_many(self, queries: List[str], top_k: int = 5,
+                    chunk_size: int = None) -> List[List[Dict[str, any]]]:
+        """
+        Search for many queries at once.
+        
+        Queries are preprocessed in bulk (in worker processes if the engine
+        has them and the batch has at least PARALLEL_QUERY_BATCH queries)
+        and each distinct one is weighted once. The weighted
+        queries are stacked into a sparse query matrix and multiplied with
+        the document matrix chunk_size queries at a time, so every stored
+        impact is read once per chunk instead of once per query. Every
+        strategy scores the same stored impacts and sums them in term
+        order, so each result list equals search(query, top_k) whatever the
+        strategy, vector_dtype and quantize_bits.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of top results per query
+            chunk_size: Queries scored per matrix product (default: enough
+                for a dense block of about four million scores)
+            
+        Returns:
+            Result list of each query, as returned by search()
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        with self._lock:
+            if self._stale:
+                self._refresh()
+            segments, deleted, generation = self.segments, self.deleted, self.generation
+            vocab_size = len(self.vectorizer.vocabulary)
+        num_documents = segments[-1].doc_offset + segments[-1].num_documents
+        num_postings = sum(segment.vectors.nnz for segment in segments)
+        
+        # Phrase and NEAR/k queries are matched on positions one at a time
+        queries = list(queries)
+        operator_results = {i: self.search(query, top_k, strategy='exhaustive')
+                            for i, query in enumerate(queries) if has_query_operators(query)}
+        profile = self._start_profile(num_queries=len(queries) - len(operator_results))
         
-        # Convert query to TF-IDF vector
-        query_vector = self.vectorizer.transform(query_tokens)
+        # Preprocess all queries; identical queries are looked up or scored once
+        texts = [query for i, query in enumerate(queries) if i not in operator_results]
+        token_lists = self.preprocessor.preprocess_documents(
+            texts, num_workers=self.num_workers if len(texts) >= PARALLEL_QUERY_BATCH else 1
+        )
+        profile.lap('preprocess')
+        keys = [self._cache_key(tokens, top_k, 'exhaustive') for tokens in token_lists]
+        distinct = {}  # key -> results
+        for key in keys:
+            if key not in distinct:
+                distinct[key] = (self.result_cache.get(key, generation)
+                                 if self.result_cache is not None and key[0] else None)
+        missing = [key for key, results in distinct.items() if results is None]
+        profile.lap('cache')
+        profile.count('cache_hits', len(distinct) - len(missing))
         
-        # Calculate similarities with all documents
-        similarities = []
-        for i, doc_vector in enumerate(self.doc_vectors):
-            score = self.cosine_similarity(query_vector, doc_vector)
-            similarities.append((i, score))
+        # One row of term weights per query to score
+        indptr = [0]
+        all_terms, all_weights = [], []
+        for tokens, _, _, _ in missing:
+            if tokens:
+                term_ids, weights = self.model.query_weights(self.vectorizer, list(tokens))
+                all_terms.append(term_ids)
+                all_weights.append(weights * self.model.term_weights(term_ids))
+                indptr.append(indptr[-1] + len(term_ids))
+            else:
+                indptr.append(indptr[-1])
+        query_matrix = csr_matrix(
+            (np.concatenate(all_weights) if all_weights else np.empty(0),
+             np.concatenate(all_terms) if all_terms else np.empty(0, dtype=np.int64),
+             indptr),
+            shape=(len(missing), vocab_size)
+        )
+        profile.lap('weight')
         
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        # Score a chunk of queries at a time to bound the dense score block
+        if chunk_size is None:
+            chunk_size = max(1, (1 << 22) // max(num_documents, 1))
+        for start in range(0, len(missing), chunk_size):
+            chunk = query_matrix[start:start + chunk_size]
+            # Multiply from the document side so the document matrix is used as stored
+            scores = self._score_documents(segments, chunk.T.tocsc()).T
+            scores[:, deleted[:num_documents]] = 0.0
+            top_docs = select_top_k_rows(scores, top_k)
+            profile.count('postings_scored', num_postings)
+            profile.count('docs_scored', scores.size)
+            profile.lap('score')
+            for row, doc_ids in enumerate(top_docs):
+                key = missing[start + row]
+                distinct[key] = self._build_results([(doc_idx, scores[row, doc_idx]) for doc_idx in doc_ids])
+                if self.result_cache is not None and key[0]:
+                    self.result_cache.put(key, distinct[key], generation)
+            profile.lap('results')
         
-        # Get top K results
+        results = iter([dict(result) for result in distinct[key]] for key in keys)
+        results = [operator_results[i] if i in operator_results else next(results)
+                   for i in range(len(queries))]
+        profile.lap('results')
+        self.last_query_stats = {}
+        self._finish_profile(profile)
+        return results
+    
+    def _search_index(self, strategy: str, term_ids: np.ndarray, weights: np.ndarray,
+                      top_k: int, segments: List[IndexSegment]) -> List[Tuple[int, float]]:
+        """
+        Evaluate a weighted query over the inverted index segments.
+        
+        Args:
+            strategy: Index-based evaluation strategy
+            term_ids: Query term indices, ascending
+            weights: Query weight for each term
+            top_k: Number of results to return
+            segments: Segments to search, in doc id order
+            
+        Returns:
+            Ranked (doc_index, score) pairs, best first
+        """
+        deleted = self.deleted if self.deleted.any() else None
+        
+        if strategy == 'taat':
+            # Accumulate scores only over the query terms' posting lists
+            all_docs, all_scores = [], []
+            for segment in segments:
+                index, impact = segment.scoring_index(self._impact_function(segment))
+                doc_ids, scores = index.score_term_at_a_time(term_ids, weights, impact)
+                all_docs.append(doc_ids)
+                all_scores.append(scores)
+            doc_ids, scores = np.concatenate(all_docs), np.concatenate(all_scores)
+            if deleted is not None:
+                scores[deleted[doc_ids]] = 0.0
+            self._count_scored(self._num_postings(term_ids, segments), len(doc_ids))
+            return [(doc_ids[i], scores[i]) for i in select_top_k(scores, top_k)]
+        
+        hits = []
+        for segment in segments:
+            index, impact = segment.scoring_index(self._impact_function(segment))
+            if strategy == 'daat':
+                hits += index.score_document_at_a_time(term_ids, weights, impact, top_k, deleted)
+                self._count_scored(self._num_postings(term_ids, [segment]))
+            elif strategy == 'maxscore':
+                hits += maxscore_top_k(index, term_ids, weights, impact, top_k,
+                                       stats=self.last_query_stats, deleted=deleted)
+            else:
+                hits += wand_top_k(index, term_ids, weights, impact, top_k,
+                                   use_block_max=(strategy == 'bmw'),
+                                   stats=self.last_query_stats, deleted=deleted)
+        
+        # Segments hold disjoint doc ids, so the top-k is among each segment's top-k
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:top_k]
+    
+    def _count_scored(self, postings: int, docs: int = None) -> None:
+        """Add exhaustively scored postings (and documents) to last_query_stats."""
+        stats = self.last_query_stats
+        stats['postings_total'] = stats.get('postings_total', 0) + int(postings)
+        stats['postings_scored'] = stats.get('postings_scored', 0) + int(postings)
+        if docs is not None:
+            stats['docs_scored'] = stats.get('docs_scored', 0) + int(docs)
+    
+    @staticmethod
+    def _num_postings(term_ids: np.ndarray, segments: List[IndexSegment]) -> int:
+        """Length of the query terms' posting lists across segments."""
+        total = 0
+        for segment in segments:
+            index = segment.index
+            offsets = index.term_offsets
+            known = term_ids[term_ids < index.vocab_size]
+            total += int((offsets[known + 1] - offsets[known]).sum())
+        return total
+    
+    def _start_profile(self, query: str = None, num_queries: int = 1) -> QueryProfile:
+        """Profile for a search, or NO_PROFILE if nothing records it."""
+        if self.metrics is None and self.profile_hook is None:
+            return NO_PROFILE
+        return QueryProfile(query, num_queries)
+    
+    def _finish_profile(self, profile: QueryProfile) -> None:
+        """Add the search's counters to its profile and hand it on."""
+        if profile is NO_PROFILE:
+            return
+        profile.update(self.last_query_stats)
+        if self.metrics is not None:
+            self.metrics.record(profile)
+        if self.profile_hook is not None:
+            self.profile_hook(profile.to_dict())
+    
+    def _build_results(self, hits: List[Tuple[int, float]]) -> List[Dict[str, any]]:
+        """
+        Turn ranked (doc_index, score) pairs into result dicts.
+        
+        Args:
+            hits: Ranked document indices and scores, best first
+            
+        Returns:
+            List of result dicts with 'rank', 'title', 'score', 'preview'
+        """
         results = []
-        for rank, (doc_idx, score) in enumerate(similarities[:top_k], 1):
+        for rank, (doc_idx, score) in enumerate(hits, 1):
             if score > 0:  # Only return documents with non-zero similarity
                 doc = self.documents[doc_idx]
                 
                 # Create preview (first 200 chars)
-                preview = doc['content'][:200].strip()
-                if len(doc['content']) > 200:
+                preview = doc['content'][:PREVIEW_CHARS].strip()
+                if len(doc['content']) > PREVIEW_CHARS:
                     preview += "..."
                 
                 results.append({
@@ -113,7 +1775,7 @@ class SearchEngine:
                     'title': doc['title'],
                     'score': score,
                     'preview': preview,
-                    'doc_index': doc_idx
+                    'doc_index': int(doc_idx)
                 })
         
         return results
@@ -0,0 +1,211 @@
+"""
+Index segments for incremental updates.
+
+The collection is split into segments, each covering a contiguous range
+of doc ids with its own posting lists and forward term counts. Adding
+documents creates a new segment, so ingest cost depends only on the new
+documents; deleting a document only sets a tombstone. Each segment holds
+the impacts of its documents (as pruning bounds and document vectors),
+computed once, when it is built. Segments are merged later, which also
+purges the postings of deleted documents and recomputes their impacts with
+the statistics of the whole collection. Doc ids never change.
+"""
+
+from typing import List, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix
+from src.index import InvertedIndex, ImpactFunction
+from src.positions import PositionalIndex
+
+
+def resize_columns(counts: csr_matrix, vocab_size: int) -> csr_matrix:
+    """
+    Widen a count matrix to a grown vocabulary without copying its data.
+    
+    Args:
+        counts: Sparse CSR matrix of raw term counts
+        vocab_size: New number of columns (>= current)
+    
+    Returns:
+        CSR matrix with the same nonzeros and vocab_size columns
+    """
+    if counts.shape[1] == vocab_size:
+        return counts
+    return csr_matrix((counts.data, counts.indices, counts.indptr),
+                      shape=(counts.shape[0], vocab_size), copy=False)
+
+
+def stack_counts(segments: List['IndexSegment'], vocab_size: int) -> csr_matrix:
+    """
+    Concatenate the forward counts of consecutive segments.
+    
+    Args:
+        segments: Segments in doc id order
+        vocab_size: Current vocabulary size
+    
+    Returns:
+        Sparse CSR count matrix over all their documents
+    """
+    if len(segments) == 1:
+        return resize_columns(segments[0].counts, vocab_size)
+    
+    parts = [segment.counts for segment in segments]
+    indptr = [np.zeros(1, dtype=np.int64)]
+    nnz = 0
+    for part in parts:
+        indptr.append(part.indptr[1:].astype(np.int64) + nnz)
+        nnz += part.nnz
+    return csr_matrix(
+        (np.concatenate([part.data for part in parts]),
+         np.concatenate([part.indices for part in parts]),
+         np.concatenate(indptr)),
+        shape=(sum(part.shape[0] for part in parts), vocab_size)
+    )
+
+
+class IndexSegment:
+    """Posting lists and forward term counts for a contiguous range of doc ids."""
+    
+    def __init__(self, counts: csr_matrix, index: InvertedIndex, doc_offset: int = 0,
+                 positions: PositionalIndex = None):
+        """
+        Wrap an already built segment.
+        
+        Args:
+            counts: Sparse CSR count matrix, one row per document in the segment
+            index: Posting lists over the same documents, with global doc ids
+            doc_offset: Doc id of the first document
+            positions: Term positions of every count entry, if recorded
+        """
+        self.counts = counts
+        self.index = index
+        self.doc_offset = doc_offset
+        self.positions = positions
+        self.impact_index: InvertedIndex = None  # quantized impacts, if enabled
+        self.vectors: csr_matrix = None  # impacts per document, set by the engine
+        self.vector_scales: np.ndarray = None  # per-term scale of integer vectors
+    
+    @classmethod
+    def build(cls, counts: csr_matrix, doc_offset: int = 0,
+              positions: np.ndarray = None, codec: str = None) -> 'IndexSegment':
+        """
+        Build a segment from the term counts of new documents.
+        
+        Args:
+            counts: Sparse CSR count matrix of the documents
+            doc_offset: Doc id of the first document
+            positions: Optional term positions, grouped by count entry
+            codec: Optional posting list codec (see InvertedIndex.compress)
+        
+        Returns:
+            New segment (prepare it before searching it)
+        """
+        index = InvertedIndex()
+        index.build(counts, doc_offset)
+        if codec is not None:
+            index.compress(codec)
+        positional = PositionalIndex.build(counts, positions) if positions is not None else None
+        return cls(counts, index, doc_offset, positional)
+    
+    @classmethod
+    def merge(cls, segments: List['IndexSegment'], deleted: np.ndarray,
+              vocab_size: int, codec: str = None) -> 'IndexSegment':
+        """
+        Merge consecutive segments into one, dropping deleted documents' postings.
+        
+        Rows of deleted documents are kept (empty) so doc ids are unchanged.
+        
+        Args:
+            segments: Segments in doc id order, with adjacent doc id ranges
+            deleted: Tombstone mask over all doc ids
+            vocab_size: Current vocabulary size
+            codec: Optional posting list codec of the merged segment
+        
+        Returns:
+            New segment covering all their documents
+        """
+        counts = stack_counts(segments, vocab_size)
+        doc_offset = segments[0].doc_offset
+        
+        keep = None
+        row_deleted = deleted[doc_offset:doc_offset + counts.shape[0]]
+        if row_deleted.any():
+            row_lengths = np.diff(counts.indptr)
+            keep = np.repeat(~row_deleted, row_lengths)
+            indptr = np.zeros(len(row_lengths) + 1, dtype=np.int64)
+            np.cumsum(np.where(row_deleted, 0, row_lengths), out=indptr[1:])
+            counts = csr_matrix((counts.data[keep], counts.indices[keep], indptr),
+                                shape=counts.shape)
+        
+        index = InvertedIndex()
+        index.build(counts, doc_offset)
+        if codec is not None:
+            index.compress(codec)
+        positions = None
+        if all(segment.positions is not None for segment in segments):
+            positions = PositionalIndex.merge([segment.positions for segment in segments], keep)
+        return cls(counts, index, doc_offset, positions)
+    
+    @property
+    def num_documents(self) -> int:
+        """Number of doc ids covered, including deleted ones."""
+        return self.counts.shape[0]
+    
+    @property
+    def is_prepared(self) -> bool:
+        """Whether impacts have been computed for this segment."""
+        return self.vectors is not None
+    
+    def has_deleted_postings(self, deleted: np.ndarray) -> bool:
+        """Whether any deleted document still has postings in this segment."""
+        row_deleted = deleted[self.doc_offset:self.doc_offset + self.num_documents]
+        return bool(np.diff(self.counts.indptr)[row_deleted].any())
+    
+    def prepare(self, impact: ImpactFunction, quantize_bits: int = None) -> None:
+        """
+        Precompute pruning bounds (and quantized impacts) for a scoring model.
+        
+        Impacts leave out term weights, which are applied to the query, so
+        this is needed only once per segment.
+        
+        Args:
+            impact: Per-posting document impact function of the model
+            quantize_bits: 8 or 16 to store quantized impacts, or None
+        """
+        if quantize_bits:
+            self.impact_index = self.index.quantize_impacts(impact, quantize_bits)
+            self.impact_index.compute_upper_bounds(self.impact_index.dequantize)
+        else:
+            self.impact_index = None
+            self.index.compute_upper_bounds(impact)
+    
+    def document_matrix(self, impact: ImpactFunction) -> csr_matrix:
+        """
+        Apply an impact function to every nonzero of the segment's counts.
+        
+        Args:
+            impact: Per-posting document impact function of the model
+        
+        Returns:
+            Sparse CSR impact matrix with the same sparsity pattern
+        """
+        counts = self.counts
+        rows = np.repeat(np.arange(self.doc_offset, self.doc_offset + counts.shape[0]),
+                         np.diff(counts.indptr))
+        return csr_matrix((impact(counts.indices, rows, counts.data), counts.indices, counts.indptr),
+                          shape=counts.shape)
+    
+    def scoring_index(self, impact: ImpactFunction) -> Tuple[InvertedIndex, ImpactFunction]:
+        """
+        Index and impact function to evaluate queries with.
+        
+        Args:
+            impact: Per-posting document impact function of the model
+        
+        Returns:
+            The quantized index and its dequantize() if impacts are
+            quantized, otherwise the term-frequency index and impact
+        """
+        if self.impact_index is not None:
+            return self.impact_index, self.impact_index.dequantize
+        return self.index, impact
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""
+Asyncio HTTP search service.
+
+Queries that arrive within a short window are coalesced into one batch and
+scored together with one sparse matrix product in a scoring thread, so the
+event loop keeps accepting connections while a batch is scored.
+
+Endpoints:
+    GET /search?q=<query>&k=<top_k>   ranked results as JSON
+    GET /stats                        throughput, latency percentiles, batching,
+                                      result cache hit rate, per-stage timings
+                                      if the engine collects metrics
+
+Usage:
+    python src/server.py [index_dir] [port]
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import asyncio
+import json
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from src.search import SearchEngine
+from src.metrics import SearchMetrics
+
+logger = logging.getLogger(__name__)
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# Largest request body read (and discarded); only GET requests are served
+MAX_BODY_BYTES = 8192
+
+# Largest k accepted; a batch is scored with the largest k among its queries
+MAX_TOP_K = 1000
+
+
+class ServiceStats:
+    """Request counters and a sliding window of request latencies."""
+    
+    def __init__(self, window: int = 10000):
+        """
+        Initialize counters.
+        
+        Args:
+            window: Number of most recent latencies kept for percentiles
+        """
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.latencies = deque(maxlen=window)
+    
+    def record_request(self, latency: float) -> None:
+        """Record one answered request and its latency in seconds."""
+        self.requests += 1
+        self.latencies.append(latency)
+    
+    def record_batch(self, size: int) -> None:
+        """Record one scored batch of queries."""
+        self.batches += 1
+        self.batched_queries += size
+    
+    def summary(self) -> Dict[str, float]:
+        """
+        Current statistics.
+        
+        Returns:
+            Dict with request count, throughput (queries/s since start),
+            p50/p95/p99 latency in milliseconds and mean batch size
+        """
+        elapsed = time.perf_counter() - self.started
+        summary = {
+            'requests': self.requests,
+            'throughput_qps': self.requests / elapsed if elapsed > 0 else 0.0,
+            'batches': self.batches,
+            'mean_batch_size': self.batched_queries / self.batches if self.batches else 0.0,
+        }
+        latencies = np.array(self.latencies) * 1000
+        for p in (50, 95, 99):
+            summary[f'p{p}_ms'] = float(np.percentile(latencies, p)) if len(latencies) else 0.0
+        return summary
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent queries into batches scored off the event loop.
+    
+    The first query of a batch waits at most max_wait seconds for others to
+    join it. While every scoring thread is busy, arriving queries keep
+    queueing, so batches grow with load.
+    """
+    
+    def __init__(self, engine: SearchEngine, max_batch_size: int = 64,
+                 max_wait: float = 0.002, num_threads: int = 1):
+        """
+        Initialize batcher.
+        
+        Args:
+            engine: Fitted search engine
+            max_batch_size: Maximum number of queries scored together
+            max_wait: Seconds a batch stays open for more queries
+            num_threads: Number of scoring threads
+        """
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.num_threads = num_threads
+        self.stats = ServiceStats()
+        self.queue: asyncio.Queue = None
+        self.executor: ThreadPoolExecutor = None
+        self._task: asyncio.Task = None
+    
+    async def start(self) -> None:
+        """Start collecting batches on the running event loop."""
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=self.num_threads)
+        self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        """Stop collecting batches and shut down the scoring threads."""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown(wait=True)
+    
+    async def search(self, query: str, top_k: int = 5) -> List[Dict[str, any]]:
+        """
+        Search for a query as part of the next batch.
+        
+        Args:
+            query: Search query string
+            top_k: Number of top results to return
+        
+        Returns:
+            List of result dicts, as returned by SearchEngine.search
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, top_k, future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Collect batches and hand them to the scoring threads."""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.num_threads)
+        while True:
+            await slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.ensure_future(self._score(batch))
+            task.add_done_callback(lambda _: slots.release())
+    
+    async def _score(self, batch: List[Tuple[str, int, asyncio.Future]]) -> None:
+        """
+        Score a batch in a scoring thread and resolve its futures.
+        
+        If the batch fails, its queries are searched one by one, so only
+        the query that caused the error fails.
+        """
+        loop = asyncio.get_running_loop()
+        queries = [query for query, _, _ in batch]
+        top_k = max(k for _, k, _ in batch)
+        try:
+            outcomes = await loop.run_in_executor(self.executor, self.engine.search_many, queries, top_k)
+        except Exception as e:
+            logger.warning("Batch of %d queries failed (%s); searching them one by one", len(batch), e)
+            outcomes = await loop.run_in_executor(self.executor, self._search_each, queries, top_k)
+        
+        self.stats.record_batch(len(batch))
+        for (_, k, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                # The top-k of a query is a prefix of its top-max(k)
+                future.set_result([result for result in outcome if result['rank'] <= k])
+    
+    def _search_each(self, queries: List[str], top_k: int) -> List:
+        """Search queries separately, returning each query's results or its exception."""
+        outcomes = []
+        for query in queries:
+            try:
+                outcomes.append(self.engine.search(query, top_k))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+
+class SearchServer:
+    """Minimal HTTP/1.1 server (keep-alive, GET only) in front of a QueryBatcher."""
+    
+    def __init__(self, engine: SearchEngine, host: str = '127.0.0.1', port: int = 8000,
+                 max_batch_size: int = 64, max_wait: float = 0.002, num_threads: int = 1):
+        """
+        Initialize server.
+        
+        Args:
+            engine: Fitted search engine
+            host: Interface to listen on
+            port: Port to listen on (0: any free port)
+            max_batch_size: Maximum number of queries scored together
+            max_wait: Seconds a batch stays open for more queries
+            num_threads: Number of scoring threads
+        """
+        self.host = host
+        self.port = port
+        self.batcher = QueryBatcher(engine, max_batch_size, max_wait, num_threads)
+        self._server: asyncio.AbstractServer = None
+    
+    async def start(self) -> None:
+        """Start listening; self.port is set to the bound port."""
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def stop(self) -> None:
+        """Stop listening and shut down the batcher."""
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+    
+    async def serve_forever(self) -> None:
+        """Start the server and run until cancelled."""
+        await self.start()
+        logger.info("Serving on http://%s:%d", self.host, self.port)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of one connection."""
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # A line longer than the reader's limit; the rest of the
+                    # request cannot be found, so the connection is closed
+                    await self._respond(writer, 400, {'error': 'Request line or header too long'}, False)
+                    break
+                try:
+                    content_length = int(headers.get('content-length', 0))
+                except ValueError:
+                    content_length = -1
+                if 0 < content_length <= MAX_BODY_BYTES:
+                    await reader.readexactly(content_length)
+                
+                started = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, payload = 400, {'error': 'Malformed request line'}
+                elif content_length < 0:
+                    # The body cannot be skipped, so the connection is closed below
+                    status, payload = 400, {'error': 'Invalid Content-Length'}
+                elif content_length > MAX_BODY_BYTES:
+                    # The body is not read, so the connection is closed below
+                    status, payload = 413, {'error': f'Request body larger than {MAX_BODY_BYTES} bytes'}
+                else:
+                    try:
+                        status, payload = await self._dispatch(parts[0], parts[1])
+                    except Exception as e:
+                        logger.exception("Error handling %s", parts[1])
+                        status, payload = 500, {'error': str(e)}
+                if status == 200 and 'results' in payload:
+                    self.batcher.stats.record_request(time.perf_counter() - started)
+                
+                keep_alive = (len(parts) == 3 and parts[2] == 'HTTP/1.1'
+                              and 0 <= content_length <= MAX_BODY_BYTES
+                              and headers.get('connection', '').lower() != 'close')
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool) -> None:
+        """Write one JSON response."""
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+    
+    async def _dispatch(self, method: str, target: str) -> Tuple[int, Dict]:
+        """
+        Route a request.
+        
+        Returns:
+            Tuple of (HTTP status, JSON payload)
+        """
+        url = urlsplit(target)
+        if method != 'GET':
+            return 405, {'error': 'Only GET is supported'}
+        if url.path == '/stats':
+            summary = self.batcher.stats.summary()
+            if self.batcher.engine.result_cache is not None:
+                summary['result_cache'] = self.batcher.engine.result_cache.stats()
+            if self.batcher.engine.metrics is not None:
+                summary['pipeline'] = self.batcher.engine.metrics.summary()
+            return 200, summary
+        if url.path != '/search':
+            return 404, {'error': f'Unknown path {url.path}'}
+        
+        params = parse_qs(url.query)
+        query = params.get('q', [''])[0]
+        try:
+            top_k = int(params.get('k', ['5'])[0])
+        except ValueError:
+            return 400, {'error': 'k must be an integer'}
+        if not query.strip() or not 1 <= top_k <= MAX_TOP_K:
+            return 400, {'error': f'Expected a non-empty q and 1 <= k <= {MAX_TOP_K}'}
+        
+        try:
+            results = await self.batcher.search(query, top_k)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, {'query': query, 'results': results}
+
+
+async def fetch_json(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                     target: str) -> Tuple[int, Dict]:
+    """
+    Send a GET request over an open keep-alive connection.
+    
+    Args:
+        reader: Stream of the connection
+        writer: Stream of the connection
+        target: Request path and query string, e.g. '/search?q=whale'
+        
+    Returns:
+        Tuple of (HTTP status, decoded JSON body)
+    """
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def main():
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else 'data/index'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
+    logger.info("Loading index from %s...", index_dir)
+    engine = SearchEngine.load(index_dir)
+    engine.metrics = SearchMetrics()
+    logger.info("Loaded %d documents", len(engine.documents))
+    
+    try:
+        asyncio.run(SearchServer(engine, port=port).serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Stopped.")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
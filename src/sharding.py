@@ -0,0 +1,387 @@
+"""
+Sharded search across worker processes.
+
+The collection is partitioned into contiguous ranges of documents, and each
+range is indexed by a SearchEngine in its own worker process. After
+indexing, the shards' document frequencies and document lengths are
+combined into collection statistics that every shard scores with, so a
+document gets the same score as in an unsharded index. Queries are
+preprocessed and weighted once by the coordinator, sent to all shards at
+once, and the shards' top-k lists are merged by score.
+"""
+
+import os
+import heapq
+import queue
+import shutil
+import logging
+import threading
+import multiprocessing
+from itertools import islice
+from multiprocessing.connection import Connection
+import numpy as np
+from typing import Dict, Iterable, List, Sized, Tuple
+from src.loader import batched
+from src.preprocessing import TextPreprocessor
+from src.vectorizer import TFIDFVectorizer
+from src.positions import parse_query, has_query_operators
+from src.search import SearchEngine, TFIDFCosineModel, SCORING_MODELS
+from src.storage import (save_array, load_array, save_vocabulary, MappedVocabulary,
+                         save_strings, MappedStrings, write_manifest, read_manifest, replace_directory)
+
+logger = logging.getLogger(__name__)
+
+# Documents sent to a shard per message while indexing, unless the shards
+# preprocess larger batches
+SEND_BATCH = 256
+
+
+def _receive_batches(connection: Connection, batches: queue.Queue) -> None:
+    """Queue document batches from the coordinator, up to the closing empty batch."""
+    while True:
+        batch = connection.recv()
+        batches.put(batch)
+        if not batch:
+            break
+
+
+def _shard_worker(connection: Connection, engine_options: Dict) -> None:
+    """
+    Serve one shard's index in a worker process.
+    
+    Receives (command, args) tuples and answers each with ('ok', result)
+    or ('error', exception), until 'close'.
+    
+    Args:
+        connection: Pipe to the coordinator
+        engine_options: Keyword arguments of the shard's SearchEngine
+    """
+    engine = SearchEngine(**engine_options)
+    while True:
+        command, args = connection.recv()
+        if command == 'close':
+            break
+        try:
+            if command == 'index':
+                # Batches are received in a thread, so the coordinator can move
+                # on to the next shard while this one is still indexing
+                batches = queue.Queue()
+                receiver = threading.Thread(target=_receive_batches, args=(connection, batches))
+                receiver.start()
+                try:
+                    documents = (doc for batch in iter(batches.get, []) for doc in batch)
+                    engine.index_documents(documents, batch_size=args)
+                finally:
+                    receiver.join()
+                result = (list(engine.vectorizer.vocabulary), engine.vectorizer.doc_freq,
+                          np.asarray(engine.doc_lengths))
+            elif command == 'stats':
+                result = engine.set_collection_stats(*args)
+            elif command == 'search':
+                result = [engine.search_terms(*query) for query in args]
+            elif command == 'save':
+                result = engine.save(args)
+            elif command == 'load':
+                engine = SearchEngine.load(args)
+                result = len(engine.documents)
+            else:
+                raise ValueError(f"Unknown shard command '{command}'")
+            connection.send(('ok', result))
+        except Exception as error:
+            connection.send(('error', error))
+    connection.close()
+
+
+class ShardedSearchEngine:
+    """Scatter-gather search over index shards held by worker processes."""
+    
+    def __init__(self, num_shards: int = 4, **engine_options):
+        """
+        Initialize sharded search.
+        
+        Args:
+            num_shards: Number of shards, each served by its own process
+            **engine_options: Passed to the SearchEngine of every shard,
+                e.g. model, strategy or positional. Impacts quantized per
+                shard (quantize_bits) are scaled per shard, so their scores
+                differ slightly from an unsharded index.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        
+        self.num_shards = num_shards
+        self.engine_options = engine_options
+        self.model = engine_options.get('model') or TFIDFCosineModel()
+        self.preprocessor = TextPreprocessor(use_stemming=True, remove_stopwords=True,
+                                             tokenizer=engine_options.get('tokenizer', 'nltk'))
+        self.vectorizer = TFIDFVectorizer()  # collection vocabulary and statistics
+        self.terms: List[str] = []  # collection vocabulary in index order
+        self.doc_offsets = np.zeros(1, dtype=np.int64)  # first doc index of each shard
+        self.is_fitted = False
+        
+        self._workers: List[multiprocessing.Process] = []
+        self._connections: List[Connection] = []
+    
+    def __enter__(self) -> 'ShardedSearchEngine':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    @property
+    def num_documents(self) -> int:
+        """Number of documents across all shards."""
+        return int(self.doc_offsets[-1])
+    
+    def index_documents(self, documents: Iterable[Dict[str, str]], batch_size: int = None,
+                        shard_size: int = None) -> None:
+        """
+        Partition documents into shards and index them in parallel.
+        
+        Documents are read once and sent to the shards in batches: the first
+        shard_size documents to the first shard, the next shard_size to the
+        second, and the rest to the last one. The coordinator never holds
+        more than one batch; each shard indexes while the next is filled.
+        
+        Args:
+            documents: Document dicts with 'title' and 'content', e.g. a
+                stream from DocumentLoader.stream_documents
+            batch_size: Documents preprocessed at a time by each shard
+                (default: all of the shard's documents)
+            shard_size: Documents per shard (default: an even split, which
+                needs a collection with a length; required for streams)
+        """
+        if shard_size is None:
+            if not isinstance(documents, Sized):
+                raise ValueError("shard_size is required to shard a stream of documents")
+            bounds = [len(documents) * shard // self.num_shards for shard in range(self.num_shards + 1)]
+            shard_sizes = np.diff(bounds)
+        elif shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        else:
+            shard_sizes = [shard_size] * self.num_shards
+        
+        logger.info("Indexing documents in %d shards...", self.num_shards)
+        self._start()
+        documents = iter(documents)
+        counts = np.zeros(self.num_shards, dtype=np.int64)
+        for shard, connection in enumerate(self._connections):
+            connection.send(('index', batch_size))
+            # The last shard takes every remaining document
+            limit = int(shard_sizes[shard]) if shard < self.num_shards - 1 else None
+            for batch in batched(islice(documents, limit), max(batch_size or 0, SEND_BATCH)):
+                connection.send(batch)
+                counts[shard] += len(batch)
+            connection.send([])
+        shard_stats = self._collect()
+        self.doc_offsets = np.zeros(self.num_shards + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.doc_offsets[1:])
+        num_documents = self.num_documents
+        
+        # Collection statistics: the sorted union of the shard vocabularies,
+        # summed document frequencies and the mean of all document lengths
+        term_ids = self.vectorizer.set_collection_stats(
+            [term for shard_terms, _, _ in shard_stats for term in shard_terms],
+            np.concatenate([doc_freq for _, doc_freq, _ in shard_stats]),
+            num_documents
+        )
+        self.terms = list(self.vectorizer.vocabulary)
+        shard_term_ids = np.split(term_ids, np.cumsum([len(shard_terms) for shard_terms, _, _ in shard_stats])[:-1])
+        doc_lengths = np.concatenate([lengths for _, _, lengths in shard_stats])
+        avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        
+        self._broadcast([
+            ('stats', (self.vectorizer.doc_freq[term_ids], num_documents, avg_doc_length))
+            for term_ids in shard_term_ids
+        ])
+        self.is_fitted = True
+        logger.info("Indexed %d documents in %d shards", num_documents, self.num_shards)
+        logger.info("Vocabulary size: %d", len(self.terms))
+    
+    def search(self, query: str, top_k: int = 5, strategy: str = None) -> List[Dict[str, any]]:
+        """
+        Search all shards in parallel and merge their results.
+        
+        Args:
+            query: Search query string (phrase and NEAR/k syntax allowed if
+                the shards are positional)
+            top_k: Number of top results to return
+            strategy: Override the shards' evaluation strategy for this query
+        
+        Returns:
+            List of result dicts with 'rank', 'title', 'score', 'preview' and
+            'doc_index' (across the whole collection)
+        """
+        return self.search_many([query], top_k, strategy)[0]
+    
+    def search_many(self, queries: List[str], top_k: int = 5,
+                    strategy: str = None) -> List[List[Dict[str, any]]]:
+        """
+        Search for many queries with one round trip to the shards.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of top results per query
+            strategy: Override the shards' evaluation strategy
+        
+        Returns:
+            Result list of each query, as returned by search()
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        weighted = [self._weight_query(query, top_k, strategy) for query in queries]
+        scored = [i for i, query in enumerate(weighted) if query is not None]
+        if not scored:
+            return [[] for _ in queries]
+        shard_results = self._broadcast([('search', [weighted[i] for i in scored])] * self.num_shards)
+        
+        all_results = [[] for _ in queries]
+        for position, i in enumerate(scored):
+            all_results[i] = self._merge([results[position] for results in shard_results], top_k)
+        return all_results
+    
+    def _weight_query(self, query: str, top_k: int, strategy: str) -> Tuple:
+        """Arguments of SearchEngine.search_terms for a query (None: no terms)."""
+        phrases, nears = [], []
+        if has_query_operators(query):
+            query, phrases, nears = parse_query(query)
+        query_tokens = self.preprocessor.preprocess(query)
+        if not query_tokens:
+            return None
+        
+        term_ids, weights = self.model.query_weights(self.vectorizer, query_tokens)
+        if len(term_ids) == 0:
+            return None
+        return [self.terms[term_id] for term_id in term_ids], weights, top_k, strategy, phrases, nears
+    
+    def _merge(self, shard_results: List[List[Dict[str, any]]], top_k: int) -> List[Dict[str, any]]:
+        """
+        Merge the ranked results of every shard into the overall top-k.
+        
+        Ties are broken by lower doc index, as in an unsharded search.
+        
+        Args:
+            shard_results: Ranked results of each shard, with shard-local
+                doc indices
+            top_k: Number of results to keep
+        
+        Returns:
+            Ranked results with collection doc indices
+        """
+        ranked = (
+            [(-result['score'], result['doc_index'] + int(offset), result) for result in results]
+            for results, offset in zip(shard_results, self.doc_offsets)
+        )
+        merged = []
+        for rank, (_, doc_idx, result) in enumerate(islice(heapq.merge(*ranked), top_k), 1):
+            merged.append(dict(result, rank=rank, doc_index=doc_idx))
+        return merged
+    
+    def save(self, path: str) -> None:
+        """
+        Write every shard and the collection statistics to a directory.
+        
+        Args:
+            path: Target directory (replaced if it exists)
+        """
+        if not self.is_fitted:
+            raise ValueError("Search engine not fitted. Call index_documents() first.")
+        
+        tmp_path = path.rstrip(os.sep) + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        self._broadcast([('save', os.path.join(os.path.abspath(tmp_path), f'shard_{shard}'))
+                         for shard in range(self.num_shards)])
+        save_vocabulary(tmp_path, self.vectorizer.vocabulary)
+        save_strings(tmp_path, 'terms', self.terms)
+        save_array(tmp_path, 'doc_freq', self.vectorizer.doc_freq)
+        save_array(tmp_path, 'doc_offsets', self.doc_offsets)
+        write_manifest(tmp_path, {
+            'num_shards': self.num_shards,
+            'num_documents': self.num_documents,
+            'preprocessor': self.preprocessor.settings(),
+            'model': {'name': type(self.model).__name__, 'params': self.model.get_params()},
+        })
+        replace_directory(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ShardedSearchEngine':
+        """
+        Open a sharded index written by save(); each worker maps its shard.
+        
+        Args:
+            path: Index directory
+        
+        Returns:
+            Fitted sharded search engine
+        """
+        manifest = read_manifest(path)
+        model_info = manifest['model']
+        if model_info['name'] not in SCORING_MODELS:
+            raise ValueError(f"Unknown scoring model '{model_info['name']}'")
+        
+        engine = cls(manifest['num_shards'], model=SCORING_MODELS[model_info['name']](**model_info['params']))
+        engine.preprocessor = TextPreprocessor(**manifest['preprocessor'])
+        engine.vectorizer.vocabulary = MappedVocabulary(path)
+        engine.terms = MappedStrings(path, 'terms')
+        engine.vectorizer.doc_freq = load_array(path, 'doc_freq')
+        engine.vectorizer.num_documents = manifest['num_documents']
+        engine.vectorizer.compute_idf()
+        engine.doc_offsets = load_array(path, 'doc_offsets')
+        
+        engine._start()
+        engine._broadcast([('load', os.path.join(os.path.abspath(path), f'shard_{shard}'))
+                           for shard in range(engine.num_shards)])
+        engine.is_fitted = True
+        return engine
+    
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for connection in self._connections:
+            connection.send(('close', None))
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._workers, self._connections = [], []
+        self.is_fitted = False
+    
+    def _start(self) -> None:
+        """Start one worker process per shard, replacing running ones."""
+        self.close()
+        for _ in range(self.num_shards):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_shard_worker,
+                                             args=(worker_connection, self.engine_options),
+                                             daemon=True)
+            worker.start()
+            worker_connection.close()
+            self._workers.append(worker)
+            self._connections.append(connection)
+    
+    def _broadcast(self, messages: List[Tuple[str, any]]) -> List[any]:
+        """
+        Send one message to each shard, then collect their answers.
+        
+        All shards work at the same time; an error in any shard is raised
+        once every shard has answered.
+        
+        Args:
+            messages: (command, args) for each shard, in shard order
+        
+        Returns:
+            Result of each shard
+        """
+        for connection, message in zip(self._connections, messages):
+            connection.send(message)
+        return self._collect()
+    
+    def _collect(self) -> List[any]:
+        """Receive the answer of every shard, raising the first error."""
+        answers = [connection.recv() for connection in self._connections]
+        for status, result in answers:
+            if status == 'error':
+                raise result
+        return [result for _, result in answers]
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+On-disk index format with memory-mapped loading.
+
+An index directory holds a manifest.json (format version, settings and
+scalar state) next to one .npy file per array. Arrays are loaded with
+np.load(mmap_mode='r'), so opening an index only maps files: pages are
+read on first touch and shared between processes serving the same index.
+Strings (vocabulary, document fields) are stored as concatenated UTF-8
+bytes plus an offsets array so they can be mapped the same way.
+"""
+
+import json
+import os
+import shutil
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List
+import numpy as np
+
+FORMAT_VERSION = 5
+MANIFEST_FILE = 'manifest.json'
+
+
+def save_array(path: str, name: str, array: np.ndarray) -> None:
+    """Write one array as <name>.npy inside an index directory."""
+    np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array), allow_pickle=False)
+
+
+def load_array(path: str, name: str) -> np.ndarray:
+    """
+    Memory-map one array from an index directory.
+    
+    Args:
+        path: Index directory
+        name: Array name (without .npy)
+    
+    Returns:
+        Read-only memory-mapped array
+    """
+    array = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+    if array.size == 0:
+        # Zero-length files cannot be mapped; an empty array is equivalent
+        return np.empty(array.shape, dtype=array.dtype)
+    return array
+
+
+def write_manifest(path: str, manifest: Dict) -> None:
+    """Write manifest.json, stamping the format version."""
+    manifest = dict(manifest, format_version=FORMAT_VERSION)
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(path: str) -> Dict:
+    """
+    Read manifest.json and check the format version.
+    
+    Args:
+        path: Index directory
+    
+    Returns:
+        Manifest dict
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No index found at {path}")
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    version = manifest.get('format_version')
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format version {version} (expected {FORMAT_VERSION})")
+    return manifest
+
+
+def replace_directory(tmp_path: str, path: str) -> None:
+    """
+    Move a fully written index into place, replacing any previous one.
+    
+    A directory cannot be renamed over a non-empty one, so the previous
+    index is first renamed aside to <path>.old, the new one is renamed
+    into place, and only then is the old copy deleted. Both steps are
+    single renames: the index is missing only between them, and a crash
+    at any point leaves a complete index at <path> or <path>.old.
+    
+    Args:
+        tmp_path: Fully written index directory
+        path: Target directory
+    """
+    old_path = path.rstrip(os.sep) + '.old'
+    if os.path.exists(old_path):
+        # Left behind by an interrupted save: restore it if it is the only copy
+        if os.path.exists(path):
+            shutil.rmtree(old_path)
+        else:
+            os.replace(old_path, path)
+    if not os.path.exists(path):
+        os.replace(tmp_path, path)
+        return
+    
+    os.replace(path, old_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        os.replace(old_path, path)
+        raise
+    shutil.rmtree(old_path)
+
+
+def save_strings(path: str, name: str, strings: List[str]) -> None:
+    """
+    Store strings as concatenated UTF-8 bytes plus offsets.
+    
+    Args:
+        path: Index directory
+        name: Base name for the <name>.npy and <name>_offsets.npy files
+        strings: Strings to store
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    save_array(path, name, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    save_array(path, f'{name}_offsets', offsets)
+
+
+class MappedStrings(Sequence):
+    """Read-only sequence of strings decoded on access from mapped bytes."""
+    
+    def __init__(self, path: str, name: str):
+        """
+        Map a string store written by save_strings.
+        
+        Args:
+            path: Index directory
+            name: Base name of the store
+        """
+        self.data = load_array(path, name)
+        self.offsets = load_array(path, f'{name}_offsets')
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+
+def save_vocabulary(path: str, vocabulary: Mapping) -> None:
+    """
+    Store a term -> index mapping as sorted strings plus their indices.
+    
+    The terms use the save_strings layout, so the vocabulary takes the
+    size of its UTF-8 text rather than of its longest term times its length.
+    
+    Args:
+        path: Index directory
+        vocabulary: Term to index mapping
+    """
+    # Code point order is UTF-8 byte order, which lookups compare in
+    terms = sorted(vocabulary.items())
+    save_strings(path, 'vocab_terms', [term for term, _ in terms])
+    save_array(path, 'vocab_ids', np.array([idx for _, idx in terms], dtype=np.int64))
+
+
+class MappedVocabulary(Mapping):
+    """
+    Term -> index mapping backed by mapped, sorted strings.
+    
+    Lookups binary-search the sorted terms, so opening the vocabulary
+    costs nothing regardless of its size.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Map a vocabulary written by save_vocabulary.
+        
+        Args:
+            path: Index directory
+        """
+        self.terms = MappedStrings(path, 'vocab_terms')
+        self.ids = load_array(path, 'vocab_ids')
+    
+    def __getitem__(self, term: str) -> int:
+        key = term.encode('utf-8')
+        data, offsets = self.terms.data, self.terms.offsets
+        low, high = 0, len(self.terms)
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(data[offsets[middle]:offsets[middle + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.terms) and bytes(data[offsets[low]:offsets[low + 1]]) == key:
+            return int(self.ids[low])
+        raise KeyError(term)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.terms)
+    
+    def __len__(self) -> int:
+        return len(self.terms)
+
+
+def save_documents(path: str, documents: List[Dict[str, str]]) -> List[str]:
+    """
+    Store document fields column-wise as string stores.
+    
+    Args:
+        path: Index directory
+        documents: List of document dicts with string values
+    
+    Returns:
+        Names of the stored fields
+    """
+    if isinstance(documents, MappedDocuments) and not documents.added:
+        # Mapped fields are copied as they are, without decoding every document
+        for field, strings in documents.fields.items():
+            save_array(path, f'doc_{field}', strings.data)
+            save_array(path, f'doc_{field}_offsets', strings.offsets)
+            save_array(path, f'doc_{field}_present', documents.present[field])
+        return sorted(documents.fields)
+    
+    fields = sorted({key for doc in documents for key in doc})
+    for field in fields:
+        save_strings(path, f'doc_{field}', [str(doc.get(field, '')) for doc in documents])
+        save_array(path, f'doc_{field}_present', np.array([field in doc for doc in documents], dtype=bool))
+    return fields
+
+
+class MappedDocuments(Sequence):
+    """
+    List of document dicts decoded on access from mapped fields.
+    
+    Stored documents are read-only; documents added with extend() are kept
+    in memory until the index is saved again.
+    """
+    
+    def __init__(self, path: str, fields: List[str], num_documents: int):
+        """
+        Map documents written by save_documents.
+        
+        Args:
+            path: Index directory
+            fields: Stored field names
+            num_documents: Number of documents
+        """
+        self.num_documents = num_documents
+        self.fields = {field: MappedStrings(path, f'doc_{field}') for field in fields}
+        self.present = {field: load_array(path, f'doc_{field}_present') for field in fields}
+        self.added: List[Dict[str, str]] = []
+    
+    def __len__(self) -> int:
+        return self.num_documents + len(self.added)
+    
+    def __getitem__(self, i: int) -> Dict[str, str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i >= self.num_documents:
+            return self.added[i - self.num_documents]
+        return {field: strings[i] for field, strings in self.fields.items() if self.present[field][i]}
+    
+    def extend(self, documents: List[Dict[str, str]]) -> None:
+        """Append documents after the stored ones."""
+        self.added.extend(documents)
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Test the IVF approximate nearest-neighbour index.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from src.ann import IVFIndex, kmeans, exact_top_k, normalize_rows
+from src.evaluation import SearchEvaluator
+
+
+def clustered_vectors(num_vectors: int = 4000, dim: int = 32, num_clusters: int = 20):
+    """Vectors and queries scattered around random cluster centres."""
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(num_clusters, dim))
+    vectors = centres[rng.integers(num_clusters, size=num_vectors)] + 0.4 * rng.normal(size=(num_vectors, dim))
+    queries = centres[rng.integers(num_clusters, size=50)] + 0.4 * rng.normal(size=(50, dim))
+    return vectors, queries
+
+
+def mean_recall(index: IVFIndex, vectors: np.ndarray, queries: np.ndarray, nprobe: int, k: int = 10) -> float:
+    """Mean recall@k of the index against exact search."""
+    evaluator = SearchEvaluator()
+    normalized = normalize_rows(vectors)
+    recalls = []
+    for query in queries:
+        relevant = {doc_idx for doc_idx, _ in exact_top_k(normalized, query, k)}
+        retrieved = [doc_idx for doc_idx, _ in index.search(query, k, nprobe)]
+        recalls.append(evaluator.recall_at_k(relevant, retrieved, k))
+    return float(np.mean(recalls))
+
+
+def test_kmeans():
+    """k-means should find well separated clusters."""
+    print("Testing k-means...")
+    
+    rng = np.random.default_rng(0)
+    points = np.concatenate([rng.normal(loc, 0.1, size=(100, 2)) for loc in ((0, 0), (5, 5), (0, 5))])
+    centroids, assignment = kmeans(points, 3, seed=1)
+    assert len(set(assignment[:100])) == len(set(assignment[100:200])) == len(set(assignment[200:])) == 1
+    assert len(set(assignment)) == 3
+    assert np.allclose(sorted(map(tuple, np.round(centroids))), [(0, 0), (0, 5), (5, 5)])
+    print("  ✓ Three blobs recovered")
+    
+    centroids, assignment = kmeans(points[:5], 10)
+    assert len(centroids) == 5
+    print("  ✓ k is capped at the number of points")
+    
+    print("✓ k-means tests passed!\n")
+
+
+def test_ivf_search():
+    """Recall should grow with nprobe and reach exact results."""
+    print("Testing IVF search...")
+    
+    vectors, queries = clustered_vectors()
+    index = IVFIndex(nlist=64)
+    index.build(vectors)
+    assert index.num_vectors == len(vectors)
+    assert sorted(index.list_ids) == list(range(len(vectors)))
+    
+    normalized = normalize_rows(vectors)
+    for query in queries[:10]:
+        expected = exact_top_k(normalized, query, 10)
+        found = index.search(query, 10, nprobe=64)
+        assert [d for d, _ in found] == [d for d, _ in expected]
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+    print("  ✓ Scanning every list gives the exact results")
+    
+    recalls = [mean_recall(index, vectors, queries, nprobe) for nprobe in (1, 4, 16)]
+    assert recalls[0] <= recalls[1] <= recalls[2] and recalls[2] > 0.95
+    print(f"  ✓ recall@10 by nprobe 1/4/16: {recalls[0]:.2f} / {recalls[1]:.2f} / {recalls[2]:.2f}")
+    
+    assert index.search_many(queries[:3], 5) == [index.search(q, 5) for q in queries[:3]]
+    print("  ✓ search_many matches search")
+    
+    print("✓ IVF tests passed!\n")
+
+
+def test_product_quantization():
+    """Quantized lists should be smaller and still find most neighbours."""
+    print("Testing product quantization...")
+    
+    vectors, queries = clustered_vectors()
+    flat = IVFIndex(nlist=16)
+    flat.build(vectors)
+    quantized = IVFIndex(nlist=16, pq_subvectors=8)
+    quantized.build(vectors)
+    assert quantized.list_codes.shape == (len(vectors), 8) and quantized.list_vectors is None
+    assert quantized.nbytes < flat.nbytes / 3
+    print(f"  ✓ {flat.nbytes / 1e3:.0f} KB -> {quantized.nbytes / 1e3:.0f} KB")
+    
+    # Approximate scores should stay close to the true cosines
+    normalized = normalize_rows(vectors)
+    for query in queries[:10]:
+        for doc_idx, score in quantized.search(query, 10, nprobe=16):
+            assert abs(score - normalized[doc_idx] @ normalize_rows(query[None, :])[0]) < 0.2
+    recall = mean_recall(quantized, vectors, queries, nprobe=16)
+    assert recall > 0.3
+    print(f"  ✓ recall@10 with all lists: {recall:.2f}")
+    
+    try:
+        IVFIndex(pq_subvectors=5).build(vectors)
+        assert False, "A subvector count that does not divide the dimension should raise"
+    except ValueError:
+        print("  ✓ Invalid subvector count rejected")
+    
+    print("✓ Quantization tests passed!\n")
+
+
+def test_save_and_load():
+    """A saved index should return identical results."""
+    print("Testing ANN index persistence...")
+    
+    vectors, queries = clustered_vectors(1000)
+    for pq_subvectors in (None, 4):
+        index = IVFIndex(nlist=20, nprobe=3, pq_subvectors=pq_subvectors)
+        index.build(vectors)
+        with tempfile.TemporaryDirectory() as tmp:
+            state = index.save(tmp)
+            loaded = IVFIndex.load(tmp, state)
+            assert loaded.nprobe == 3
+            assert loaded.search_many(queries, 10) == index.search_many(queries, 10)
+    print("  ✓ Results match after save/load")
+    
+    print("✓ Persistence tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("ANN INDEX TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_kmeans()
+    test_ivf_search()
+    test_product_quantization()
+    test_save_and_load()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Test the benchmark suite's run comparison and process isolation.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import multiprocessing
+from src import bench_suite
+from src.bench_suite import compare_runs, run_isolated, METRICS
+
+
+def sample_result(num_docs: int, **metrics) -> dict:
+    """Result of one corpus size with every metric at 100 unless given."""
+    result = {'num_docs': num_docs}
+    result.update({metric: 100.0 for metric in METRICS})
+    result.update(metrics)
+    return result
+
+
+def test_compare_runs():
+    """Only changes for the worse beyond the threshold should regress."""
+    print("Testing compare_runs...")
+    
+    baseline = {'results': [sample_result(1000)]}
+    current = {'results': [
+        sample_result(1000, p95_ms=130.0, p99_ms=110.0, index_docs_per_s=70.0, index_mb_per_s=150.0),
+        sample_result(10000, p95_ms=500.0),
+    ]}
+    rows = {(num_docs, metric): (old, new, change, regressed)
+            for num_docs, metric, old, new, change, regressed in compare_runs(baseline, current, 0.15)}
+    
+    assert rows[1000, 'p95_ms'] == (100.0, 130.0, 0.3, True)
+    assert rows[1000, 'p99_ms'][3] is False
+    print("  ✓ Slower latency beyond the threshold regresses, within it does not")
+    
+    assert rows[1000, 'index_docs_per_s'][2] == -0.3 and rows[1000, 'index_docs_per_s'][3]
+    assert rows[1000, 'index_mb_per_s'][2] == 0.5 and not rows[1000, 'index_mb_per_s'][3]
+    print("  ✓ Lower throughput regresses, higher throughput does not")
+    
+    assert all(num_docs == 1000 for num_docs, _ in rows)
+    assert len(rows) == len(METRICS)
+    print("  ✓ Sizes missing from the baseline are skipped")
+    
+    print("✓ compare_runs tests passed!\n")
+
+
+def test_run_isolated_dies():
+    """A worker that dies without reporting should fail, not hang."""
+    print("Testing run_isolated with a dying worker...")
+    
+    if multiprocessing.get_start_method() != 'fork':
+        print("  - Skipped: needs the fork start method")
+        return
+    run_size = bench_suite.run_size
+    bench_suite.run_size = lambda num_docs, options: os._exit(3)
+    try:
+        run_isolated(1000, {}, poll_seconds=0.1)
+        assert False, "run_isolated should raise"
+    except RuntimeError as error:
+        assert '1000 documents' in str(error) and 'exit code 3' in str(error)
+        print(f"  ✓ {error}")
+    finally:
+        bench_suite.run_size = run_size
+    
+    print("✓ run_isolated tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("BENCHMARK SUITE TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_compare_runs()
+    test_run_isolated_dies()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Test out-of-core index construction.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from src.builder import ExternalIndexBuilder
+from src.search import SearchEngine, BM25Model
+from src.corpora import synthetic_documents
+
+
+def sample_documents():
+    """Synthetic corpus with an empty document and an extra field."""
+    documents, words, probs = synthetic_documents(1500, vocab_size=2000)
+    documents[7] = {'title': 'Empty', 'content': '', 'author': 'nobody'}
+    return documents, words, probs
+
+
+def test_matches_in_memory_index():
+    """An index built from spilled runs should equal the in-memory index."""
+    print("Testing out-of-core build...")
+    
+    documents, words, probs = sample_documents()
+    rng = np.random.default_rng(0)
+    queries = [' '.join(rng.choice(words, 3, p=probs)) for _ in range(15)]
+    for label, options in (('TF-IDF', {}), ('BM25', {'model': BM25Model()}),
+                           ('uint8 vectors', {'vector_dtype': 'uint8'})):
+        engine = SearchEngine(result_cache_size=0, **options)
+        engine.index_documents(documents)
+        builder = ExternalIndexBuilder(memory_budget_mb=0.25, batch_size=100, **options)
+        with tempfile.TemporaryDirectory() as tmp:
+            built = builder.build(iter(documents), os.path.join(tmp, 'index'))
+            assert os.listdir(tmp) == ['index']
+            assert builder.num_runs > 5
+            
+            assert list(built.vectorizer.vocabulary) == sorted(engine.vectorizer.vocabulary)
+            assert np.array_equal(built.vectorizer.doc_freq, engine.vectorizer.doc_freq)
+            assert (built.doc_vectors != engine.doc_vectors).nnz == 0
+            for expected, found in zip(engine.index.all_postings(), built.index.all_postings()):
+                assert np.array_equal(expected, found)
+            for name in ('term_max_impacts', 'block_offsets', 'block_last_docs', 'block_max_impacts'):
+                assert np.array_equal(getattr(built.index, name), getattr(engine.index, name))
+            
+            for strategy in SearchEngine.STRATEGIES:
+                for query in queries:
+                    assert built.search(query, 10, strategy) == engine.search(query, 10, strategy)
+            assert built.documents[7] == documents[7]
+            assert built.documents[8] == documents[8]
+        print(f"  ✓ {builder.num_runs} runs match the in-memory index ({label})")
+    
+    print("✓ Out-of-core build tests passed!\n")
+
+
+def test_builder_options():
+    """Unsupported settings and empty input should be rejected."""
+    print("Testing builder options...")
+    
+    for options in ({'quantize_bits': 8}, {'codec': 'varbyte'}, {'positional': True},
+                    {'memory_budget_mb': 0}, {'strategy': 'unknown'}):
+        try:
+            ExternalIndexBuilder(**options)
+            assert False, f"{options} should be rejected"
+        except ValueError:
+            pass
+    print("  ✓ Unsupported options rejected")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            ExternalIndexBuilder(tmp_dir=tmp).build([], os.path.join(tmp, 'index'))
+            assert False, "An empty stream should raise"
+        except ValueError:
+            assert os.listdir(tmp) == []
+    print("  ✓ Empty stream rejected and working files removed")
+    
+    documents, _, _ = sample_documents()
+    with tempfile.TemporaryDirectory() as tmp:
+        builder = ExternalIndexBuilder()
+        built = builder.build(documents[:50], os.path.join(tmp, 'index'))
+        assert builder.num_runs == 1 and len(built.documents) == 50
+    print("  ✓ A stream that fits the budget is one run")
+    
+    print("✓ Builder option tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("OUT-OF-CORE BUILDER TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_matches_in_memory_index()
+    test_builder_options()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Test posting list codecs and compressed indexes.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from src.compression import CODECS, CompressedArray, list_blocks
+from src.search import SearchEngine
+from src.corpora import random_index
+
+
+def random_lists(rng, num_lists, max_length, max_value):
+    """Values of consecutive lists and their offsets."""
+    lengths = rng.integers(0, max_length, size=num_lists)
+    offsets = np.zeros(num_lists + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return rng.integers(0, max_value, size=offsets[-1]).astype(np.uint64), offsets
+
+
+def test_codecs_round_trip():
+    """Every codec should decode exactly what it encoded, block by block."""
+    print("Testing codecs...")
+    
+    rng = np.random.default_rng(0)
+    for max_value in (1, 3, 300, 70000, 2 ** 40):
+        values, list_offsets = random_lists(rng, 40, 300, max_value)
+        block_offsets, _ = list_blocks(list_offsets, 64)
+        for codec in CODECS:
+            array = CompressedArray.encode(values, block_offsets, codec)
+            assert np.array_equal(np.asarray(array), values), (codec, max_value)
+            
+            for _ in range(10):
+                start = int(rng.integers(0, len(values)))
+                stop = int(rng.integers(start, len(values) + 1))
+                assert np.array_equal(array[start:stop], values[start:stop]), (codec, start, stop)
+            
+            blocks = rng.permutation(len(block_offsets) - 1)[:5]
+            expected = np.concatenate([values[block_offsets[b]:block_offsets[b + 1]] for b in blocks])
+            assert np.array_equal(array.decode_blocks(blocks), expected), codec
+    print(f"  ✓ {', '.join(CODECS)} round-trip whole arrays, slices and single blocks")
+    
+    for codec in CODECS:
+        empty = CompressedArray.encode(np.empty(0, dtype=np.uint8), np.zeros(1, dtype=np.int64), codec)
+        assert len(empty) == 0 and len(np.asarray(empty)) == 0
+    print("  ✓ Empty arrays handled")
+    
+    print("✓ Codec tests passed!\n")
+
+
+def test_compressed_index():
+    """A compressed index should decode and intersect like the plain one."""
+    print("Testing compressed index...")
+    
+    index, _ = random_index()
+    plain_size = index.nbytes
+    for codec in CODECS:
+        compressed, _ = random_index()
+        compressed.compress(codec, block_size=16)
+        assert compressed.codec == codec
+        
+        rng = np.random.default_rng(1)
+        for term_id in range(index.vocab_size):
+            doc_ids, tfs = index.postings(term_id)
+            got_docs, got_tfs = compressed.postings(term_id)
+            assert np.array_equal(doc_ids, got_docs) and np.array_equal(tfs, got_tfs)
+            
+            candidates = np.unique(rng.integers(0, index.num_documents, size=30))
+            expected = np.intersect1d(doc_ids, candidates)
+            assert np.array_equal(compressed.intersect(term_id, candidates), expected)
+        print(f"  ✓ {codec}: postings and skip-pointer intersection match "
+              f"({compressed.nbytes} vs {plain_size} bytes)")
+    
+    print("✓ Compressed index tests passed!\n")
+
+
+def test_compressed_engine():
+    """Every strategy should return identical results on a compressed engine."""
+    print("Testing compressed search engine...")
+    
+    documents = [
+        {'title': f'Doc {i}', 'content': ' '.join(f'word{(i * j) % 37}' for j in range(1, 40))}
+        for i in range(120)
+    ]
+    queries = ['word1 word5', 'word3 word7 word11', 'word0', 'word13 word2 word30']
+    plain = SearchEngine(result_cache_size=0)
+    plain.index_documents(documents)
+    expected = {(q, s): plain.search(q, top_k=10, strategy=s) for q in queries for s in plain.STRATEGIES}
+    
+    for codec in CODECS:
+        engine = SearchEngine(result_cache_size=0, codec=codec)
+        engine.index_documents(documents)
+        for (query, strategy), results in expected.items():
+            assert engine.search(query, top_k=10, strategy=strategy) == results, (codec, query, strategy)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            engine.save(os.path.join(tmp, 'index'))
+            loaded = SearchEngine.load(os.path.join(tmp, 'index'))
+            assert loaded.codec == codec and loaded.index.codec == codec
+            for (query, strategy), results in expected.items():
+                assert loaded.search(query, top_k=10, strategy=strategy) == results
+        print(f"  ✓ {codec}: all strategies match, before and after save/load")
+    
+    try:
+        SearchEngine(codec='zip')
+        assert False, "Unknown codec should raise"
+    except ValueError:
+        print("  ✓ Unknown codec rejected")
+    
+    print("✓ Compressed engine tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("POSTING COMPRESSION TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_codecs_round_trip()
+    test_compressed_index()
+    test_compressed_engine()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -4,7 +4,7 @@ Test evaluation metrics.
 
 import sys
 import os
-project_root = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 from src.loader import DocumentLoader
@@ -19,7 +19,7 @@ def main():
     print()
     
     # Load and index documents
-    loader = DocumentLoader('data/raw_texts')
+    loader = DocumentLoader(os.path.join(project_root, 'data', 'raw_texts'))
     documents = loader.load_documents()
     
     engine = SearchEngine()
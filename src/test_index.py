@@ -0,0 +1,93 @@
+"""
+Test inverted index and index-based query evaluation.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+from src.vectorizer import TFIDFVectorizer
+from src.index import InvertedIndex
+from src.search import SearchEngine
+from src.corpora import sample_documents
+
+
+def test_posting_lists():
+    """Posting lists should mirror the columns of the count matrix."""
+    print("Testing posting lists...")
+    
+    documents = [
+        ['whale', 'sea', 'whale'],
+        ['crime', 'sea'],
+        ['blood'],
+        ['sea', 'blood', 'blood', 'blood'],
+    ]
+    vectorizer = TFIDFVectorizer()
+    counts = vectorizer.fit_counts(documents)
+    
+    index = InvertedIndex()
+    index.build(counts)
+    
+    assert index.num_documents == 4
+    assert index.vocab_size == len(vectorizer.vocabulary)
+    
+    dense = counts.toarray()
+    for term, term_id in vectorizer.vocabulary.items():
+        doc_ids, tfs = index.postings(term_id)
+        expected_docs = np.flatnonzero(dense[:, term_id])
+        assert list(doc_ids) == list(expected_docs), f"Wrong postings for '{term}'"
+        assert list(tfs) == list(dense[expected_docs, term_id])
+        assert index.doc_freq(term_id) == len(expected_docs)
+    print("  ✓ Doc ids and term frequencies decoded correctly")
+    
+    # Small gaps and frequencies fit in a single byte
+    assert index.doc_gaps.dtype == np.uint8
+    assert index.term_freqs.dtype == np.uint8
+    print("  ✓ Gaps and frequencies stored in narrowest dtype")
+    
+    print("✓ Posting list tests passed!\n")
+
+
+def test_strategies_match_exhaustive():
+    """Index-based strategies must rank and score exactly like exhaustive search."""
+    print("Testing evaluation strategies...")
+    
+    engine = SearchEngine()
+    engine.index_documents(sample_documents())
+    
+    queries = ["whale ocean sea", "detective crime night", "blood night sea", "unknownword"]
+    for query in queries:
+        expected = engine.search(query, top_k=3, strategy='exhaustive')
+        for strategy in ('taat', 'daat'):
+            results = engine.search(query, top_k=3, strategy=strategy)
+            assert [r['doc_index'] for r in results] == [r['doc_index'] for r in expected]
+            assert [r['score'] for r in results] == [r['score'] for r in expected]
+        print(f"  ✓ '{query}': {len(expected)} results agree")
+    
+    try:
+        engine.search("whale", strategy='bogus')
+        assert False, "Unknown strategy should raise"
+    except ValueError:
+        print("  ✓ Unknown strategy rejected")
+    
+    print("✓ Strategy tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("INVERTED INDEX TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_posting_lists()
+    test_strategies_match_exhaustive()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -2,12 +2,91 @@
 Test script for document loader.
 """
 
-from loader import DocumentLoader
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+from src.loader import DocumentLoader, batched
+from src.search import SearchEngine
+
+
+def write_corpus(root):
+    """Write a small nested corpus of text files."""
+    files = {
+        'moby_dick.txt': 'The whale swam through the ocean. Sailors hunted the great whale at sea.',
+        'dracula.txt': 'The vampire drank blood at night. Blood and darkness filled the castle.',
+        'notes.md': 'Not a text file.',
+        os.path.join('mysteries', 'sherlock.txt'): 'The detective solved the mystery. A crime was committed.',
+        os.path.join('mysteries', 'older', 'ghost_story.txt'): 'A ghost haunted the castle at night.',
+    }
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def test_stream_documents():
+    """Streaming should walk subdirectories and split large files into parts."""
+    print("Testing document streaming...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_corpus(tmp)
+        loader = DocumentLoader(tmp)
+        
+        flat = loader.load_documents()
+        streamed = list(loader.stream_documents(recursive=False, chunk_size=7))
+        assert sorted(streamed, key=lambda doc: doc['title']) == sorted(flat, key=lambda doc: doc['title'])
+        assert loader.get_document_count() == len(flat) == 2
+        print("  ✓ Chunked reads match load_documents")
+        
+        titles = [doc['title'] for doc in loader.stream_documents()]
+        assert titles == ['Dracula', 'Moby Dick', 'Sherlock', 'Ghost Story']
+        print("  ✓ Subdirectories walked in name order")
+        
+        parts = list(loader.stream_documents(recursive=False, chunk_size=5, max_chars=20))
+        moby = [doc for doc in parts if doc['title'].startswith('Moby Dick')]
+        assert all(len(doc['content']) <= 20 for doc in parts)
+        assert ''.join(doc['content'] for doc in moby) == flat[[d['title'] for d in flat].index('Moby Dick')]['content']
+        assert moby[1]['title'] == 'Moby Dick (Part 2)'
+        print("  ✓ Large files split at whitespace")
+        
+        whole = list(loader.stream_documents(recursive=False, chunk_size=5, max_chars=None))
+        assert sorted(whole, key=lambda doc: doc['title']) == sorted(flat, key=lambda doc: doc['title'])
+        print("  ✓ max_chars=None keeps files whole")
+    
+    assert [len(batch) for batch in batched(range(7), 3)] == [3, 3, 1]
+    assert list(batched([], 3)) == []
+    
+    print("✓ Streaming tests passed!\n")
+
+
+def test_index_stream():
+    """Indexing a stream in batches should match indexing a loaded list."""
+    print("Testing batched indexing of a document stream...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_corpus(tmp)
+        loader = DocumentLoader(tmp)
+        
+        full = SearchEngine()
+        full.index_documents(list(loader.stream_documents()))
+        streamed = SearchEngine()
+        streamed.index_documents(loader.stream_documents(), batch_size=1, store_content=False)
+    
+    assert streamed.vectorizer.vocabulary == full.vectorizer.vocabulary
+    for query in ("castle night", "whale ocean", "detective"):
+        assert streamed.search(query) == full.search(query)
+    print("  ✓ Same vocabulary and results")
+    
+    print("✓ Stream indexing tests passed!\n")
 
 
 def main():
     # Initialize loader - use path relative to src folder
-    loader = DocumentLoader('../data/raw_texts')  # Added '../'
+    loader = DocumentLoader(os.path.join(project_root, 'data', 'raw_texts'))
     
     # Load documents
     print("Loading documents...\n")
@@ -23,6 +102,9 @@ def main():
         print(f"   Characters: {len(doc['content']):,}")
         print(f"   Preview: {doc['content'][:100].strip()}...")
         print()
+    
+    test_stream_documents()
+    test_index_stream()
 
 
 if __name__ == '__main__':
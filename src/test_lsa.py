@@ -0,0 +1,141 @@
+"""
+Test latent semantic search with the randomized truncated SVD.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from scipy.sparse import random as sparse_random
+from src.lsa import randomized_svd, LSASearchEngine
+from src.ann import IVFIndex
+from src.search import SearchEngine
+from src.corpora import topical_documents
+
+
+def topic_query(words, topic_probs, topic: int, seed: int = 0) -> str:
+    """A few words drawn from one topic."""
+    rng = np.random.default_rng(seed)
+    return ' '.join(rng.choice(words, 4, p=topic_probs[topic]))
+
+
+def test_randomized_svd():
+    """Leading singular triplets should match the exact SVD."""
+    print("Testing randomized SVD...")
+    
+    rng = np.random.default_rng(0)
+    low_rank = rng.normal(size=(300, 15)) @ rng.normal(size=(15, 200))
+    matrix = low_rank + sparse_random(300, 200, density=0.05, random_state=1).toarray()
+    u, singular_values, vt = randomized_svd(matrix, 10)
+    exact = np.linalg.svd(matrix, compute_uv=False)
+    assert u.shape == (300, 10) and vt.shape == (10, 200)
+    assert np.allclose(singular_values, exact[:10], rtol=1e-3)
+    assert np.allclose(u.T @ u, np.eye(10), atol=1e-6)
+    print(f"  ✓ Top singular values within 0.1% (largest {singular_values[0]:.1f})")
+    
+    sparse = sparse_random(500, 300, density=0.02, random_state=2, format='csr')
+    u, singular_values, vt = randomized_svd(sparse, 20, power_iterations=6)
+    exact = np.linalg.svd(sparse.toarray(), compute_uv=False)
+    assert np.all(np.abs(singular_values - exact[:20]) < 0.05 * exact[0])
+    print("  ✓ Sparse input is decomposed without densifying")
+    
+    assert len(randomized_svd(sparse, 1000)[1]) == 300
+    print("  ✓ k is capped at the smaller dimension")
+    
+    print("✓ Randomized SVD tests passed!\n")
+
+
+def test_lsa_search():
+    """Full rank LSA should rank like TF-IDF; reduced LSA should find the topic."""
+    print("Testing LSA search...")
+    
+    documents, words, topics, topic_probs = topical_documents(40, 400, num_topics=4)
+    engine = SearchEngine(result_cache_size=0)
+    engine.index_documents(documents)
+    lsa = LSASearchEngine(dims=40)
+    lsa.index_documents(documents)
+    assert lsa.doc_vectors.dtype == np.float32 and lsa.doc_vectors.shape == (40, 40)
+    for topic in range(4):
+        query = topic_query(words, topic_probs, topic, seed=topic)
+        expected = engine.search(query, top_k=5, strategy='exhaustive')
+        found = lsa.search(query, top_k=5)
+        assert [r['doc_index'] for r in found] == [r['doc_index'] for r in expected]
+    print("  ✓ With every dimension kept, rankings match exhaustive TF-IDF")
+    
+    documents, words, topics, topic_probs = topical_documents(1500, 2000, num_topics=10)
+    lsa = LSASearchEngine(dims=50)
+    lsa.index_documents(documents)
+    precision = []
+    for topic in range(10):
+        results = lsa.search(topic_query(words, topic_probs, topic), top_k=10)
+        precision.append(np.mean([topics[r['doc_index']] == topic for r in results]))
+    assert np.mean(precision) > 0.8
+    print(f"  ✓ 50 dimensions: {np.mean(precision):.2f} of the top 10 share the query topic")
+    
+    queries = [topic_query(words, topic_probs, topic) for topic in range(5)]
+    for batched, single in zip(lsa.search_many(queries, 5), [lsa.search(q, 5) for q in queries]):
+        assert [r['doc_index'] for r in batched] == [r['doc_index'] for r in single]
+        assert np.allclose([r['score'] for r in batched], [r['score'] for r in single], atol=1e-5)
+    for chunked, whole in zip(lsa.search_many(queries, 5, chunk_size=2), lsa.search_many(queries, 5)):
+        assert [r['doc_index'] for r in chunked] == [r['doc_index'] for r in whole]
+    assert lsa.search('unknownword') == []
+    print("  ✓ search_many matches search in any chunk size; unknown queries return nothing")
+    
+    try:
+        LSASearchEngine().search('query')
+        assert False, "Searching an unfitted engine should raise"
+    except ValueError:
+        print("  ✓ Unfitted engine rejected")
+    
+    print("✓ LSA search tests passed!\n")
+
+
+def test_lsa_ann_and_persistence():
+    """An IVF index over the latent vectors should match exact search and survive save/load."""
+    print("Testing LSA with an ANN index and persistence...")
+    
+    documents, words, _, topic_probs = topical_documents(800, 1500, num_topics=8)
+    exact = LSASearchEngine(dims=32)
+    exact.index_documents(documents)
+    approximate = LSASearchEngine(dims=32, ann=IVFIndex(nlist=16))
+    approximate.index_documents(documents)
+    queries = [topic_query(words, topic_probs, topic) for topic in range(8)]
+    for query in queries:
+        expected = exact.search(query, top_k=10)
+        found = approximate.search(query, top_k=10, nprobe=16)
+        assert [r['doc_index'] for r in found] == [r['doc_index'] for r in expected]
+    print("  ✓ Scanning every list matches exact latent search")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for lsa in (exact, approximate):
+            path = os.path.join(tmp, 'lsa')
+            lsa.save(path)
+            loaded = LSASearchEngine.load(path)
+            assert [loaded.search(q, 10) for q in queries] == [lsa.search(q, 10) for q in queries]
+            assert (loaded.ann is None) == (lsa.ann is None)
+            assert not loaded.engine.segments and not os.path.exists(os.path.join(path, 'engine', 'counts_data.npy'))
+    print("  ✓ Results match after save/load, without the sparse index")
+    
+    print("✓ LSA ANN and persistence tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("LSA TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_randomized_svd()
+    test_lsa_search()
+    test_lsa_ann_and_persistence()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Test per-stage search metrics, profile hooks and indexing logs.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import logging
+from src.search import SearchEngine
+from src.metrics import SearchMetrics, QueryProfile, NO_PROFILE, STAGES
+from src.corpora import synthetic_documents
+
+
+def sample_engine(**options) -> SearchEngine:
+    """Engine over a small synthetic corpus."""
+    documents, _, _ = synthetic_documents(300, vocab_size=800)
+    engine = SearchEngine(**options)
+    engine.index_documents(documents)
+    return engine
+
+
+def test_profile_hook():
+    """Every search should report its stage timings and counters."""
+    print("Testing profile hook...")
+    
+    profiles = []
+    engine = sample_engine(profile_hook=profiles.append)
+    words = engine.documents[0]['content'].split()
+    query = f'{words[0]} {words[1]}'
+    
+    results = engine.search(query, top_k=5)
+    profile = profiles[-1]
+    assert profile['query'] == query
+    assert list(profile['stages_ms']) == ['refresh', 'preprocess', 'cache', 'weight', 'score', 'results']
+    assert abs(sum(profile['stages_ms'].values()) - profile['total_ms']) < 1e-6
+    print(f"  ✓ Stages: {', '.join(f'{s} {ms:.3f} ms' for s, ms in profile['stages_ms'].items())}")
+    
+    # Term-at-a-time scores every posting of the query terms
+    term_ids = [engine.vectorizer.vocabulary[t] for t in set(engine.preprocessor.preprocess(query))]
+    assert profile['counters']['postings_scored'] == engine.vectorizer.doc_freq[term_ids].sum()
+    assert profile['counters']['docs_scored'] >= len(results)
+    assert profile['counters']['cache_misses'] == 1
+    print(f"  ✓ Counters: {profile['counters']}")
+    
+    assert engine.search(query, top_k=5) == results
+    assert profiles[-1]['counters'] == {'cache_hits': 1}
+    assert 'score' not in profiles[-1]['stages_ms']
+    print("  ✓ Cache hits skip scoring")
+    
+    engine.search(query, top_k=5, strategy='maxscore')
+    counters = profiles[-1]['counters']
+    assert counters['postings_scored'] <= counters['postings_total']
+    print("  ✓ Pruning counters are reported")
+    
+    engine.add_documents([{'title': 'New', 'content': query}])
+    engine.search(query, top_k=5)
+    assert profiles[-1]['stages_ms']['refresh'] > profiles[-2]['stages_ms']['refresh']
+    print("  ✓ Refreshing after an update is timed")
+    
+    print("✓ Profile hook tests passed!\n")
+
+
+def test_search_metrics():
+    """Metrics should accumulate single and batched searches."""
+    print("Testing accumulated metrics...")
+    
+    engine = sample_engine(collect_metrics=True, result_cache_size=0)
+    words = engine.documents[1]['content'].split()
+    queries = [f'{words[i]} {words[i + 1]}' for i in range(0, 20, 2)]
+    for query in queries:
+        engine.search(query, strategy='exhaustive')
+    summary = engine.metrics.summary()
+    assert summary['searches'] == summary['queries'] == len(queries)
+    assert summary['counters']['docs_scored'] == len(queries) * len(engine.documents)
+    assert list(summary['stages']) == [s for s in STAGES if s in summary['stages']]
+    assert abs(sum(s['share'] for s in summary['stages'].values()) - 1) < 1e-6
+    print(f"  ✓ {summary['searches']} searches, {summary['mean_ms']:.3f} ms each")
+    
+    engine.metrics.reset()
+    engine.search_many(queries)
+    summary = engine.metrics.summary()
+    assert summary['searches'] == 1 and summary['queries'] == len(queries)
+    assert summary['counters']['docs_scored'] == len(queries) * len(engine.documents)
+    print("  ✓ search_many is recorded as one batch")
+    
+    assert sample_engine().metrics is None
+    assert sample_engine()._start_profile('query') is NO_PROFILE
+    print("  ✓ Profiling is off by default")
+    
+    profile = QueryProfile('q')
+    profile.lap('score')
+    profile.lap('score')
+    metrics = SearchMetrics()
+    metrics.record(profile)
+    assert metrics.summary()['stages']['score']['calls'] == 1
+    print("  ✓ Repeated laps add up within a search")
+    
+    print("✓ Metrics tests passed!\n")
+
+
+def test_index_logging():
+    """Indexing should report progress through logging, not print."""
+    print("Testing indexing logs...")
+    
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('src.search')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        engine = sample_engine()
+        engine.search('the and of')
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+    messages = [record.getMessage() for record in records]
+    assert messages[0] == 'Indexing documents...'
+    assert any(message.startswith('Indexed 300 documents') for message in messages)
+    print(f"  ✓ {len(messages)} INFO records from src.search")
+    
+    assert records[-1].levelno == logging.WARNING and 'no tokens' in messages[-1]
+    print("  ✓ Queries without tokens logged as warnings")
+    
+    print("✓ Logging tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("SEARCH METRICS TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_profile_hook()
+    test_search_metrics()
+    test_index_logging()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Test passage indexing, aggregation and snippets.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from src.passages import PassageSearchEngine, split_passages
+from src.search import SearchEngine
+
+
+def long_documents():
+    """Documents long enough to span several passages."""
+    filler = 'The ship sailed on through calm water under grey skies. '
+    return [
+        {'title': 'Moby Dick', 'content': filler * 20 + 'The white whale rose beside the harpooner. ' + filler * 20},
+        {'title': 'Sea Log', 'content': (filler + 'A whale was sighted. ') * 15},
+        {'title': 'Harbour', 'content': 'Ships returned to the harbour with whale oil. ' * 3},
+        {'title': 'Numbers', 'content': '42 17 99'},
+    ]
+
+
+def test_split_passages():
+    """Passages should cover every word with the requested overlap."""
+    print("Testing passage splitting...")
+    
+    assert split_passages(0, 10, 3) == [(0, 0)]
+    assert split_passages(7, 10, 3) == [(0, 7)]
+    assert split_passages(25, 10, 3) == [(0, 10), (7, 17), (14, 24), (21, 25)]
+    for num_words in range(1, 60):
+        passages = split_passages(num_words, 10, 4)
+        assert passages[0][0] == 0 and passages[-1][1] == num_words
+        assert all(b[0] == a[0] + 6 for a, b in zip(passages, passages[1:]))
+    print("  ✓ Windows overlap and cover the document")
+    
+    try:
+        PassageSearchEngine(passage_words=10, overlap=10)
+        assert False, "Overlap as long as a passage should raise"
+    except ValueError:
+        print("  ✓ Invalid overlap rejected")
+    
+    print("✓ Splitting tests passed!\n")
+
+
+def test_aggregation():
+    """Document scores should aggregate the scores of their passages."""
+    print("Testing passage aggregation...")
+    
+    documents = long_documents()
+    for aggregation in ('max', 'sum'):
+        passages = PassageSearchEngine(passage_words=40, overlap=10, aggregation=aggregation)
+        passages.index_documents(documents)
+        
+        # Brute force: search the passages directly and group them by document
+        passage_scores = {}
+        for result in passages.engine.search('white whale', top_k=int(passages.passage_offsets[-1])):
+            doc_idx = np.searchsorted(passages.passage_offsets, result['doc_index'], side='right') - 1
+            passage_scores.setdefault(doc_idx, []).append(result['score'])
+        reduce = max if aggregation == 'max' else sum
+        expected = sorted(((reduce(s), d) for d, s in passage_scores.items()), reverse=True)
+        
+        for strategy in SearchEngine.STRATEGIES:
+            results = passages.search('white whale', top_k=10, strategy=strategy)
+            assert [r['doc_index'] for r in results] == [d for _, d in expected]
+            assert np.allclose([r['score'] for r in results], [s for s, _ in expected])
+            assert passages.search('white whale', top_k=1, strategy=strategy) == results[:1]
+        print(f"  ✓ {aggregation}: {[r['title'] for r in results]} with every strategy")
+    
+    plain = SearchEngine()
+    plain.index_documents(documents)
+    passages = PassageSearchEngine(passage_words=40, overlap=10)
+    passages.index_documents(documents)
+    assert plain.search('white whale', top_k=3)[-1]['title'] == 'Moby Dick'
+    assert passages.search('white whale', top_k=1)[0]['title'] == 'Moby Dick'
+    print("  ✓ A short matching passage outranks documents that only repeat one query word")
+    
+    assert passages.search('kraken') == []
+    print("  ✓ Unknown terms return no results")
+    
+    print("✓ Aggregation tests passed!\n")
+
+
+def test_snippets():
+    """Snippets should come from the best passage and highlight query words."""
+    print("Testing snippets...")
+    
+    passages = PassageSearchEngine(passage_words=40, overlap=10, snippet_chars=80, positional=True)
+    passages.index_documents(long_documents())
+    
+    result = passages.search('white whale harpooner', top_k=1)[0]
+    content = passages.documents[result['doc_index']]['content']
+    start, end = result['passage']
+    assert 'white whale rose beside the harpooner' in content[start:end]
+    assert '**white** **whale** rose beside the **harpooner**' in result['preview']
+    assert result['preview'].startswith('...') and result['preview'].endswith('...')
+    assert len(result['preview']) < 80 + 40
+    print(f"  ✓ {result['preview']}")
+    
+    result = passages.search('"whale oil"', top_k=3)
+    assert [r['title'] for r in result] == ['Harbour']
+    assert '**whale** **oil**' in result[0]['preview']
+    print(f"  ✓ Phrase query: {result[0]['preview']}")
+    
+    # Highlighted words are cut by the engine's tokenizer
+    documents = [{'title': 'Notes', 'content': "The well-known sailor's log. Sailors' logs don't lie."},
+                 {'title': 'Other', 'content': 'Nothing to see here.'}]
+    for tokenizer, query, highlighted in (('fast', 'well-known', '**well-known**'),
+                                          ('nltk', 'well-known', '**well-known**'),
+                                          ('nltk', 'sailor', "**sailor**'s")):
+        passages = PassageSearchEngine(passage_words=40, overlap=10, tokenizer=tokenizer)
+        passages.index_documents(documents)
+        assert highlighted in passages.search(query)[0]['preview'], (tokenizer, query)
+    print("  ✓ Hyphenated words and contractions highlighted as tokenized")
+    
+    print("✓ Snippet tests passed!\n")
+
+
+def test_save_and_load():
+    """A saved passage index should return identical results."""
+    print("Testing passage index persistence...")
+    
+    passages = PassageSearchEngine(passage_words=40, overlap=10, aggregation='sum')
+    passages.index_documents(long_documents())
+    queries = ['white whale', 'harbour ships', 'calm water whale']
+    expected = {query: passages.search(query, top_k=3) for query in queries}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        passages.save(os.path.join(tmp, 'index'))
+        loaded = PassageSearchEngine.load(os.path.join(tmp, 'index'))
+        assert loaded.aggregation == 'sum' and loaded.passage_words == 40
+        for query, results in expected.items():
+            assert loaded.search(query, top_k=3) == results
+    print("  ✓ Results and snippets match after save/load")
+    
+    print("✓ Persistence tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("PASSAGE SEARCH TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_split_passages()
+    test_aggregation()
+    test_snippets()
+    test_save_and_load()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
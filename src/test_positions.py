@@ -0,0 +1,230 @@
+"""
+Test the positional index and phrase / NEAR/k queries.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import logging
+import numpy as np
+from src.preprocessing import TextPreprocessor
+from src.positions import parse_query, has_query_operators
+from src.search import SearchEngine, BM25Model
+
+
+def sample_documents():
+    """Documents sharing words in different orders and distances."""
+    return [
+        {'title': 'Whale Hunt', 'content': 'The great white whale swam away. Sailors hunted the whale.'},
+        {'title': 'White Ships', 'content': 'White sails on the ships. A great whale was never seen.'},
+        {'title': 'Sea of Whales', 'content': 'The sea of whales was calm, and the white whale slept.'},
+        {'title': 'Captain', 'content': 'The captain watched the great sea. Whale oil filled the hold of the white ship.'},
+        {'title': 'Harbour', 'content': 'Ships returned to the harbour. The captain sold whale oil at the market.'},
+        {'title': 'Storm', 'content': 'A storm hit the ship. The captain of the ship shouted at the sea.'},
+    ]
+
+
+PHRASES = ['white whale', 'great white whale', 'whale oil', 'sea of whales', 'captain of the ship']
+NEARS = [('captain', 'sea', 3), ('whale', 'white', 1), ('ship', 'ship', 4), ('sailor', 'great', 2)]
+
+
+def occurrences(preprocessor, text):
+    """Positions of each term in a text."""
+    tokens, positions = preprocessor.preprocess_positions(text)
+    found = {}
+    for token, position in zip(tokens, positions):
+        found.setdefault(token, []).append(position)
+    return found
+
+
+def brute_force_phrase(preprocessor, documents, phrase):
+    """Titles of documents containing a phrase, by scanning every document."""
+    tokens, positions = preprocessor.preprocess_positions(phrase)
+    titles = set()
+    for doc in documents:
+        found = occurrences(preprocessor, doc['content'])
+        for start in found.get(tokens[0], []):
+            if all(start + p - positions[0] in found.get(t, []) for t, p in zip(tokens, positions)):
+                titles.add(doc['title'])
+    return titles
+
+
+def brute_force_near(preprocessor, documents, word_a, word_b, distance):
+    """Titles of documents where two words occur within a distance."""
+    term_a, term_b = preprocessor.preprocess(word_a)[0], preprocessor.preprocess(word_b)[0]
+    titles = set()
+    for doc in documents:
+        found = occurrences(preprocessor, doc['content'])
+        if any(0 < abs(a - b) <= distance or (term_a != term_b and a == b)
+               for a in found.get(term_a, []) for b in found.get(term_b, [])):
+            titles.add(doc['title'])
+    return titles
+
+
+def ranked(engine, query):
+    """(title, score) pairs of a query."""
+    return [(r['title'], r['score']) for r in engine.search(query, top_k=20)]
+
+
+def same_ranking(results, expected):
+    """Whether two (title, score) lists agree up to rounding."""
+    return ([title for title, _ in results] == [title for title, _ in expected]
+            and np.allclose([s for _, s in results], [s for _, s in expected]))
+
+
+def matched_titles(engine, query):
+    """Titles returned for a query."""
+    return {r['title'] for r in engine.search(query, top_k=20, strategy='exhaustive')}
+
+
+def test_parse_query():
+    """Quoted phrases and NEAR/k pairs should be split from the free text."""
+    print("Testing query parsing...")
+    
+    text, phrases, nears = parse_query('"white whale" captain NEAR/3 sea oil')
+    assert text == 'white whale captain sea oil'
+    assert phrases == ['white whale']
+    assert nears == [('captain', 'sea', 3)]
+    assert has_query_operators('"white whale"')
+    assert not has_query_operators('white whale')
+    assert not has_query_operators('NEAR/2 whale')
+    print("  ✓ Phrases, NEAR/k pairs and free text parsed")
+    
+    print("✓ Parsing tests passed!\n")
+
+
+def test_phrase_and_near_queries():
+    """Phrase and NEAR/k matches should equal a scan of every document."""
+    print("Testing phrase and NEAR/k queries...")
+    
+    documents = sample_documents()
+    preprocessor = TextPreprocessor()
+    for model in (None, BM25Model()):
+        engine = SearchEngine(model=model, positional=True)
+        engine.index_documents(documents)
+        
+        for phrase in PHRASES:
+            assert matched_titles(engine, f'"{phrase}"') == brute_force_phrase(preprocessor, documents, phrase), phrase
+        for word_a, word_b, distance in NEARS:
+            expected = brute_force_near(preprocessor, documents, word_a, word_b, distance)
+            assert matched_titles(engine, f'{word_a} NEAR/{distance} {word_b}') == expected, (word_a, word_b)
+        print(f"  ✓ {type(engine.model).__name__}: matches equal brute force")
+    
+    # Stopwords inside a phrase keep their distance
+    assert matched_titles(engine, '"sea of whales"') == {'Sea of Whales'}
+    assert matched_titles(engine, '"captain of the ship"') == {'Storm'}
+    print("  ✓ Removed stopwords still count towards phrase distances")
+    
+    # Matching documents are ranked by all query words
+    plain = {r['title']: r['score'] for r in engine.search('white whale', top_k=20, strategy='exhaustive')}
+    for result in engine.search('"white whale"', top_k=20):
+        assert abs(result['score'] - plain[result['title']]) < 1e-12
+    assert engine.last_query_stats['phrase_candidates'] >= engine.last_query_stats['phrase_matches']
+    print("  ✓ Phrase matches keep their free-text scores")
+    
+    assert engine.search('"white narwhal"') == []
+    print("  ✓ Unknown phrase terms match nothing")
+    
+    # Without positions the operators are ignored (with one warning) and the words ranked
+    plain_engine = SearchEngine(result_cache_size=0)
+    plain_engine.index_documents(documents)
+    records = []
+    handler = logging.Handler(logging.WARNING)
+    handler.emit = records.append
+    logging.getLogger('src.search').addHandler(handler)
+    try:
+        for query, text in (('say "white whale"', 'say white whale'), ('captain NEAR/3 ship', 'captain ship'),
+                            ('"" whale', 'whale')):
+            assert plain_engine.search(query) == plain_engine.search(text)
+            assert np.array_equal(plain_engine.score_all(query), plain_engine.score_all(text))
+    finally:
+        logging.getLogger('src.search').removeHandler(handler)
+    assert len(records) == 1 and 'positional' in records[0].getMessage()
+    assert plain_engine.search_many(['whale', '"white whale"']) == [plain_engine.search('whale'),
+                                                                    plain_engine.search('white whale')]
+    assert not has_query_operators('"" whale') and has_query_operators('"white whale"')
+    print("  ✓ Non-positional engines rank operator queries as free text")
+    
+    print("✓ Phrase query tests passed!\n")
+
+
+def test_chunked_positions():
+    """Positions counted in several chunks should equal a single chunk."""
+    print("Testing chunked position counting...")
+    
+    documents = sample_documents()
+    single = SearchEngine(positional=True)
+    single.index_documents(documents)
+    chunked = SearchEngine(positional=True)
+    chunked.index_documents(documents, batch_size=2)
+    
+    for name in ('entry_offsets', 'position_gaps'):
+        assert np.array_equal(getattr(single.segments[0].positions, name),
+                              getattr(chunked.segments[0].positions, name))
+    print("  ✓ Batched indexing builds the same positional index")
+    
+    print("✓ Chunked counting tests passed!\n")
+
+
+def test_positions_across_updates():
+    """Phrase queries should follow additions, deletions, merges and reloads."""
+    print("Testing positions across updates...")
+    
+    documents = sample_documents()
+    engine = SearchEngine(positional=True, max_segments=100)
+    engine.index_documents(documents[:3])
+    engine.add_documents(documents[3:5])
+    engine.add_documents(documents[5:] + [{'title': 'Narwhal', 'content': 'A white narwhal met the white whale.'}])
+    engine.delete_document(0)
+    
+    live = [engine.documents[i] for i in range(len(engine.documents)) if not engine.deleted[i]]
+    fresh = SearchEngine(positional=True)
+    fresh.index_documents(live)
+    queries = ['"white whale"', '"white narwhal"', 'captain NEAR/3 sea', '"whale oil" captain']
+    expected = {query: ranked(fresh, query) for query in queries}
+    
+    for query in queries:
+        assert matched_titles(engine, query) == matched_titles(fresh, query), query
+    print("  ✓ Segments with new terms and deletions match the same documents as a rebuild")
+    
+    engine.merge_segments()
+    assert len(engine.segments) == 1
+    for query in queries:
+        assert same_ranking(ranked(engine, query), expected[query]), query
+    print("  ✓ Merged segment keeps positions of live documents and ranks like a rebuild")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        engine.save(os.path.join(tmp, 'index'))
+        loaded = SearchEngine.load(os.path.join(tmp, 'index'))
+        assert loaded.positional
+        for query in queries:
+            assert same_ranking(ranked(loaded, query), expected[query]), query
+        batched = loaded.search_many(queries + ['white whale'], top_k=20)
+        assert batched[:-1] == [loaded.search(query, top_k=20) for query in queries]
+        assert batched[-1] == loaded.search('white whale', top_k=20)
+    print("  ✓ Saved and loaded index answers phrase queries (search and search_many)")
+    
+    print("✓ Update tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("POSITIONAL INDEX TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_parse_query()
+    test_phrase_and_near_queries()
+    test_chunked_positions()
+    test_positions_across_updates()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -4,16 +4,184 @@ Test preprocessing pipeline.
 
 import sys
 import os
-project_root = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from loader import DocumentLoader
-from preprocessing import TextPreprocessor
+import tempfile
+import subprocess
+from collections import Counter
+from src.loader import DocumentLoader
+from src.preprocessing import TextPreprocessor, StemCache
+from src.search import SearchEngine
+
+# Text exercising the cases where the tokenizers may disagree
+MIXED_TEXT = (
+    "It's the captain's ship -- a well-known whale-ship, they said; \"Don't go!\" she cried... "
+    "Visit http://example.com or www.whaling.org, or mail ahab@pequod.org. In 1851, 3 whales "
+    "(and 12 sailors) saw the U.S.A. flag; e-mail: ok? Yes! Naïve café owners co-operated. "
+    "The harpooner's lance_rope broke at 10:30am; Queequeg's coffin floated."
+)
+
+
+def test_parallel_matches_serial():
+    """Worker processes should return the same tokens, in order, as one process."""
+    print("Testing parallel preprocessing...")
+    
+    texts = [f"Document {i}: the whale and the captain sailed {'far ' * (i % 5)}across stormy seas."
+             for i in range(40)] + ["", "Running runners ran quickly."]
+    preprocessor = TextPreprocessor()
+    
+    serial = preprocessor.preprocess_documents(texts)
+    assert preprocessor.preprocess_documents(texts, num_workers=2, chunk_size=3) == serial
+    print("  ✓ Tokens match serial preprocessing, in input order")
+    
+    fresh = TextPreprocessor()
+    fresh.preprocess_documents(texts, num_workers=2, chunk_size=3)
+    assert dict(fresh.stem_cache.entries) == dict(preprocessor.stem_cache.entries)
+    assert fresh.stem_cache.hits + fresh.stem_cache.misses == sum(len(t) for t in serial)
+    print("  ✓ Stems computed by workers merged into the cache")
+    
+    documents = [{'title': str(i), 'content': text} for i, text in enumerate(texts)]
+    serial_engine, parallel_engine = SearchEngine(), SearchEngine(num_workers=2)
+    serial_engine.index_documents(documents)
+    parallel_engine.index_documents(documents)
+    assert parallel_engine.vectorizer.vocabulary == serial_engine.vectorizer.vocabulary
+    for query in ("whale captain", "stormy seas far", "runner"):
+        assert parallel_engine.search(query, top_k=5) == serial_engine.search(query, top_k=5)
+    print("  ✓ Parallel indexing gives identical results")
+    
+    print("✓ Parallel preprocessing tests passed!\n")
+
+
+def test_stem_cache():
+    """Cached stemming should match the stemmer and stay within its bounds."""
+    print("Testing stem cache...")
+    
+    text = "running runners ran quickly while the runner kept running and running"
+    uncached = TextPreprocessor(stem_cache_size=0)
+    cached = TextPreprocessor()
+    assert uncached.stem_cache is None
+    assert cached.preprocess(text) == uncached.preprocess(text)
+    stats = cached.stem_cache.stats()
+    assert stats['hits'] > 0
+    assert stats['hits'] + stats['misses'] == len(uncached.preprocess(text))
+    print(f"  ✓ Same stems as the stemmer (hit rate {stats['hit_rate']:.0%})")
+    
+    for policy in StemCache.POLICIES:
+        cache = StemCache(str.upper, max_size=2, policy=policy)
+        cache.stem_tokens(['a', 'b', 'a', 'c'])
+        assert len(cache) == 2
+        # LRU keeps the recently used 'a'; FIFO evicts it as the oldest entry
+        assert ('a' in cache.entries) == (policy == 'lru')
+        assert (cache.hits, cache.misses) == (1, 3)
+    print("  ✓ Size bound and eviction policies respected")
+    
+    engine = SearchEngine()
+    assert isinstance(engine.preprocessor, TextPreprocessor)
+    assert isinstance(engine.preprocessor.stem_cache, StemCache)
+    print("  ✓ The engine uses the tested preprocessor and cache classes")
+    
+    print("✓ Stem cache tests passed!\n")
+
+
+def test_fast_tokenizer():
+    """The single-pass tokenizer should match NLTK except at documented cases."""
+    print("Testing fast tokenizer...")
+    
+    nltk_preprocessor, fast = TextPreprocessor(), TextPreprocessor(tokenizer='fast')
+    expected, tokens = nltk_preprocessor.preprocess(MIXED_TEXT), fast.preprocess(MIXED_TEXT)
+    only_nltk = Counter(expected) - Counter(tokens)
+    only_fast = Counter(tokens) - Counter(expected)
+    print(f"    Only NLTK: {dict(only_nltk)}")
+    print(f"    Only fast: {dict(only_fast)}")
+    # NLTK keeps Treebank tokens such as "n't", "..." and "u.s.a" and words
+    # joined by underscores; the fast tokenizer splits them at punctuation
+    assert set(only_nltk) == {"n't", '...', 'u.s.a', 'lance_rop'}
+    assert set(only_fast) == {'lanc', 'rope'}
+    print("  ✓ Token streams differ only at contractions, abbreviations and underscores")
+    
+    for preprocessor in (nltk_preprocessor, fast):
+        assert list(preprocessor.iter_tokens(MIXED_TEXT)) == preprocessor.preprocess(MIXED_TEXT)
+    print("  ✓ Lazy token streams match preprocess()")
+    
+    text = "The white whale, the great white whale! Ahab hunted it."
+    assert fast.preprocess_positions(text) == nltk_preprocessor.preprocess_positions(text)
+    print("  ✓ Same positions on plain prose")
+    
+    for preprocessor in (nltk_preprocessor, fast):
+        words, spans = preprocessor.word_spans(MIXED_TEXT)
+        assert preprocessor.filter_words(words)[0] == preprocessor.preprocess(MIXED_TEXT)
+        assert all(MIXED_TEXT[start:end].lower() == word for word, (start, end) in zip(words, spans)
+                   if word.isalpha())
+    print("  ✓ Word spans cover the words preprocess() keeps")
+    
+    try:
+        TextPreprocessor(tokenizer='spacy')
+        assert False, "Unknown tokenizer should raise"
+    except ValueError:
+        print("  ✓ Unknown tokenizer rejected")
+    
+    documents = [{'title': str(i), 'content': text} for i, text in enumerate(MIXED_TEXT.split('. '))]
+    engine = SearchEngine(tokenizer='fast', num_workers=2)
+    engine.index_documents(documents)
+    expected = engine.search("whale ship captain", top_k=3)
+    assert expected
+    with tempfile.TemporaryDirectory() as tmp:
+        engine.save(os.path.join(tmp, 'index'))
+        loaded = SearchEngine.load(os.path.join(tmp, 'index'))
+        assert loaded.preprocessor.tokenizer == 'fast'
+        assert loaded.search("whale ship captain", top_k=3) == expected
+    print("  ✓ Engines index, search and reload with the fast tokenizer")
+    
+    print("✓ Fast tokenizer tests passed!\n")
+
+
+def test_lazy_nltk():
+    """Importing preprocessing should not load NLTK until it is needed."""
+    print("Testing lazy NLTK import...")
+    
+    code = ("import sys; from src.preprocessing import TextPreprocessor; "
+            "p = TextPreprocessor(tokenizer='fast', use_stemming=False); p.preprocess('Whales swim'); "
+            "print('nltk' in sys.modules)")
+    loaded = subprocess.run([sys.executable, '-c', code], cwd=project_root,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == 'False', loaded
+    print("  ✓ NLTK is not imported by the fast tokenizer without stemming")
+    
+    code = ("import nltk; nltk.data.path[:] = []; nltk.download = None; "
+            "from src.preprocessing import load_word_tokenize\n"
+            "try: load_word_tokenize()\nexcept LookupError as e: print('punkt_tab' in str(e))")
+    raised = subprocess.run([sys.executable, '-c', code], cwd=project_root,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    assert raised == 'True', raised
+    print("  ✓ A missing Punkt model raises instead of being downloaded")
+    
+    from nltk.corpus import stopwords
+    assert TextPreprocessor(remove_stopwords=False).stop_words == set()
+    try:
+        assert TextPreprocessor().stop_words == set(stopwords.words('english'))
+        print("  ✓ Bundled stopwords match the NLTK corpus")
+    except LookupError:
+        print("  - NLTK stopwords corpus not installed; comparison skipped")
+    
+    preprocessor = TextPreprocessor()
+    assert preprocessor._stemmer is None
+    assert preprocessor.preprocess('The whales were hunting') == ['whale', 'hunt']
+    assert preprocessor._stemmer is not None
+    assert TextPreprocessor(use_stemming=False).stemmer is None
+    print("  ✓ Stemmer is created on first use")
+    
+    print("✓ Lazy import tests passed!\n")
 
 
 def main():
+    test_stem_cache()
+    test_fast_tokenizer()
+    test_lazy_nltk()
+    test_parallel_matches_serial()
+    
     # Load documents
-    loader = DocumentLoader('data/raw_texts')
+    loader = DocumentLoader(os.path.join(project_root, 'data', 'raw_texts'))
     documents = loader.load_documents()
     
     print(f"Loaded {len(documents)} documents")
@@ -0,0 +1,77 @@
+"""
+Test dynamic pruning strategies.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+from src.pruning import wand_top_k, maxscore_top_k
+from src.search import select_top_k
+from src.corpora import random_index
+
+
+def test_pruning_matches_exhaustive():
+    """Pruned top-k must equal exhaustive top-k for any block size and k."""
+    print("Testing pruning strategies...")
+    
+    rng = np.random.default_rng(0)
+    index, impact = random_index()
+    
+    for block_size in (1, 4, 64):
+        index.compute_upper_bounds(impact, block_size=block_size)
+        for _ in range(30):
+            term_ids = np.sort(rng.choice(index.vocab_size, size=int(rng.integers(1, 6)), replace=False))
+            weights = rng.random(len(term_ids)) + 0.1
+            k = int(rng.choice([1, 3, 10, 1000]))
+            
+            doc_ids, scores = index.score_term_at_a_time(term_ids, weights, impact)
+            expected = [(int(doc_ids[i]), scores[i]) for i in select_top_k(scores, k) if scores[i] > 0]
+            
+            assert wand_top_k(index, term_ids, weights, impact, k, use_block_max=False) == expected
+            assert wand_top_k(index, term_ids, weights, impact, k, use_block_max=True) == expected
+            assert maxscore_top_k(index, term_ids, weights, impact, k) == expected
+        print(f"  ✓ Block size {block_size}: WAND, BMW and MaxScore exact")
+    
+    print("✓ Pruning tests passed!\n")
+
+
+def test_pruning_skips_postings():
+    """Small k over long lists should leave most postings unscored."""
+    print("Testing skipped postings...")
+    
+    index, impact = random_index(num_docs=3000, vocab_size=20, seed=1)
+    index.compute_upper_bounds(impact, block_size=16)
+    term_ids = np.array([0, 1, 2])
+    weights = np.array([1.0, 0.5, 0.25])
+    
+    for name, run in (('wand', lambda s: wand_top_k(index, term_ids, weights, impact, 5, False, s)),
+                      ('bmw', lambda s: wand_top_k(index, term_ids, weights, impact, 5, True, s)),
+                      ('maxscore', lambda s: maxscore_top_k(index, term_ids, weights, impact, 5, s))):
+        stats = {}
+        run(stats)
+        assert stats['postings_total'] == sum(index.doc_freq(t) for t in term_ids)
+        assert stats['postings_scored'] < stats['postings_total']
+        print(f"  ✓ {name}: scored {stats['postings_scored']} of {stats['postings_total']} postings")
+    
+    print("✓ Skipping tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("DYNAMIC PRUNING TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_pruning_matches_exhaustive()
+    test_pruning_skips_postings()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
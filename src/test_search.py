@@ -4,12 +4,16 @@ Test search engine functionality.
 
 import sys
 import os
-project_root = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
+import time
 import numpy as np
 from src.loader import DocumentLoader
-from src.search import SearchEngine
+from src.search import (SearchEngine, ScoringModel, BM25Model, BM25PlusModel, ResultCache,
+                        select_top_k, select_top_k_rows, VECTOR_DTYPES)
+from src.evaluation import SearchEvaluator
+from src.corpora import sample_documents
 
 
 def test_cosine_similarity():
@@ -42,12 +46,276 @@ def test_cosine_similarity():
     print("✓ Cosine similarity tests passed!\n")
 
 
+def test_select_top_k():
+    """Test partial top-k selection and tie-breaking."""
+    print("Testing top-k selection...")
+    
+    scores = np.array([0.2, 0.9, 0.5, 0.9, 0.0, 0.5, 0.7])
+    
+    # Ties resolve to the lower index, like a stable descending sort
+    expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    for k in range(len(scores) + 2):
+        assert list(select_top_k(scores, k)) == expected[:k], f"Mismatch for k={k}"
+    print("  ✓ Matches stable sort for every k")
+    
+    assert len(select_top_k(np.array([]), 3)) == 0
+    print("  ✓ Empty scores")
+    
+    # Row-wise selection keeps each row's positive top-k, with the same ties
+    matrix = np.array([scores, scores[::-1], np.zeros(len(scores))])
+    for k in range(len(scores) + 2):
+        rows = select_top_k_rows(matrix, k)
+        for row, selected in zip(matrix, rows):
+            assert list(selected) == [i for i in select_top_k(row, k) if row[i] > 0]
+    print("  ✓ Row-wise selection matches per-row selection")
+    
+    print("✓ Top-k selection tests passed!\n")
+
+
+def test_vectorized_scores_match_cosine():
+    """Batch scoring should equal per-document cosine similarity."""
+    print("Testing vectorized scoring...")
+    
+    engine = SearchEngine()
+    engine.index_documents(sample_documents(with_empty=True))
+    
+    query = "whale ocean sea"
+    query_vector = engine.vectorizer.transform(engine.preprocessor.preprocess(query))
+    tfidf = engine.vectorizer.transform_documents(
+        engine.preprocessor.preprocess_documents([d['content'] for d in engine.documents])
+    )
+    expected = [
+        engine.cosine_similarity(query_vector, tfidf[i].toarray().ravel())
+        for i in range(tfidf.shape[0])
+    ]
+    
+    results = engine.search(query, top_k=10)
+    ranking = sorted((i for i in range(len(expected)) if expected[i] > 0), key=lambda i: -expected[i])
+    assert [r['doc_index'] for r in results] == ranking[:10] and ranking[:2] == [0, 3]
+    for result in results:
+        assert abs(result['score'] - expected[result['doc_index']]) < 1e-12
+    print("  ✓ Scores and ranking match cosine similarity")
+    
+    print("✓ Vectorized scoring tests passed!\n")
+
+
+def test_bm25_model():
+    """BM25 scores should follow the textbook formula and agree across strategies."""
+    print("Testing BM25 ranking...")
+    
+    model = BM25Model(k1=1.5, b=0.6)
+    engine = SearchEngine(model=model)
+    engine.index_documents(sample_documents(with_empty=True))
+    
+    # Recompute the score of the top hit by hand
+    query = "whale sea"
+    results = engine.search(query, top_k=5)
+    assert results, "BM25 should find matching documents"
+    
+    tokens = engine.preprocessor.preprocess(engine.documents[results[0]['doc_index']]['content'])
+    avg_length = engine.doc_lengths.mean()
+    num_docs = len(engine.documents)
+    expected = 0.0
+    for term in sorted(set(engine.preprocessor.preprocess(query))):
+        tf = tokens.count(term)
+        df = sum(term in set(engine.preprocessor.preprocess(d['content'])) for d in engine.documents)
+        idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+        expected += idf * tf * 2.5 / (tf + 1.5 * (1 - 0.6 + 0.6 * len(tokens) / avg_length))
+    assert abs(results[0]['score'] - expected) < 1e-9
+    print("  ✓ Score matches BM25 formula")
+    
+    for strategy in engine.STRATEGIES:
+        assert engine.search(query, top_k=5, strategy=strategy) == results
+    print("  ✓ All strategies agree")
+    
+    # BM25+ only adds a positive floor per matched term
+    plus = SearchEngine(model=BM25PlusModel(k1=1.5, b=0.6, delta=1.0))
+    plus.index_documents(sample_documents(with_empty=True))
+    plus_scores = {r['doc_index']: r['score'] for r in plus.search(query, top_k=5)}
+    for result in results:
+        assert plus_scores[result['doc_index']] > result['score']
+    print("  ✓ BM25+ scores exceed BM25")
+    
+    try:
+        BM25Model(b=1.5)
+        assert False, "Invalid b should raise"
+    except ValueError:
+        print("  ✓ Invalid parameters rejected")
+    
+    class PartialModel(ScoringModel):
+        def query_weights(self, vectorizer, query_tokens):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+    try:
+        PartialModel()
+        assert False, "A model without document impacts should not instantiate"
+    except TypeError:
+        print("  ✓ Models must implement every abstract method")
+    
+    print("✓ BM25 tests passed!\n")
+
+
+def test_quantized_impacts():
+    """Quantized impact postings should approximate exact scores."""
+    print("Testing quantized impacts...")
+    
+    exact = SearchEngine(model=BM25Model())
+    exact.index_documents(sample_documents(with_empty=True))
+    
+    for bits in (8, 16):
+        engine = SearchEngine(model=BM25Model(), quantize_bits=bits)
+        engine.index_documents(sample_documents(with_empty=True))
+        assert engine.impact_index.term_freqs.dtype == (np.uint8 if bits == 8 else np.uint16)
+        
+        expected = exact.search("blood night sea", top_k=5)
+        results = engine.search("blood night sea", top_k=5)
+        assert [r['doc_index'] for r in results] == [r['doc_index'] for r in expected]
+        # Each of the 3 query terms is off by at most half a quantization step
+        tolerance = 3 * engine.impact_index.impact_scales.max() / 2
+        for result, reference in zip(results, expected):
+            assert abs(result['score'] - reference['score']) <= tolerance
+        print(f"  ✓ {bits}-bit impacts preserve ranking")
+    
+    print("✓ Quantized impact tests passed!\n")
+
+
+def test_vector_dtypes():
+    """Narrow document matrices should shrink and approximate float64 scores."""
+    print("Testing document vector dtypes...")
+    
+    queries = ["blood night sea", "whale ocean", "detective crime captain", "ships sea waves"]
+    exact = SearchEngine(strategy='exhaustive', result_cache_size=0)
+    exact.index_documents(sample_documents(with_empty=True))
+    expected = [exact.search(query, top_k=3) for query in queries]
+    evaluator = SearchEvaluator()
+    
+    for dtype in VECTOR_DTYPES[1:]:
+        engine = SearchEngine(strategy='exhaustive', result_cache_size=0, vector_dtype=dtype)
+        engine.index_documents(sample_documents(with_empty=True))
+        assert engine.doc_vectors.dtype == np.dtype(dtype)
+        assert engine.doc_vectors.data.nbytes * 8 == exact.doc_vectors.data.nbytes * np.dtype(dtype).itemsize
+        
+        results = [engine.search(query, top_k=3) for query in queries]
+        assert engine.search_many(queries, top_k=3) == results
+        for query, found, reference in zip(queries, results, expected):
+            relevant = {r['doc_index'] for r in reference}
+            assert evaluator.recall_at_k(relevant, [r['doc_index'] for r in found], 3) == 1.0
+            # Each query term is off by at most half its quantization step
+            tolerance = 1e-6
+            if engine.vector_scales is not None:
+                tolerance += 3 * engine.vector_scales.max() / 2
+            for result, ref in zip(found, reference):
+                assert abs(result['score'] - ref['score']) <= tolerance
+        print(f"  ✓ {dtype}: same top-3, scores within the quantization bound")
+    
+    try:
+        SearchEngine(vector_dtype='int4')
+        assert False, "Unknown dtype should raise"
+    except ValueError:
+        print("  ✓ Unknown dtype rejected")
+    
+    print("✓ Vector dtype tests passed!\n")
+
+
+def test_stored_impact_parity():
+    """Every storage type should score alike in search() and search_many()."""
+    print("Testing stored impact parity...")
+    
+    queries = ["blood night sea", "whale ocean", "detective crime captain", "ships sea waves", "night"]
+    for dtype in VECTOR_DTYPES:
+        for bits in (None, 8, 16):
+            engine = SearchEngine(model=BM25Model(), vector_dtype=dtype, quantize_bits=bits,
+                                  result_cache_size=0)
+            engine.index_documents(sample_documents(with_empty=True)[:3])
+            engine.add_documents(sample_documents(with_empty=True)[3:])
+            batched = engine.search_many(queries, top_k=3)
+            for strategy in SearchEngine.STRATEGIES:
+                assert batched == [engine.search(q, top_k=3, strategy=strategy) for q in queries], \
+                    (dtype, bits, strategy)
+    print(f"  ✓ {len(VECTOR_DTYPES)} dtypes x 3 quantizations: identical for every strategy")
+    
+    print("✓ Stored impact parity tests passed!\n")
+
+
+def test_search_many():
+    """Batched search should return exactly what one search per query returns."""
+    print("Testing batched multi-query search...")
+    
+    queries = ["whale ocean", "blood night sea", "", "the and", "whale ocean",
+               "detective crime captain", "unknownword", "ships sea waves"]
+    for model in (None, BM25Model()):
+        engine = SearchEngine(model=model, result_cache_size=0)
+        engine.index_documents(sample_documents(with_empty=True))
+        engine.add_documents([{'title': 'Harbour', 'content': 'Ships returned to the harbour with whale oil.'}])
+        engine.delete_document(1)
+        
+        for chunk_size in (None, 1, 3):
+            results = engine.search_many(queries, top_k=3, chunk_size=chunk_size)
+            for strategy in SearchEngine.STRATEGIES:
+                assert results == [engine.search(q, top_k=3, strategy=strategy) for q in queries]
+        print(f"  ✓ {type(engine.model).__name__}: identical to per-query search for every strategy")
+    
+    assert engine.search_many([], top_k=3) == []
+    print("  ✓ Empty batch")
+    
+    # A small batch must not start a process pool
+    engine.num_workers = 4
+    engine.preprocessor._map_chunks = None
+    assert engine.search_many(queries, top_k=3) == [engine.search(q, top_k=3) for q in queries]
+    print("  ✓ Small batch preprocessed in-process")
+    
+    print("✓ Batched search tests passed!\n")
+
+
+def test_result_cache():
+    """Repeated queries should be served from the cache until the index changes."""
+    print("Testing result cache...")
+    
+    engine = SearchEngine(model=BM25Model(), result_cache_size=2)
+    engine.index_documents(sample_documents(with_empty=True))
+    uncached = SearchEngine(model=BM25Model(), result_cache_size=0)
+    uncached.index_documents(sample_documents(with_empty=True))
+    
+    first = engine.search("whale ocean", top_k=3)
+    first[0]['title'] = 'changed'
+    assert engine.search("Ocean whales!", top_k=3) == uncached.search("whale ocean", top_k=3)
+    assert engine.search("whale ocean", top_k=2) == uncached.search("whale ocean", top_k=2)
+    stats = engine.result_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 2)
+    print("  ✓ Hits keyed on normalized tokens and top_k; results copied")
+    
+    engine.search("blood night", top_k=3)
+    engine.search("whale ocean", top_k=3)
+    assert engine.result_cache.stats()['misses'] == 4
+    print("  ✓ Least recently used entry evicted")
+    
+    for index in (engine, uncached):
+        index.add_documents([{'title': 'Harbour', 'content': 'Whale oil was sold in the harbour by the ocean.'}])
+    assert engine.search("whale ocean", top_k=3) == uncached.search("whale ocean", top_k=3)
+    assert engine.search_many(["ocean whale"], top_k=3) == [uncached.search("whale ocean", top_k=3)]
+    assert engine.result_cache.stats()['invalidations'] == 1
+    print("  ✓ Invalidated when the index changes")
+    
+    cache = ResultCache(max_size=4, ttl=0.05)
+    cache.put(('whale',), [{'title': 'Whales'}], generation=0)
+    assert cache.get(('whale',), generation=0) == [{'title': 'Whales'}]
+    time.sleep(0.06)
+    assert cache.get(('whale',), generation=0) is None
+    cache.put(('whale',), [], generation=0)
+    assert cache.get(('whale',), generation=1) is None and len(cache) == 0
+    cache.put(('whale',), [], generation=0)
+    assert len(cache) == 0
+    assert cache.stats()['expirations'] == 1
+    print("  ✓ Entries expire after the TTL; older generations are not stored")
+    
+    print(f"✓ Result cache tests passed! (hit rate {engine.result_cache.stats()['hit_rate']:.0%})\n")
+
+
 def test_search_engine():
     """Test full search engine."""
     print("Testing search engine...")
     
     # Load documents
-    loader = DocumentLoader('data/raw_texts')
+    loader = DocumentLoader(os.path.join(project_root, 'data', 'raw_texts'))
     documents = loader.load_documents()
     
     # Index documents
@@ -85,7 +353,7 @@ def test_edge_cases():
     """Test edge cases."""
     print("Testing edge cases...")
     
-    loader = DocumentLoader('data/raw_texts')
+    loader = DocumentLoader(os.path.join(project_root, 'data', 'raw_texts'))
     documents = loader.load_documents()
     
     engine = SearchEngine()
@@ -122,6 +390,14 @@ def main():
     print()
     
     test_cosine_similarity()
+    test_select_top_k()
+    test_vectorized_scores_match_cosine()
+    test_bm25_model()
+    test_quantized_impacts()
+    test_vector_dtypes()
+    test_stored_impact_parity()
+    test_search_many()
+    test_result_cache()
     test_search_engine()
     test_edge_cases()
     
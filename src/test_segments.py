@@ -0,0 +1,141 @@
+"""
+Test incremental indexing with segments and tombstones.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from src.search import SearchEngine, BM25Model
+from src.corpora import sample_documents, SAMPLE_QUERIES
+
+
+def ranked(engine, query, strategy):
+    """(title, score) pairs of a query."""
+    return [(r['title'], r['score']) for r in engine.search(query, top_k=10, strategy=strategy)]
+
+
+def test_incremental_matches_rebuild():
+    """Adding, deleting and updating documents should rank like a fresh index once merged."""
+    print("Testing incremental updates...")
+    
+    documents = sample_documents()
+    for model in (None, BM25Model()):
+        engine = SearchEngine(model=model)
+        engine.index_documents(documents[:4])
+        first_vectors = engine.doc_vectors
+        
+        new_ids = engine.add_documents(documents[4:6])
+        assert new_ids == [4, 5]
+        engine.add_documents(documents[6:])
+        engine.delete_document(1)
+        new_id = engine.update_document(2, {'title': 'Vampires', 'content': 'The vampire slept in the castle by day.'})
+        assert new_id == 8
+        assert len(engine.segments) == 4
+        print("  ✓ Documents added as new segments")
+        
+        for query in SAMPLE_QUERIES:
+            expected = ranked(engine, query, 'exhaustive')
+            assert 'Detectives' not in [title for title, _ in expected]
+            for strategy in SearchEngine.STRATEGIES:
+                assert ranked(engine, query, strategy) == expected, (query, strategy)
+        assert engine.doc_vectors is first_vectors
+        print("  ✓ All strategies agree; earlier segments were not re-weighted")
+        
+        live = [engine.documents[i] for i in range(len(engine.documents)) if not engine.deleted[i]]
+        fresh = SearchEngine(model=type(engine.model)())
+        fresh.index_documents(live)
+        engine.merge_segments()
+        
+        for query in SAMPLE_QUERIES:
+            expected = ranked(engine, query, 'exhaustive')
+            for strategy in SearchEngine.STRATEGIES:
+                assert ranked(engine, query, strategy) == expected, (query, strategy)
+            
+            rebuilt = ranked(fresh, query, 'exhaustive')
+            assert [title for title, _ in rebuilt] == [title for title, _ in expected]
+            assert np.allclose([s for _, s in rebuilt], [s for _, s in expected])
+        print(f"  ✓ {type(engine.model).__name__}: merged index matches a rebuilt index")
+        
+        try:
+            engine.delete_document(1)
+            assert False, "Deleting twice should raise"
+        except ValueError:
+            pass
+    
+    print("✓ Incremental update tests passed!\n")
+
+
+def test_background_merge():
+    """Segments should be merged in the background and re-weighted like a fresh index."""
+    print("Testing segment merging...")
+    
+    documents = sample_documents()
+    engine = SearchEngine(strategy='bmw', max_segments=2)
+    engine.index_documents(documents[:2])
+    for i in range(2, len(documents), 2):
+        engine.add_documents(documents[i:i + 2])
+    engine.delete_document(0)
+    
+    engine.wait_for_merge()
+    engine.merge_segments()
+    assert len(engine.segments) == 1
+    assert engine.index.doc_freq(engine.vectorizer.vocabulary['whale']) == 1
+    print("  ✓ Segments merged and deleted postings purged")
+    
+    fresh = SearchEngine(strategy='bmw')
+    fresh.index_documents(documents[1:])
+    for query in SAMPLE_QUERIES:
+        merged, rebuilt = ranked(engine, query, 'bmw'), ranked(fresh, query, 'bmw')
+        assert [title for title, _ in merged] == [title for title, _ in rebuilt]
+        assert np.allclose([s for _, s in merged], [s for _, s in rebuilt])
+    print("  ✓ Merged segment scores like a rebuilt index")
+    
+    print("✓ Merge tests passed!\n")
+
+
+def test_updates_after_reload():
+    """A saved index should accept updates after it is loaded again."""
+    print("Testing updates on a loaded index...")
+    
+    documents = sample_documents()
+    engine = SearchEngine(model=BM25Model())
+    engine.index_documents(documents[:5])
+    engine.delete_document(3)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index')
+        engine.save(path)
+        loaded = SearchEngine.load(path)
+        assert ranked(loaded, "night ocean", 'taat') == ranked(engine, "night ocean", 'taat')
+        
+        for index in (engine, loaded):
+            index.add_documents(documents[5:])
+            index.delete_document(0)
+        for query in SAMPLE_QUERIES:
+            assert ranked(loaded, query, 'maxscore') == ranked(engine, query, 'maxscore')
+        print("  ✓ Loaded index updated like the original")
+    
+    print("✓ Reload tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("INCREMENTAL INDEXING TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_incremental_matches_rebuild()
+    test_background_merge()
+    test_updates_after_reload()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
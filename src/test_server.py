@@ -0,0 +1,138 @@
+"""
+Test the asyncio search service.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import asyncio
+from src.search import SearchEngine, BM25Model
+from src.server import SearchServer, fetch_json, MAX_TOP_K
+from src.corpora import sample_documents, SAMPLE_QUERIES
+
+
+async def query_concurrently(server, targets):
+    """Send each request on its own connection, all at once."""
+    async def fetch(target):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        try:
+            return await fetch_json(reader, writer, target)
+        finally:
+            writer.close()
+    return await asyncio.gather(*(fetch(target) for target in targets))
+
+
+def test_batched_service():
+    """Concurrent requests should be batched and answered like SearchEngine.search."""
+    print("Testing search service...")
+    
+    engine = SearchEngine(model=BM25Model())
+    engine.index_documents(sample_documents())
+    engine.delete_document(0)
+    
+    async def run():
+        server = SearchServer(engine, port=0, max_wait=0.05)
+        await server.start()
+        try:
+            targets = [f"/search?q={query.replace(' ', '+')}&k={k}" for query in SAMPLE_QUERIES for k in (1, 3)]
+            responses = await query_concurrently(server, targets)
+            errors = await query_concurrently(server, ['/search?k=3', '/search?q=whale&k=x', '/missing',
+                                                       f'/search?q=whale&k={MAX_TOP_K + 1}'])
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            stats = [await fetch_json(reader, writer, '/stats') for _ in range(2)]
+            writer.close()
+        finally:
+            await server.stop()
+        return targets, responses, errors, stats
+    
+    targets, responses, errors, stats = asyncio.run(run())
+    
+    for (status, payload), (query, k) in zip(responses, [(q, k) for q in SAMPLE_QUERIES for k in (1, 3)]):
+        assert status == 200
+        expected = engine.search(query, top_k=k)
+        assert payload['results'] == expected, (query, k)
+    print("  ✓ Results match SearchEngine.search")
+    
+    assert [status for status, _ in errors] == [400, 400, 404, 400]
+    print("  ✓ Bad requests rejected")
+    
+    status, summary = stats[1]
+    assert status == 200 and summary['requests'] == len(targets)
+    assert summary['batches'] < len(targets) and summary['mean_batch_size'] > 1
+    assert 0 < summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms']
+    print(f"  ✓ {len(targets)} queries scored in {summary['batches']} batches over a keep-alive connection")
+    
+    print("✓ Search service tests passed!\n")
+
+
+class FailingEngine(SearchEngine):
+    """Engine that rejects queries containing 'poison'."""
+    
+    def search(self, query, top_k=5, *args, **kwargs):
+        if 'poison' in query:
+            raise ValueError("poisoned query")
+        return super().search(query, top_k, *args, **kwargs)
+    
+    def search_many(self, queries, top_k=5, *args, **kwargs):
+        if any('poison' in query for query in queries):
+            raise ValueError("poisoned query")
+        return super().search_many(queries, top_k, *args, **kwargs)
+
+
+def test_failing_query_isolated():
+    """A query that fails should not fail the queries batched with it."""
+    print("Testing failure isolation...")
+    
+    engine = FailingEngine()
+    engine.index_documents(sample_documents())
+    
+    async def run():
+        server = SearchServer(engine, port=0, max_wait=0.05)
+        await server.start()
+        try:
+            targets = ['/search?q=whale&k=2', '/search?q=poison+whale', '/search?q=sea+night&k=3']
+            responses = await query_concurrently(server, targets)
+            bad_requests = []
+            for request in (b"GET /search?q=whale HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+                            b"GET /search?q=whale HTTP/1.1\r\nContent-Length: 1000000000\r\n\r\n",
+                            b"GET /search?q=" + b"w" * 100000 + b" HTTP/1.1\r\n\r\n"):
+                reader, writer = await asyncio.open_connection(server.host, server.port)
+                writer.write(request)
+                bad_requests.append((await reader.read()).split(b' ', 2)[1])
+                writer.close()
+        finally:
+            await server.stop()
+        return responses, bad_requests, server.batcher.stats.batches
+    
+    responses, bad_requests, batches = asyncio.run(run())
+    assert batches == 1
+    assert [status for status, _ in responses] == [200, 400, 200]
+    assert responses[0][1]['results'] == engine.search('whale', top_k=2)
+    assert responses[2][1]['results'] == engine.search('sea night', top_k=3)
+    assert responses[1][1]['error'] == 'poisoned query'
+    print("  ✓ Only the failing query of a batch is rejected")
+    
+    assert bad_requests == [b'400', b'413', b'400']
+    print("  ✓ Invalid Content-Length, oversized bodies and overlong lines rejected")
+    
+    print("✓ Failure isolation tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("SEARCH SERVICE TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_batched_service()
+    test_failing_query_isolated()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
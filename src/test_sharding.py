@@ -0,0 +1,129 @@
+"""
+Test sharded scatter-gather search against an unsharded engine.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tempfile
+import numpy as np
+from src.sharding import ShardedSearchEngine
+from src.search import SearchEngine, BM25Model
+from src.corpora import synthetic_documents
+
+
+def sample_corpus():
+    """Synthetic documents and random queries over their common words."""
+    documents, words, _ = synthetic_documents(600, vocab_size=1500)
+    rng = np.random.default_rng(1)
+    queries = [' '.join(rng.choice(words[:300], 3)) for _ in range(15)]
+    return documents, queries
+
+
+def test_sharded_parity():
+    """Every strategy should return the unsharded results, scores included."""
+    print("Testing sharded search parity...")
+    
+    documents, queries = sample_corpus()
+    for model in (None, BM25Model(k1=1.5, b=0.6)):
+        name = type(model).__name__ if model is not None else 'TFIDFCosineModel'
+        plain = SearchEngine(model=model, result_cache_size=0)
+        plain.index_documents(documents)
+        
+        with ShardedSearchEngine(num_shards=3, model=model) as sharded:
+            sharded.index_documents(documents)
+            assert sharded.num_documents == len(documents)
+            for strategy in SearchEngine.STRATEGIES:
+                for query in queries:
+                    expected = plain.search(query, top_k=10, strategy=strategy)
+                    assert sharded.search(query, top_k=10, strategy=strategy) == expected, (strategy, query)
+            print(f"  ✓ {name}: all strategies match across 3 shards")
+            
+            expected = [plain.search(query, top_k=5) for query in queries]
+            assert sharded.search_many(queries + ['the of'], top_k=5) == expected + [[]]
+            print(f"  ✓ {name}: search_many matches in one round trip")
+    
+    plain = SearchEngine(result_cache_size=0)
+    plain.index_documents(documents)
+    with ShardedSearchEngine(num_shards=3) as sharded:
+        try:
+            sharded.index_documents(iter(documents))
+            assert False, "A stream without shard_size should raise"
+        except ValueError:
+            pass
+        sharded.index_documents(iter(documents), batch_size=50, shard_size=250)
+        assert list(sharded.doc_offsets) == [0, 250, 500, 600]
+        assert [sharded.search(query) for query in queries] == [plain.search(query) for query in queries]
+    print("  ✓ Streamed documents fill shards of shard_size")
+    
+    print("✓ Parity tests passed!\n")
+
+
+def test_sharded_phrases():
+    """Phrase constraints should be checked by every shard."""
+    print("Testing sharded phrase queries...")
+    
+    documents, _ = sample_corpus()
+    words = documents[0]['content'].split()
+    queries = [f'"{words[0]} {words[1]}"', f'{words[2]} NEAR/5 {words[3]}', f'"{words[4]} {words[5]}" {words[0]}']
+    plain = SearchEngine(positional=True, result_cache_size=0)
+    plain.index_documents(documents)
+    
+    with ShardedSearchEngine(num_shards=2, positional=True) as sharded:
+        sharded.index_documents(documents)
+        for query in queries:
+            expected = plain.search(query, top_k=10)
+            assert expected and sharded.search(query, top_k=10) == expected, query
+    print("  ✓ Phrase and NEAR/k results match")
+    
+    with ShardedSearchEngine(num_shards=2) as sharded:
+        sharded.index_documents(documents[:20])
+        assert sharded.search(queries[0]) == sharded.search(f'{words[0]} {words[1]}')
+        print("  ✓ Non-positional shards rank phrase queries as free text")
+        try:
+            sharded.search(queries[0], strategy='unknown')
+            assert False, "An unknown strategy should raise"
+        except ValueError:
+            print("  ✓ Shard errors are raised by the coordinator")
+    
+    print("✓ Phrase tests passed!\n")
+
+
+def test_sharded_save_and_load():
+    """A saved sharded index should reopen with the same results."""
+    print("Testing sharded index persistence...")
+    
+    documents, queries = sample_corpus()
+    with ShardedSearchEngine(num_shards=3, model=BM25Model()) as sharded:
+        sharded.index_documents(documents)
+        expected = sharded.search_many(queries, top_k=5)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            sharded.save(os.path.join(tmp, 'index'))
+            with ShardedSearchEngine.load(os.path.join(tmp, 'index')) as loaded:
+                assert loaded.num_shards == 3 and isinstance(loaded.model, BM25Model)
+                assert loaded.search_many(queries, top_k=5) == expected
+    print("  ✓ Results match after save/load")
+    
+    print("✓ Persistence tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("SHARDED SEARCH TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_sharded_parity()
+    test_sharded_phrases()
+    test_sharded_save_and_load()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Test saving and memory-mapped loading of the search index.
+"""
+
+import sys
+import os
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import json
+import tempfile
+import numpy as np
+from src.search import SearchEngine, BM25Model
+from src.storage import save_vocabulary, MappedVocabulary, save_documents, MappedDocuments
+from src.corpora import sample_documents
+
+
+def test_mapped_vocabulary():
+    """Mapped vocabulary should behave like the original dict."""
+    print("Testing mapped vocabulary...")
+    
+    vocabulary = {'whale': 2, 'sea': 0, 'café': 1, 'blood': 3}
+    with tempfile.TemporaryDirectory() as path:
+        save_vocabulary(path, vocabulary)
+        mapped = MappedVocabulary(path)
+        
+        assert len(mapped) == len(vocabulary)
+        assert dict(mapped.items()) == vocabulary
+        assert mapped.get('missing', -1) == -1
+        assert 'whal' not in mapped and 'whales' not in mapped and '' not in mapped
+        print("  ✓ Lookups and iteration match")
+        
+        assert mapped.terms.data.nbytes == sum(len(term.encode('utf-8')) for term in vocabulary)
+        print("  ✓ Terms stored without padding")
+    
+    print("✓ Vocabulary tests passed!\n")
+
+
+def test_mapped_documents():
+    """Document fields should round-trip, including missing fields."""
+    print("Testing mapped documents...")
+    
+    documents = sample_documents()
+    documents[2]['filepath'] = 'v.txt'  # a field the other documents lack
+    with tempfile.TemporaryDirectory() as path:
+        fields = save_documents(path, documents)
+        mapped = MappedDocuments(path, fields, len(documents))
+        
+        assert list(mapped) == documents
+        assert mapped[-1] == documents[-1]
+        print("  ✓ Documents round-trip")
+    
+    print("✓ Document tests passed!\n")
+
+
+def test_engine_round_trip():
+    """A loaded engine must return the same results as the one that was saved."""
+    print("Testing engine save/load...")
+    
+    for engine in (SearchEngine(), SearchEngine(model=BM25Model(k1=1.4, b=0.5), quantize_bits=8)):
+        engine.index_documents(sample_documents())
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index')
+            engine.save(path)
+            loaded = SearchEngine.load(path)
+            
+            assert isinstance(loaded.index.doc_gaps, np.memmap), "Arrays should be memory-mapped"
+            assert loaded.model.get_params() == engine.model.get_params()
+            assert loaded.preprocessor.stem_cache.entries == engine.preprocessor.stem_cache.entries
+            for query in ("whale ocean", "night blood sea", "detective"):
+                for strategy in engine.STRATEGIES:
+                    assert (loaded.search(query, top_k=3, strategy=strategy)
+                            == engine.search(query, top_k=3, strategy=strategy))
+            print(f"  ✓ {type(engine.model).__name__} results identical after reload")
+            
+            # Saving again replaces the old index
+            engine.save(path)
+            assert not os.path.exists(path + '.tmp')
+            assert not os.path.exists(path + '.old')
+            
+            # A save interrupted between its two renames leaves the old index aside
+            os.replace(path, path + '.old')
+            engine.save(path)
+            assert sorted(os.listdir(tmp)) == ['index']
+            assert len(SearchEngine.load(path).documents) == len(engine.documents)
+    
+    print("✓ Save/load tests passed!\n")
+
+
+def test_format_version_checked():
+    """Loading an index with another format version should fail clearly."""
+    print("Testing format version check...")
+    
+    engine = SearchEngine()
+    engine.index_documents(sample_documents())
+    with tempfile.TemporaryDirectory() as tmp:
+        engine.save(tmp + '/index')
+        manifest_path = os.path.join(tmp, 'index', 'manifest.json')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['format_version'] = 999
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        
+        try:
+            SearchEngine.load(tmp + '/index')
+            assert False, "Unsupported version should raise"
+        except ValueError:
+            print("  ✓ Unsupported version rejected")
+    
+    print("✓ Version tests passed!\n")
+
+
+def main():
+    print("="*70)
+    print("INDEX STORAGE TEST SUITE")
+    print("="*70)
+    print()
+    
+    test_mapped_vocabulary()
+    test_mapped_documents()
+    test_engine_round_trip()
+    test_format_version_checked()
+    
+    print("="*70)
+    print("ALL TESTS COMPLETED!")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
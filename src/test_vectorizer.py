@@ -4,18 +4,91 @@ Test TF-IDF vectorizer.
 
 import sys
 import os
-project_root = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 import numpy as np
-from loader import DocumentLoader
-from preprocessing import TextPreprocessor
-from vectorizer import TFIDFVectorizer
+from src.loader import DocumentLoader
+from src.preprocessing import TextPreprocessor
+from src.vectorizer import TFIDFVectorizer, PartialCounts
+
+
+def test_sparse_matrix_matches_transform():
+    """Sparse fit_transform rows should equal dense per-document transform."""
+    print("Testing sparse document-term matrix...")
+    
+    documents = [
+        ['whale', 'sea', 'whale', 'ship'],
+        ['detect', 'crime', 'sea'],
+        [],
+        ['vampir', 'blood', 'night', 'blood'],
+    ]
+    
+    vectorizer = TFIDFVectorizer()
+    matrix = vectorizer.fit_transform(documents)
+    
+    assert matrix.shape == (len(documents), len(vectorizer.vocabulary))
+    assert matrix.nnz == sum(len(set(doc)) for doc in documents)
+    
+    for i, doc in enumerate(documents):
+        expected = vectorizer.transform(doc)
+        assert np.allclose(matrix[i].toarray().ravel(), expected)
+    print("  ✓ Rows match dense transform")
+    
+    # Out-of-vocabulary terms are ignored but still count towards length
+    vector = vectorizer.transform(['whale', 'unknown'])
+    idx = vectorizer.vocabulary['whale']
+    assert abs(vector[idx] - 0.5 * vectorizer.idf_values[idx]) < 1e-12
+    print("  ✓ Out-of-vocabulary terms ignored")
+    
+    print("✓ Sparse matrix tests passed!\n")
+
+
+def test_partial_counts_merge():
+    """Fitting independently counted chunks should equal fitting all documents."""
+    print("Testing partial count merging...")
+    
+    documents = [
+        ['whale', 'sea', 'whale', 'ship'],
+        ['detect', 'crime', 'sea'],
+        [],
+        ['vampir', 'blood', 'night', 'blood'],
+        ['ship', 'night', 'sea', 'captain'],
+    ]
+    
+    whole = TFIDFVectorizer()
+    expected = whole.fit_counts(documents)
+    
+    chunked = TFIDFVectorizer()
+    partials = [PartialCounts.from_documents(documents[i:i + 2]) for i in range(0, len(documents), 2)]
+    counts = chunked.fit_partial_counts(partials)
+    
+    assert chunked.vocabulary == whole.vocabulary
+    assert np.array_equal(chunked.doc_freq, whole.doc_freq)
+    assert np.array_equal(chunked.idf_values, whole.idf_values)
+    for name in ('data', 'indices', 'indptr'):
+        assert np.array_equal(getattr(counts, name), getattr(expected, name))
+    print("  ✓ Vocabulary, document frequencies and counts match")
+    
+    # Statistics of chunks counted elsewhere, e.g. by shards
+    stats = TFIDFVectorizer()
+    term_ids = stats.set_collection_stats(
+        [term for partial in partials for term in partial.terms],
+        np.concatenate([partial.doc_freq for partial in partials]),
+        len(documents)
+    )
+    assert stats.vocabulary == whole.vocabulary
+    assert np.array_equal(stats.doc_freq, whole.doc_freq)
+    assert np.array_equal(stats.idf_values, whole.idf_values)
+    assert [list(stats.vocabulary)[i] for i in term_ids] == [t for p in partials for t in p.terms]
+    print("  ✓ Collection statistics set from repeated terms")
+    
+    print("✓ Partial count tests passed!\n")
 
 
 def main():
     # Load and preprocess
-    loader = DocumentLoader('data/raw_texts')
+    loader = DocumentLoader(os.path.join(project_root, 'data', 'raw_texts'))
     documents = loader.load_documents()
     
     preprocessor = TextPreprocessor(use_stemming=True, remove_stopwords=True)
@@ -30,11 +103,12 @@ def main():
     tfidf_matrix = vectorizer.fit_transform(processed_docs)
     
     print(f"\nTF-IDF matrix shape: {tfidf_matrix.shape}")
-    print(f"(documents x vocabulary size)\n")
+    print(f"(documents x vocabulary size)")
+    print(f"Stored nonzeros: {tfidf_matrix.nnz}\n")
     
     # Show top terms by TF-IDF for first document
     doc_idx = 0
-    doc_vector = tfidf_matrix[doc_idx]
+    doc_vector = tfidf_matrix[doc_idx].toarray().ravel()
     
     # Get non-zero indices
     nonzero_indices = np.where(doc_vector > 0)[0]
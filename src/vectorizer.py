@@ -2,10 +2,79 @@
 TF-IDF vectorizer for document search.
 """
 
+import logging
 import numpy as np
-from typing import List, Dict
-from collections import Counter
-import math
+from typing import Iterable, List, Dict
+from scipy.sparse import csr_matrix
+from src.compression import take_ragged
+
+logger = logging.getLogger(__name__)
+
+
+class PartialCounts:
+    """
+    Term counts of a chunk of documents over the chunk's own vocabulary.
+    
+    Chunks are counted independently (e.g. in worker processes) and later
+    mapped onto a shared vocabulary by TFIDFVectorizer.merge_counts.
+    """
+    
+    def __init__(self, terms: List[str], counts: csr_matrix, doc_lengths: np.ndarray,
+                 positions: np.ndarray = None):
+        """
+        Initialize partial counts.
+        
+        Args:
+            terms: Sorted distinct terms of the chunk (local term ids)
+            counts: Sparse CSR matrix of raw term counts over local term ids
+            doc_lengths: Number of tokens in each document
+            positions: Optional positions of every term occurrence, grouped
+                by count entry in CSR order and ascending within an entry
+        """
+        self.terms = terms
+        self.counts = counts
+        self.doc_lengths = doc_lengths
+        self.positions = positions
+    
+    @classmethod
+    def from_documents(cls, documents: List[List[str]],
+                       positions: List[List[int]] = None) -> 'PartialCounts':
+        """
+        Count the terms of a chunk of tokenized documents.
+        
+        Args:
+            documents: List of tokenized documents
+            positions: Optional position of every token of each document
+            
+        Returns:
+            Partial counts of the chunk
+        """
+        local = TFIDFVectorizer()
+        terms = sorted({token for doc in documents for token in doc})
+        local.vocabulary = {term: idx for idx, term in enumerate(terms)}
+        doc_lengths = np.array([len(doc) for doc in documents], dtype=np.int64)
+        counts = local.count_matrix(documents)
+        if positions is None:
+            return cls(terms, counts, doc_lengths)
+        
+        # Order occurrences like the count entries: by document, then term
+        num_tokens = int(doc_lengths.sum())
+        term_ids = np.fromiter((local.vocabulary[token] for doc in documents for token in doc),
+                               dtype=np.int64, count=num_tokens)
+        flat = np.fromiter((p for doc in positions for p in doc), dtype=np.int64, count=num_tokens)
+        rows = np.repeat(np.arange(len(documents), dtype=np.int64), doc_lengths)
+        order = np.lexsort((flat, term_ids, rows))
+        return cls(terms, counts, doc_lengths, flat[order])
+    
+    @property
+    def num_documents(self) -> int:
+        """Number of documents in the chunk."""
+        return self.counts.shape[0]
+    
+    @property
+    def doc_freq(self) -> np.ndarray:
+        """Number of documents of the chunk containing each local term."""
+        return np.bincount(self.counts.indices, minlength=len(self.terms))
 
 
 class TFIDFVectorizer:
@@ -15,6 +84,7 @@ class TFIDFVectorizer:
         """Initialize vectorizer."""
         self.vocabulary: Dict[str, int] = {}  # term -> index mapping
         self.idf_values: np.ndarray = None     # IDF values for each term
+        self.doc_freq: np.ndarray = None       # documents containing each term
         self.num_documents: int = 0
     
     def fit(self, documents: List[List[str]]) -> None:
@@ -24,34 +94,7 @@ class TFIDFVectorizer:
         Args:
             documents: List of tokenized documents (list of token lists)
         """
-        self.num_documents = len(documents)
-        
-        # Build vocabulary
-        all_terms = set()
-        for doc in documents:
-            all_terms.update(doc)
-        
-        # Create term -> index mapping (sorted for consistency)
-        self.vocabulary = {term: idx for idx, term in enumerate(sorted(all_terms))}
-        
-        # Compute document frequency for each term
-        doc_freq = Counter()
-        for doc in documents:
-            unique_terms = set(doc)
-            for term in unique_terms:
-                doc_freq[term] += 1
-        
-        # Compute IDF: log(N / df(t))
-        vocab_size = len(self.vocabulary)
-        self.idf_values = np.zeros(vocab_size)
-        
-        for term, idx in self.vocabulary.items():
-            df = doc_freq[term]
-            # Add smoothing to avoid division by zero
-            self.idf_values[idx] = math.log((self.num_documents + 1) / (df + 1))
-        
-        print(f"Vocabulary size: {vocab_size}")
-        print(f"Documents: {self.num_documents}")
+        self.fit_counts(documents)
     
     def transform(self, document: List[str]) -> np.ndarray:
         """
@@ -66,23 +109,31 @@ class TFIDFVectorizer:
         # Initialize zero vector
         vector = np.zeros(len(self.vocabulary))
         
-        # Count term frequencies
-        term_freq = Counter(document)
         doc_length = len(document)
-        
         if doc_length == 0:
             return vector
         
-        # Compute TF-IDF for each term in document
-        for term, count in term_freq.items():
-            if term in self.vocabulary:
-                idx = self.vocabulary[term]
-                tf = count / doc_length  # Normalized term frequency
-                vector[idx] = tf * self.idf_values[idx]
+        counts = self.count_matrix([document])
+        tf = counts.data / doc_length  # Normalized term frequency
+        vector[counts.indices] = tf * self.idf_values[counts.indices]
         
         return vector
     
-    def fit_transform(self, documents: List[List[str]]) -> np.ndarray:
+    def transform_documents(self, documents: List[List[str]]) -> csr_matrix:
+        """
+        Convert many documents to a sparse TF-IDF matrix.
+        
+        Args:
+            documents: List of tokenized documents
+            
+        Returns:
+            Sparse CSR document-term matrix (num_docs x vocab_size)
+        """
+        counts = self.count_matrix(documents)
+        doc_lengths = np.array([len(doc) for doc in documents], dtype=np.int64)
+        return self.weight_counts(counts, doc_lengths)
+    
+    def fit_transform(self, documents: List[List[str]]) -> csr_matrix:
         """
         Fit vocabulary and transform documents in one step.
         
@@ -90,13 +141,231 @@ class TFIDFVectorizer:
             documents: List of tokenized documents
             
         Returns:
-            Document-term matrix (num_docs x vocab_size)
+            Sparse CSR document-term matrix (num_docs x vocab_size)
+        """
+        counts = self.fit_counts(documents)
+        doc_lengths = np.array([len(doc) for doc in documents], dtype=np.int64)
+        return self.weight_counts(counts, doc_lengths)
+    
+    def count_matrix(self, documents: List[List[str]]) -> csr_matrix:
+        """
+        Count in-vocabulary terms of each document.
+        
+        The matrix is assembled directly from (document, term) pairs, so
+        memory scales with the number of nonzeros rather than with
+        num_docs x vocab_size.
+        
+        Args:
+            documents: List of tokenized documents
+            
+        Returns:
+            Sparse CSR matrix of raw term counts (num_docs x vocab_size)
         """
-        self.fit(documents)
+        num_docs = len(documents)
+        vocab_size = len(self.vocabulary)
+        doc_lengths = np.array([len(doc) for doc in documents], dtype=np.int64)
+        
+        # Map every token to its term index (-1 for out-of-vocabulary)
+        vocabulary = self.vocabulary
+        term_ids = np.fromiter(
+            (vocabulary.get(token, -1) for doc in documents for token in doc),
+            dtype=np.int64,
+            count=int(doc_lengths.sum())
+        )
+        rows = np.repeat(np.arange(num_docs, dtype=np.int64), doc_lengths)
+        in_vocab = term_ids >= 0
         
-        # Transform all documents
-        matrix = np.zeros((self.num_documents, len(self.vocabulary)))
-        for i, doc in enumerate(documents):
-            matrix[i] = self.transform(doc)
+        # Sorting (row, term) keys groups each row's terms in column order
+        keys, counts = np.unique(
+            rows[in_vocab] * max(vocab_size, 1) + term_ids[in_vocab],
+            return_counts=True
+        )
+        rows, cols = np.divmod(keys, max(vocab_size, 1))
+        
+        indptr = np.zeros(num_docs + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_docs), out=indptr[1:])
+        
+        return csr_matrix(
+            (counts.astype(np.int32), cols.astype(np.int32), indptr),
+            shape=(num_docs, vocab_size)
+        )
+    
+    def fit_counts(self, documents: List[List[str]]) -> csr_matrix:
+        """
+        Build vocabulary and IDF values, returning the term counts.
         
-        return matrix
\ No newline at end of file
+        Args:
+            documents: List of tokenized documents
+            
+        Returns:
+            Sparse CSR matrix of raw term counts
+        """
+        return self.fit_partial_counts([PartialCounts.from_documents(documents)])
+    
+    def fit_partial_counts(self, partials: List[PartialCounts]) -> csr_matrix:
+        """
+        Build vocabulary and IDF values from independently counted chunks.
+        
+        The vocabulary is the sorted union of the chunk vocabularies and
+        document frequencies are the sum of the chunks' own frequencies, so
+        the result is the same as fitting all documents at once.
+        
+        Args:
+            partials: Partial counts of consecutive chunks of documents
+            
+        Returns:
+            Sparse CSR matrix of raw term counts of all documents
+        """
+        self.set_collection_stats(
+            [term for partial in partials for term in partial.terms],
+            np.concatenate([partial.doc_freq for partial in partials]) if partials else [],
+            sum(partial.num_documents for partial in partials)
+        )
+        
+        logger.debug("Vocabulary size: %d", len(self.vocabulary))
+        logger.debug("Documents: %d", self.num_documents)
+        
+        return self.merge_counts(partials)
+    
+    def set_collection_stats(self, terms: List[str], doc_freq: np.ndarray,
+                             num_documents: int) -> np.ndarray:
+        """
+        Set the vocabulary, document frequencies and IDF values.
+        
+        The vocabulary is the sorted set of terms. A term may occur more than
+        once, e.g. once per independently counted chunk of the collection;
+        its document frequencies are then summed.
+        
+        Args:
+            terms: Terms, possibly repeated
+            doc_freq: Document frequency of each entry of terms
+            num_documents: Number of documents in the collection
+            
+        Returns:
+            Vocabulary index of each entry of terms
+        """
+        self.vocabulary = {term: idx for idx, term in enumerate(sorted(set(terms)))}
+        term_ids = self._term_ids(terms)
+        self.doc_freq = np.zeros(len(self.vocabulary), dtype=np.int64)
+        np.add.at(self.doc_freq, term_ids, np.asarray(doc_freq, dtype=np.int64))
+        self.num_documents = num_documents
+        self.compute_idf()
+        return term_ids
+    
+    def merge_counts(self, partials: List[PartialCounts]) -> csr_matrix:
+        """
+        Stack partial counts into one matrix over this vocabulary.
+        
+        Args:
+            partials: Partial counts of consecutive chunks; every term must
+                already be in the vocabulary
+            
+        Returns:
+            Sparse CSR matrix of raw term counts (num_docs x vocab_size)
+        """
+        data, indices, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+        nnz = 0
+        for partial in partials:
+            term_ids = self._term_ids(partial.terms)
+            data.append(partial.counts.data)
+            indices.append(term_ids[partial.counts.indices].astype(np.int32))
+            indptr.append(partial.counts.indptr[1:] + nnz)
+            nnz += partial.counts.nnz
+        
+        counts = csr_matrix(
+            (np.concatenate(data), np.concatenate(indices), np.concatenate(indptr)),
+            shape=(sum(partial.num_documents for partial in partials), len(self.vocabulary))
+        )
+        # Appended terms can break column order within a row
+        counts.sort_indices()
+        return counts
+    
+    def merge_positions(self, partials: List[PartialCounts]) -> np.ndarray:
+        """
+        Stack the positions of partial counts in the entry order of merge_counts.
+        
+        Args:
+            partials: Partial counts with positions, as passed to merge_counts
+            
+        Returns:
+            Positions grouped by count entry of the merged matrix
+        """
+        merged = []
+        for partial in partials:
+            counts = partial.counts
+            offsets = np.zeros(counts.nnz + 1, dtype=np.int64)
+            np.cumsum(counts.data, out=offsets[1:])
+            # merge_counts sorts each row's entries by their new term ids
+            rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+            order = np.lexsort((self._term_ids(partial.terms)[counts.indices], rows))
+            merged.append(take_ragged(partial.positions, offsets, order))
+        return np.concatenate(merged) if merged else np.empty(0, dtype=np.int64)
+    
+    def _term_ids(self, terms: List[str]) -> np.ndarray:
+        """Look up the vocabulary index of every term."""
+        vocabulary = self.vocabulary
+        return np.fromiter((vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+    
+    def compute_idf(self) -> None:
+        """Recompute IDF values from the current document frequencies."""
+        # Compute IDF: log(N / df(t)), smoothed to avoid division by zero
+        self.idf_values = np.log((self.num_documents + 1) / (self.doc_freq + 1))
+    
+    def add_terms(self, documents: Iterable[List[str]]) -> int:
+        """
+        Append terms not yet in the vocabulary.
+        
+        New terms get the next free indices, so existing term indices (and
+        every matrix built with them) stay valid. Their document frequency
+        starts at zero until documents are counted with add_document_counts.
+        
+        Args:
+            documents: Tokenized documents
+            
+        Returns:
+            Number of terms added
+        """
+        new_terms = sorted({token for doc in documents for token in doc
+                            if token not in self.vocabulary})
+        if not new_terms:
+            return 0
+        
+        if not isinstance(self.vocabulary, dict):
+            # Mapped vocabularies are read-only
+            self.vocabulary = dict(self.vocabulary.items())
+        first = len(self.vocabulary)
+        for offset, term in enumerate(new_terms):
+            self.vocabulary[term] = first + offset
+        self.doc_freq = np.concatenate([self.doc_freq, np.zeros(len(new_terms), dtype=np.int64)])
+        return len(new_terms)
+    
+    def add_document_counts(self, counts: csr_matrix, sign: int = 1) -> None:
+        """
+        Update document frequencies for documents added to the collection.
+        
+        IDF values are not touched; call compute_idf() once a batch of
+        changes is complete.
+        
+        Args:
+            counts: Sparse CSR matrix of raw term counts of the documents
+            sign: 1 to add the documents, -1 to remove them
+        """
+        self.doc_freq = self.doc_freq + sign * np.bincount(counts.indices,
+                                                           minlength=len(self.doc_freq))
+        self.num_documents += sign * counts.shape[0]
+    
+    def weight_counts(self, counts: csr_matrix, doc_lengths: np.ndarray) -> csr_matrix:
+        """
+        Apply TF-IDF weighting to a count matrix.
+        
+        Args:
+            counts: Sparse CSR matrix of raw term counts
+            doc_lengths: Number of tokens in each document
+            
+        Returns:
+            Sparse CSR TF-IDF matrix with the same sparsity pattern
+        """
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        tf = counts.data / doc_lengths[rows]  # Normalized term frequency
+        data = tf * self.idf_values[counts.indices]
+        return csr_matrix((data, counts.indices, counts.indptr), shape=counts.shape)
\ No newline at end of file